@@ -17,4 +17,10 @@ urlpatterns = [
 
     # Courses API
     path("courses/", include("educacion_financiera.apps.courses.api_urls")),
+
+    # Lesson discussions API
+    path("discussions/", include("educacion_financiera.apps.discussions.api_urls")),
+
+    # Instructor analytics API
+    path("analytics/", include("educacion_financiera.apps.analytics.api_urls")),
 ]
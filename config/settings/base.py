@@ -6,6 +6,7 @@ import sys
 from pathlib import Path
 
 import environ
+from celery.schedules import crontab
 
 BASE_DIR = Path(__file__).resolve(strict=True).parent.parent.parent
 # educacion_financiera/
@@ -97,6 +98,7 @@ THIRD_PARTY_APPS = [
 LOCAL_APPS = [
     "educacion_financiera.users",
     # Custom apps
+    "educacion_financiera.apps.analytics",
     "educacion_financiera.apps.courses",
     "educacion_financiera.apps.dashboard",
     "educacion_financiera.apps.discussions",
@@ -150,6 +152,7 @@ AUTH_PASSWORD_VALIDATORS = [
 # ------------------------------------------------------------------------------
 # https://docs.djangoproject.com/en/dev/ref/settings/#middleware
 MIDDLEWARE = [
+    "educacion_financiera.instrumentation.InstrumentationMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",
@@ -184,6 +187,26 @@ MEDIA_ROOT = str(APPS_DIR / "media")
 # https://docs.djangoproject.com/en/dev/ref/settings/#media-url
 MEDIA_URL = "/media/"
 
+# STORAGES
+# ------------------------------------------------------------------------------
+# Admin exports hold personal data, so they live outside MEDIA_ROOT and are never served directly
+EXPORTS_ROOT = env("DJANGO_EXPORTS_ROOT", default=str(BASE_DIR / "private" / "exports"))
+# https://docs.djangoproject.com/en/dev/ref/settings/#storages
+STORAGES = {
+    "default": {
+        "BACKEND": "django.core.files.storage.FileSystemStorage",
+    },
+    "staticfiles": {
+        "BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage",
+    },
+    "exports": {
+        "BACKEND": "django.core.files.storage.FileSystemStorage",
+        "OPTIONS": {"location": EXPORTS_ROOT},
+    },
+}
+# Days an admin export is kept before delete_expired_exports removes it
+EXPORT_RETENTION_DAYS = env.int("DJANGO_EXPORT_RETENTION_DAYS", default=7)
+
 # TEMPLATES
 # ------------------------------------------------------------------------------
 # https://docs.djangoproject.com/en/dev/ref/settings/#templates
@@ -328,6 +351,43 @@ CELERY_WORKER_SEND_TASK_EVENTS = True
 CELERY_TASK_SEND_SENT_EVENT = True
 # https://docs.celeryq.dev/en/stable/userguide/configuration.html#worker-hijack-root-logger
 CELERY_WORKER_HIJACK_ROOT_LOGGER = False
+# https://docs.celeryq.dev/en/stable/userguide/periodic-tasks.html
+# Synced into django-celery-beat's database schedule on startup
+CELERY_BEAT_SCHEDULE = {
+    "process-due-stripe-events": {
+        "task": "educacion_financiera.apps.payments.tasks.process_due_stripe_events",
+        "schedule": 60.0,
+    },
+    "expire-stale-checkouts": {
+        "task": "educacion_financiera.apps.payments.tasks.expire_stale_checkouts",
+        "schedule": 60.0 * 15,
+    },
+    "flush-buffered-study-time": {
+        "task": "educacion_financiera.apps.courses.tasks.flush_buffered_study_time",
+        "schedule": 60.0,
+    },
+    "rollup-recent-analytics": {
+        "task": "educacion_financiera.apps.analytics.tasks.rollup_recent_analytics",
+        "schedule": 60.0 * 15,
+    },
+    "rollup-nightly-analytics": {
+        "task": "educacion_financiera.apps.analytics.tasks.rollup_nightly_analytics",
+        "schedule": crontab(hour=0, minute=30),
+    },
+    "moderate-pending-comments": {
+        "task": "educacion_financiera.apps.discussions.tasks.moderate_pending_comments",
+        "schedule": 30.0,
+    },
+    "delete-expired-exports": {
+        "task": "educacion_financiera.exports.delete_expired_exports",
+        "schedule": crontab(hour=3, minute=0),
+    },
+    # Autosaved notes reach the database at most this often
+    "flush-note-autosaves": {
+        "task": "educacion_financiera.apps.discussions.tasks.flush_note_autosaves",
+        "schedule": 5.0,
+    },
+}
 # django-allauth
 # ------------------------------------------------------------------------------
 ACCOUNT_ALLOW_REGISTRATION = env.bool("DJANGO_ACCOUNT_ALLOW_REGISTRATION", True)
@@ -383,3 +443,57 @@ SPECTACULAR_SETTINGS = {
 STRIPE_PUBLIC_KEY = env("STRIPE_PUBLIC_KEY", default="pk_test_your_test_key")
 STRIPE_SECRET_KEY = env("STRIPE_SECRET_KEY", default="sk_test_your_test_key")
 STRIPE_WEBHOOK_SECRET = env("STRIPE_WEBHOOK_SECRET", default="whsec_your_webhook_secret")
+# Seconds before a Stripe API call gives up, and retries on network errors
+STRIPE_TIMEOUT = env.int("STRIPE_TIMEOUT", default=10)
+STRIPE_MAX_NETWORK_RETRIES = env.int("STRIPE_MAX_NETWORK_RETRIES", default=2)
+# Lifetime of a Checkout Session (Stripe accepts 30 minutes to 24 hours)
+STRIPE_CHECKOUT_SESSION_TTL = env.int("STRIPE_CHECKOUT_SESSION_TTL", default=60 * 60)
+# Days expired checkout payments are kept before being purged
+EXPIRED_PAYMENT_RETENTION_DAYS = env.int("EXPIRED_PAYMENT_RETENTION_DAYS", default=7)
+
+# Seconds the global context processor keeps categories and user stats cached
+GLOBAL_CONTEXT_CACHE_TIMEOUT = env.int("GLOBAL_CONTEXT_CACHE_TIMEOUT", default=60 * 15)
+
+# Request instrumentation (see educacion_financiera/instrumentation.py)
+INSTRUMENTATION_ENABLED = env.bool("INSTRUMENTATION_ENABLED", default=True)
+# Add a Server-Timing header with db, render and context processor times
+INSTRUMENTATION_SERVER_TIMING = env.bool("INSTRUMENTATION_SERVER_TIMING", default=False)
+# Times the same SQL may run in one request before it is reported as a likely N+1
+INSTRUMENTATION_N_PLUS_ONE_THRESHOLD = env.int("INSTRUMENTATION_N_PLUS_ONE_THRESHOLD", default=5)
+# Bearer token for Prometheus to scrape /metrics/ (staff users can always read it)
+INSTRUMENTATION_METRICS_TOKEN = env("INSTRUMENTATION_METRICS_TOKEN", default="")
+# Directory shared by the worker processes, emptied on start, so /metrics/ adds up all of them
+INSTRUMENTATION_METRICS_DIR = env("PROMETHEUS_MULTIPROC_DIR", default="")
+
+# Seconds a student's dashboard snapshot is cached; 0 builds it on every request
+DASHBOARD_SNAPSHOT_TIMEOUT = env.int("DASHBOARD_SNAPSHOT_TIMEOUT", default=60 * 5)
+
+# Seconds between study heartbeats of lesson pages, the most credited per heartbeat
+STUDY_HEARTBEAT_INTERVAL = env.int("STUDY_HEARTBEAT_INTERVAL", default=30)
+
+# Past days the nightly analytics rollup recomputes, for late payments and offline progress
+ANALYTICS_ROLLUP_DAYS = env.int("ANALYTICS_ROLLUP_DAYS", default=3)
+
+# Seconds the first page of a lesson's comment threads is cached
+LESSON_COMMENTS_CACHE_TIMEOUT = env.int("LESSON_COMMENTS_CACHE_TIMEOUT", default=60 * 15)
+
+# Comment moderation (see educacion_financiera/apps/discussions/moderation.py)
+# Checks run by the moderation worker; each flags comments of a batch
+COMMENT_MODERATION_CHECKS = [
+    "educacion_financiera.apps.discussions.moderation.check_links",
+    "educacion_financiera.apps.discussions.moderation.check_banned_words",
+    "educacion_financiera.apps.discussions.moderation.check_spam",
+    "educacion_financiera.apps.discussions.moderation.check_rate",
+]
+COMMENT_MODERATION_BATCH_SIZE = env.int("COMMENT_MODERATION_BATCH_SIZE", default=500)
+COMMENT_MODERATION_MAX_LINKS = env.int("COMMENT_MODERATION_MAX_LINKS", default=2)
+COMMENT_MODERATION_BANNED_WORDS = env.list("COMMENT_MODERATION_BANNED_WORDS", default=[])
+# Comments a user may post per hour before the rest are flagged
+COMMENT_MODERATION_HOURLY_LIMIT = env.int("COMMENT_MODERATION_HOURLY_LIMIT", default=20)
+
+# Note autosave (see educacion_financiera/apps/discussions/autosave.py)
+# Milliseconds the lesson page editor waits after the last keystroke before saving
+NOTE_AUTOSAVE_DELAY = env.int("NOTE_AUTOSAVE_DELAY", default=2000)
+NOTE_MAX_LENGTH = env.int("NOTE_MAX_LENGTH", default=50000)
+# Keep earlier versions of notes as NoteRevision patches
+NOTE_HISTORY_ENABLED = env.bool("NOTE_HISTORY_ENABLED", default=True)
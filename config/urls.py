@@ -10,6 +10,7 @@ from drf_spectacular.views import SpectacularAPIView
 from drf_spectacular.views import SpectacularSwaggerView
 from rest_framework.authtoken.views import obtain_auth_token
 
+from educacion_financiera.instrumentation import metrics_view
 from educacion_financiera.views import HomeView
 
 urlpatterns = [
@@ -28,8 +29,12 @@ urlpatterns = [
     path("dashboard/", include("educacion_financiera.apps.dashboard.urls", namespace="dashboard")),
     # Course-related URLs
     path("courses/", include("educacion_financiera.apps.courses.urls", namespace="courses")),
+    # Instructor analytics
+    path("analytics/", include("educacion_financiera.apps.analytics.urls", namespace="analytics")),
     # Payment URLs
     path("payments/", include("educacion_financiera.apps.payments.urls", namespace="payments")),
+    # Prometheus metrics
+    path("metrics/", metrics_view, name="metrics"),
     # Media files
     *static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT),
 ]
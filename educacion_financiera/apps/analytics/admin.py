@@ -0,0 +1,25 @@
+from django.contrib import admin
+
+from .models import CourseDailyStats, LessonDailyStats
+
+
+@admin.register(CourseDailyStats)
+class CourseDailyStatsAdmin(admin.ModelAdmin):
+    list_display = [
+        "course", "date", "enrollments", "lesson_completions", "certificates", "revenue", "cohort_completed"
+    ]
+    list_filter = ["date", "course"]
+    list_select_related = ["course"]
+    date_hierarchy = "date"
+    raw_id_fields = ["course"]
+    readonly_fields = ["modified"]
+
+
+@admin.register(LessonDailyStats)
+class LessonDailyStatsAdmin(admin.ModelAdmin):
+    list_display = ["lesson", "course", "date", "starts", "completions", "time_spent"]
+    list_filter = ["date", "course"]
+    list_select_related = ["lesson", "course"]
+    date_hierarchy = "date"
+    raw_id_fields = ["lesson", "course"]
+    readonly_fields = ["modified"]
@@ -0,0 +1,10 @@
+from django.urls import path
+
+from .api_views import CourseAnalyticsAPIView, CourseAnalyticsListAPIView
+
+app_name = 'analytics_api'
+
+urlpatterns = [
+    path('courses/', CourseAnalyticsListAPIView.as_view(), name='course-list'),
+    path('courses/<slug:slug>/', CourseAnalyticsAPIView.as_view(), name='course-detail'),
+]
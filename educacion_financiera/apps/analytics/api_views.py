@@ -0,0 +1,35 @@
+from django.shortcuts import get_object_or_404
+from rest_framework import permissions
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from .reports import analytics_courses, course_report, overview, period
+
+
+class CourseAnalyticsListAPIView(APIView):
+    """
+    Period totals of the courses whose analytics the user may see.
+    Accepts ``days`` (default 30).
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        start, end = period(request.query_params.get('days'))
+        return Response({
+            'start': start,
+            'end': end,
+            'results': overview(request.user, start, end),
+        })
+
+
+class CourseAnalyticsAPIView(APIView):
+    """
+    Totals, daily series, enrollment funnel and lesson drop-off of a course.
+    Accepts ``days`` (default 30).
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, slug):
+        course = get_object_or_404(analytics_courses(request.user), slug=slug)
+        start, end = period(request.query_params.get('days'))
+        return Response(course_report(course, start, end))
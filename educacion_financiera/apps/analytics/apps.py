@@ -0,0 +1,13 @@
+from django.apps import AppConfig
+from django.utils.translation import gettext_lazy as _
+
+
+class AnalyticsConfig(AppConfig):
+    name = "educacion_financiera.apps.analytics"
+    verbose_name = _("Analytics")
+
+    def ready(self):
+        try:
+            import educacion_financiera.apps.analytics.signals  # noqa F401
+        except ImportError:
+            pass
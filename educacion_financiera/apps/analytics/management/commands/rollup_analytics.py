@@ -0,0 +1,38 @@
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from educacion_financiera.apps.analytics.rollups import rollup_range
+
+
+class Command(BaseCommand):
+    help = 'Recompute the daily course and lesson analytics of a range of days'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--since',
+            help='First day to recompute (YYYY-MM-DD), 30 days ago by default',
+        )
+        parser.add_argument(
+            '--until',
+            help='Last day to recompute (YYYY-MM-DD), today by default',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            until = date.fromisoformat(options['until']) if options['until'] else timezone.localdate()
+            since = date.fromisoformat(options['since']) if options['since'] else until - timedelta(days=29)
+        except ValueError as exc:
+            raise CommandError(exc) from exc
+        if since > until:
+            raise CommandError('--since must not be after --until')
+
+        result = rollup_range(since, until)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Rolled up {(until - since).days + 1} days: {result["courses"]} course days '
+                f'and {result["cohorts"]} enrollment cohorts.'
+            )
+        )
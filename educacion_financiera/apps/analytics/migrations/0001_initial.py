@@ -0,0 +1,61 @@
+# Generated by Django 5.1.9 on 2026-10-18 11:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('courses', '0008_analytics_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CourseDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Date')),
+                ('enrollments', models.PositiveIntegerField(default=0, verbose_name='Enrollments')),
+                ('lesson_starts', models.PositiveIntegerField(default=0, verbose_name='Lesson Starts')),
+                ('lesson_completions', models.PositiveIntegerField(default=0, verbose_name='Lesson Completions')),
+                ('certificates', models.PositiveIntegerField(default=0, verbose_name='Certificates')),
+                ('payments', models.PositiveIntegerField(default=0, verbose_name='Payments')),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Revenue')),
+                ('time_spent', models.PositiveBigIntegerField(default=0, help_text='Study time credited on this day', verbose_name='Time Spent (seconds)')),
+                ('cohort_started', models.PositiveIntegerField(default=0, verbose_name='Cohort Started')),
+                ('cohort_halfway', models.PositiveIntegerField(default=0, verbose_name='Cohort Halfway')),
+                ('cohort_completed', models.PositiveIntegerField(default=0, verbose_name='Cohort Completed')),
+                ('modified', models.DateTimeField(auto_now=True, verbose_name='Modified')),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='courses.course', verbose_name='Course')),
+            ],
+            options={
+                'verbose_name': 'Course Daily Stats',
+                'verbose_name_plural': 'Course Daily Stats',
+                'ordering': ['date'],
+                'unique_together': {('course', 'date')},
+            },
+        ),
+        migrations.CreateModel(
+            name='LessonDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Date')),
+                ('starts', models.PositiveIntegerField(default=0, verbose_name='Starts')),
+                ('completions', models.PositiveIntegerField(default=0, verbose_name='Completions')),
+                ('time_spent', models.PositiveBigIntegerField(default=0, verbose_name='Time Spent (seconds)')),
+                ('modified', models.DateTimeField(auto_now=True, verbose_name='Modified')),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lesson_daily_stats', to='courses.course', verbose_name='Course')),
+                ('lesson', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='courses.lesson', verbose_name='Lesson')),
+            ],
+            options={
+                'verbose_name': 'Lesson Daily Stats',
+                'verbose_name_plural': 'Lesson Daily Stats',
+                'ordering': ['date'],
+                'indexes': [models.Index(fields=['course', 'date'], name='lesson_stats_course_date_idx')],
+                'unique_together': {('lesson', 'date')},
+            },
+        ),
+    ]
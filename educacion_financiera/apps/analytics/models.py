@@ -0,0 +1,90 @@
+from django.db import models
+from django.utils.translation import gettext_lazy as _
+
+from educacion_financiera.apps.courses.models import Course, Lesson
+
+
+class CourseDailyStats(models.Model):
+    """
+    Activity of a course on one day, pre-aggregated by the rollup job
+    """
+    FLOW_FIELDS = (
+        "enrollments", "lesson_starts", "lesson_completions", "certificates", "payments", "revenue",
+    )
+    COHORT_FIELDS = ("cohort_started", "cohort_halfway", "cohort_completed")
+
+    course = models.ForeignKey(
+        Course,
+        related_name="daily_stats",
+        on_delete=models.CASCADE,
+        verbose_name=_("Course")
+    )
+    date = models.DateField(_("Date"))
+
+    enrollments = models.PositiveIntegerField(_("Enrollments"), default=0)
+    lesson_starts = models.PositiveIntegerField(_("Lesson Starts"), default=0)
+    lesson_completions = models.PositiveIntegerField(_("Lesson Completions"), default=0)
+    certificates = models.PositiveIntegerField(_("Certificates"), default=0)
+    payments = models.PositiveIntegerField(_("Payments"), default=0)
+    revenue = models.DecimalField(_("Revenue"), max_digits=12, decimal_places=2, default=0)
+    time_spent = models.PositiveBigIntegerField(
+        _("Time Spent (seconds)"),
+        default=0,
+        help_text=_("Study time credited on this day")
+    )
+
+    # Funnel of the students who enrolled on this day, refreshed as they progress
+    cohort_started = models.PositiveIntegerField(_("Cohort Started"), default=0)
+    cohort_halfway = models.PositiveIntegerField(_("Cohort Halfway"), default=0)
+    cohort_completed = models.PositiveIntegerField(_("Cohort Completed"), default=0)
+
+    modified = models.DateTimeField(_("Modified"), auto_now=True)
+
+    class Meta:
+        unique_together = [["course", "date"]]
+        verbose_name = _("Course Daily Stats")
+        verbose_name_plural = _("Course Daily Stats")
+        ordering = ["date"]
+
+    def __str__(self):
+        return f"{self.course} - {self.date}"
+
+
+class LessonDailyStats(models.Model):
+    """
+    Activity of a lesson on one day, pre-aggregated by the rollup job
+    """
+    FLOW_FIELDS = ("starts", "completions")
+
+    lesson = models.ForeignKey(
+        Lesson,
+        related_name="daily_stats",
+        on_delete=models.CASCADE,
+        verbose_name=_("Lesson")
+    )
+    # Denormalized so course reports do not join through modules
+    course = models.ForeignKey(
+        Course,
+        related_name="lesson_daily_stats",
+        on_delete=models.CASCADE,
+        verbose_name=_("Course")
+    )
+    date = models.DateField(_("Date"))
+
+    starts = models.PositiveIntegerField(_("Starts"), default=0)
+    completions = models.PositiveIntegerField(_("Completions"), default=0)
+    time_spent = models.PositiveBigIntegerField(_("Time Spent (seconds)"), default=0)
+
+    modified = models.DateTimeField(_("Modified"), auto_now=True)
+
+    class Meta:
+        unique_together = [["lesson", "date"]]
+        verbose_name = _("Lesson Daily Stats")
+        verbose_name_plural = _("Lesson Daily Stats")
+        ordering = ["date"]
+        indexes = [
+            models.Index(fields=["course", "date"], name="lesson_stats_course_date_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.lesson} - {self.date}"
@@ -0,0 +1,120 @@
+"""
+Instructor analytics reports.
+
+Reports only read the daily rollup tables (see rollups.py) plus lesson and
+course metadata, so their cost depends on the number of days and lessons,
+not on the amount of raw progress.
+"""
+from datetime import timedelta
+
+from django.db.models import Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from educacion_financiera.apps.courses.models import Course, Lesson
+
+from .models import CourseDailyStats, LessonDailyStats
+
+DEFAULT_PERIOD_DAYS = 30
+MAX_PERIOD_DAYS = 365
+TOTAL_FIELDS = (*CourseDailyStats.FLOW_FIELDS, "time_spent", *CourseDailyStats.COHORT_FIELDS)
+
+
+def analytics_courses(user):
+    """Courses whose analytics the user may see"""
+    if user.is_staff:
+        return Course.objects.all()
+    if user.is_teacher:
+        return Course.objects.filter(instructor=user)
+    return Course.objects.none()
+
+
+def period(days=None):
+    """First and last day of a period ending today"""
+    try:
+        days = min(max(int(days), 1), MAX_PERIOD_DAYS)
+    except (TypeError, ValueError):
+        days = DEFAULT_PERIOD_DAYS
+    end = timezone.localdate()
+    return end - timedelta(days=days - 1), end
+
+
+def _sums(model, fields):
+    return {
+        field: Coalesce(Sum(field), 0, output_field=model._meta.get_field(field)) for field in fields
+    }
+
+
+def _rate(part, total):
+    return round(part / total * 100, 1) if total else 0
+
+
+def funnel(totals):
+    """Stages of the students who enrolled in the period"""
+    enrolled = totals["enrollments"]
+    stages = [
+        ("enrolled", enrolled),
+        ("started", totals["cohort_started"]),
+        ("halfway", totals["cohort_halfway"]),
+        ("completed", totals["cohort_completed"]),
+    ]
+    return [{"stage": stage, "students": count, "rate": _rate(count, enrolled)} for stage, count in stages]
+
+
+def overview(user, start, end):
+    """Totals of the period for every course the user may see"""
+    courses = analytics_courses(user).order_by("title").values("id", "slug", "title")
+    totals = {
+        row["course"]: row
+        for row in CourseDailyStats.objects.filter(
+            course__in=analytics_courses(user), date__range=(start, end)
+        ).order_by().values("course").annotate(**_sums(CourseDailyStats, TOTAL_FIELDS))
+    }
+    empty = dict.fromkeys(TOTAL_FIELDS, 0)
+    return [
+        {**course, **{field: totals.get(course["id"], empty)[field] for field in TOTAL_FIELDS}}
+        for course in courses
+    ]
+
+
+def course_report(course, start, end):
+    """Totals, daily series, enrollment funnel and lesson drop-off of a course"""
+    stats = CourseDailyStats.objects.filter(course=course, date__range=(start, end))
+    totals = stats.aggregate(**_sums(CourseDailyStats, TOTAL_FIELDS))
+    daily = list(stats.order_by("date").values("date", *CourseDailyStats.FLOW_FIELDS, "time_spent"))
+
+    activity = {
+        row["lesson"]: row
+        for row in LessonDailyStats.objects.filter(course=course, date__range=(start, end)).order_by().values(
+            "lesson"
+        ).annotate(**_sums(LessonDailyStats, ("starts", "completions", "time_spent")))
+    }
+    lessons = []
+    first_starts = None
+    for lesson in Lesson.objects.filter(module__course=course).order_by("module__order", "order").values(
+        "id", "title", "module__title"
+    ):
+        row = activity.get(lesson["id"], {"starts": 0, "completions": 0, "time_spent": 0})
+        if first_starts is None:
+            first_starts = row["starts"]
+        lessons.append({
+            "id": lesson["id"],
+            "title": lesson["title"],
+            "module": lesson["module__title"],
+            "starts": row["starts"],
+            "completions": row["completions"],
+            "time_spent": row["time_spent"],
+            "completion_rate": _rate(row["completions"], row["starts"]),
+            # Share of the students starting the first lesson who reached this one
+            "retention": _rate(row["starts"], first_starts),
+        })
+
+    return {
+        "course": {"id": course.id, "slug": course.slug, "title": course.title},
+        "start": start,
+        "end": end,
+        "totals": totals,
+        "funnel": funnel(totals),
+        "daily": daily,
+        "lessons": lessons,
+    }
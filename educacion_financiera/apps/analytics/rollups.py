@@ -0,0 +1,208 @@
+"""
+Daily analytics rollups.
+
+Raw activity (lesson progress, enrollments, certificates and payments) is
+aggregated into CourseDailyStats and LessonDailyStats, so reports read a few
+rows per course and day instead of scanning LessonProgress on request.
+
+- ``rollup_day`` recomputes the flows of one day with grouped queries over
+  that day's rows and upserts them. The incremental task runs it for today,
+  the nightly task for the last ANALYTICS_ROLLUP_DAYS days, which picks up
+  late payments and backdated offline completions.
+- ``refresh_cohorts`` recomputes the funnel of the enrollment days whose
+  students enrolled or progressed since a given time.
+- ``add_study_time`` adds the seconds of each study time flush to today's
+  rows; cumulative LessonProgress.time_spent cannot be split into days.
+"""
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import models, transaction
+from django.db.models import Case, Count, F, Q, Sum, Value, When
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from educacion_financiera.apps.courses.models import Certificate, Enrollment, Lesson, LessonProgress
+from educacion_financiera.apps.payments.models import Payment
+
+from .models import CourseDailyStats, LessonDailyStats
+
+WATERMARK_CACHE_KEY = "analytics:rollup:watermark"
+
+
+def day_range(day):
+    """Start and end of a local day"""
+    start = timezone.make_aware(datetime.combine(day, time.min))
+    return start, start + timedelta(days=1)
+
+
+def _in_day(field, day):
+    start, end = day_range(day)
+    return Q(**{f"{field}__gte": start, f"{field}__lt": end})
+
+
+@transaction.atomic
+def rollup_day(day):
+    """Recompute the flows of every course and lesson on a day"""
+    lessons = defaultdict(lambda: dict.fromkeys(LessonDailyStats.FLOW_FIELDS, 0))
+    courses = defaultdict(lambda: dict.fromkeys(CourseDailyStats.FLOW_FIELDS, 0))
+    course_by_lesson = {}
+
+    progress = LessonProgress.objects.order_by().values("lesson", "lesson__module__course")
+    for field, course_field, condition in (
+        ("starts", "lesson_starts", _in_day("created", day)),
+        ("completions", "lesson_completions", Q(is_completed=True) & _in_day("completed_at", day)),
+    ):
+        for row in progress.filter(condition).annotate(total=Count("id")):
+            course_id = course_by_lesson[row["lesson"]] = row["lesson__module__course"]
+            lessons[row["lesson"]][field] = row["total"]
+            courses[course_id][course_field] += row["total"]
+
+    for row in Enrollment.objects.filter(_in_day("date_enrolled", day)).order_by().values("course").annotate(
+        total=Count("id")
+    ):
+        courses[row["course"]]["enrollments"] = row["total"]
+    for row in Certificate.objects.filter(_in_day("issue_date", day)).order_by().values("course").annotate(
+        total=Count("id")
+    ):
+        courses[row["course"]]["certificates"] = row["total"]
+    for row in Payment.objects.filter(
+        _in_day("created", day), status="completed", course__isnull=False
+    ).order_by().values("course").annotate(total=Count("id"), amount=Sum("amount")):
+        courses[row["course"]].update(payments=row["total"], revenue=row["amount"])
+
+    LessonDailyStats.objects.bulk_create(
+        [
+            LessonDailyStats(lesson_id=lesson_id, course_id=course_by_lesson[lesson_id], date=day, **values)
+            for lesson_id, values in lessons.items()
+        ],
+        update_conflicts=True,
+        unique_fields=["lesson", "date"],
+        update_fields=[*LessonDailyStats.FLOW_FIELDS, "modified"],
+    )
+    CourseDailyStats.objects.bulk_create(
+        [CourseDailyStats(course_id=course_id, date=day, **values) for course_id, values in courses.items()],
+        update_conflicts=True,
+        unique_fields=["course", "date"],
+        update_fields=[*CourseDailyStats.FLOW_FIELDS, "modified"],
+    )
+
+    # Activity that is gone (refunds, deleted records) no longer counts
+    LessonDailyStats.objects.filter(date=day).exclude(lesson_id__in=lessons).update(
+        **dict.fromkeys(LessonDailyStats.FLOW_FIELDS, 0)
+    )
+    CourseDailyStats.objects.filter(date=day).exclude(course_id__in=courses).update(
+        **dict.fromkeys(CourseDailyStats.FLOW_FIELDS, 0)
+    )
+    return len(courses)
+
+
+@transaction.atomic
+def refresh_cohorts(since):
+    """
+    Recompute the funnel (started, halfway, completed) of the enrollment days
+    with students who enrolled or progressed since the given time
+    """
+    touched = Enrollment.objects.filter(
+        Q(date_enrolled__gte=since) | Q(last_activity__gte=since)
+    ).annotate(day=TruncDate("date_enrolled")).order_by().values_list("course", "day").distinct()
+    days_by_course = defaultdict(set)
+    for course_id, day in touched:
+        days_by_course[course_id].add(day)
+    if not days_by_course:
+        return 0
+
+    condition = Q()
+    for course_id, days in days_by_course.items():
+        condition |= Q(course_id=course_id, day__in=days)
+    funnels = Enrollment.objects.annotate(day=TruncDate("date_enrolled")).filter(condition).order_by().values(
+        "course", "day"
+    ).annotate(
+        enrolled=Count("id"),
+        # Every lesson progress update records activity on the enrollment
+        started=Count("id", filter=Q(last_activity__isnull=False)),
+        halfway=Count("id", filter=Q(progress__gte=50)),
+        completed=Count("id", filter=Q(progress__gte=100)),
+    )
+
+    rows = [
+        CourseDailyStats(
+            course_id=funnel["course"],
+            date=funnel["day"],
+            enrollments=funnel["enrolled"],
+            cohort_started=funnel["started"],
+            cohort_halfway=funnel["halfway"],
+            cohort_completed=funnel["completed"],
+        )
+        for funnel in funnels
+    ]
+    CourseDailyStats.objects.bulk_create(
+        rows,
+        update_conflicts=True,
+        unique_fields=["course", "date"],
+        update_fields=[*CourseDailyStats.COHORT_FIELDS, "modified"],
+    )
+    return len(rows)
+
+
+def _add_seconds(model, key, seconds_by_key, day):
+    model.objects.filter(date=day, **{f"{key}__in": seconds_by_key}).update(
+        time_spent=F("time_spent") + Case(
+            *[When(**{key: pk}, then=Value(seconds)) for pk, seconds in seconds_by_key.items()],
+            default=Value(0),
+            output_field=models.BigIntegerField(),
+        )
+    )
+
+
+@transaction.atomic
+def add_study_time(lesson_seconds, day=None):
+    """Add flushed study time, in seconds per lesson, to the day's rows"""
+    day = day or timezone.localdate()
+    course_by_lesson = dict(
+        Lesson.objects.filter(pk__in=lesson_seconds).values_list("pk", "module__course_id")
+    )
+    course_seconds = defaultdict(int)
+    for lesson_id, course_id in course_by_lesson.items():
+        course_seconds[course_id] += lesson_seconds[lesson_id]
+    if not course_seconds:
+        return
+
+    LessonDailyStats.objects.bulk_create([
+        LessonDailyStats(lesson_id=lesson_id, course_id=course_id, date=day)
+        for lesson_id, course_id in course_by_lesson.items()
+    ], ignore_conflicts=True)
+    CourseDailyStats.objects.bulk_create([
+        CourseDailyStats(course_id=course_id, date=day) for course_id in course_seconds
+    ], ignore_conflicts=True)
+    _add_seconds(LessonDailyStats, "lesson_id", {pk: lesson_seconds[pk] for pk in course_by_lesson}, day)
+    _add_seconds(CourseDailyStats, "course_id", course_seconds, day)
+
+
+def rollup_recent():
+    """Incremental run: today's flows and the cohorts touched since the last run"""
+    now = timezone.now()
+    since = cache.get(WATERMARK_CACHE_KEY) or now - timedelta(days=1)
+    courses = rollup_day(timezone.localdate(now))
+    cohorts = refresh_cohorts(since)
+    cache.set(WATERMARK_CACHE_KEY, now, None)
+    return {"courses": courses, "cohorts": cohorts}
+
+
+def rollup_range(start, end):
+    """Recompute every day from start to end, both included"""
+    courses = 0
+    day = start
+    while day <= end:
+        courses += rollup_day(day)
+        day += timedelta(days=1)
+    cohorts = refresh_cohorts(day_range(start)[0])
+    return {"courses": courses, "cohorts": cohorts}
+
+
+def rollup_nightly():
+    """Final run over the last days, catching late and backdated activity"""
+    today = timezone.localdate()
+    return rollup_range(today - timedelta(days=settings.ANALYTICS_ROLLUP_DAYS), today)
@@ -0,0 +1,13 @@
+from django.dispatch import receiver
+
+from educacion_financiera.apps.courses.signals import study_time_flushed
+
+from .rollups import add_study_time
+
+
+@receiver(study_time_flushed)
+def count_study_time(sender, lesson_seconds, **kwargs):
+    """
+    Add flushed study time to today's analytics
+    """
+    add_study_time(lesson_seconds)
@@ -0,0 +1,15 @@
+from celery import shared_task
+
+from .rollups import rollup_nightly, rollup_recent
+
+
+@shared_task()
+def rollup_recent_analytics():
+    """Refresh today's analytics and the cohorts that progressed since the last run"""
+    return rollup_recent()
+
+
+@shared_task()
+def rollup_nightly_analytics():
+    """Recompute the analytics of the last days"""
+    return rollup_nightly()
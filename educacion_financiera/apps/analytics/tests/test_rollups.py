@@ -0,0 +1,133 @@
+from datetime import timedelta
+from decimal import Decimal
+
+import pytest
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from educacion_financiera.apps.analytics.models import CourseDailyStats
+from educacion_financiera.apps.analytics.models import LessonDailyStats
+from educacion_financiera.apps.analytics.reports import course_report
+from educacion_financiera.apps.analytics.rollups import add_study_time
+from educacion_financiera.apps.analytics.rollups import rollup_day
+from educacion_financiera.apps.analytics.rollups import rollup_range
+from educacion_financiera.apps.courses.models import Certificate
+from educacion_financiera.apps.courses.models import Enrollment
+from educacion_financiera.apps.courses.models import LessonProgress
+from educacion_financiera.apps.courses.study_time import LocalStudyTimeBuffer
+from educacion_financiera.apps.courses.study_time import flush_study_time
+from educacion_financiera.apps.courses.tests.factories import EnrollmentFactory
+from educacion_financiera.apps.courses.tests.factories import LessonFactory
+from educacion_financiera.apps.courses.tests.factories import ModuleFactory
+from educacion_financiera.apps.payments.models import Payment
+from educacion_financiera.users.tests.factories import UserFactory
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def lessons():
+    module = ModuleFactory(course__instructor=UserFactory(is_teacher=True))
+    return LessonFactory.create_batch(2, module=module)
+
+
+def _student_progress(lessons, completed):
+    enrollment = EnrollmentFactory(course=lessons[0].module.course)
+    for lesson in lessons[:completed]:
+        LessonProgress.objects.create(student=enrollment.student, lesson=lesson).mark_completed()
+    return enrollment
+
+
+def test_rollup_day_aggregates_flows(lessons):
+    course = lessons[0].module.course
+    first = _student_progress(lessons, 2)
+    _student_progress(lessons, 1)
+    Certificate.objects.create(student=first.student, course=course)
+    Payment.objects.create(
+        user=first.student, payment_type="course", amount=Decimal("19.90"), provider="stripe",
+        provider_payment_id="cs_1", course=course, status="completed",
+    )
+    Payment.objects.create(
+        user=first.student, payment_type="course", amount=10, provider="stripe",
+        provider_payment_id="cs_2", course=course, status="pending",
+    )
+
+    rollup_day(timezone.localdate())
+
+    stats = CourseDailyStats.objects.get(course=course)
+    assert (stats.enrollments, stats.lesson_starts, stats.lesson_completions) == (2, 3, 3)
+    assert (stats.certificates, stats.payments, stats.revenue) == (1, 1, Decimal("19.90"))
+    lesson_stats = dict(LessonDailyStats.objects.values_list("lesson_id", "completions"))
+    assert lesson_stats == {lessons[0].id: 2, lessons[1].id: 1}
+
+    # Refunds disappear on the next run
+    Payment.objects.filter(status="completed").update(status="refunded")
+    rollup_day(timezone.localdate())
+    assert CourseDailyStats.objects.get(course=course).revenue == 0
+
+
+def test_cohort_funnel(lessons):
+    course = lessons[0].module.course
+    _student_progress(lessons, 2)
+    _student_progress(lessons, 1)
+    EnrollmentFactory(course=course)
+    earlier = EnrollmentFactory(course=course)
+    Enrollment.objects.filter(pk=earlier.pk).update(date_enrolled=timezone.now() - timedelta(days=3))
+
+    rollup_range(timezone.localdate() - timedelta(days=3), timezone.localdate())
+
+    today = CourseDailyStats.objects.get(course=course, date=timezone.localdate())
+    assert (today.enrollments, today.cohort_started, today.cohort_halfway, today.cohort_completed) == (3, 2, 2, 1)
+    report = course_report(course, timezone.localdate() - timedelta(days=6), timezone.localdate())
+    assert [step["students"] for step in report["funnel"]] == [4, 2, 2, 1]
+    assert [lesson["retention"] for lesson in report["lessons"]] == [100.0, 50.0]
+
+
+def test_flushed_study_time_is_added_to_the_day(user, lessons):
+    add_study_time({lessons[0].id: 30})
+    buffer = LocalStudyTimeBuffer()
+    buffer.add(user.id, lessons[0].id, 60)
+    buffer.add(user.id, lessons[1].id, 15)
+
+    flush_study_time(buffer)
+    rollup_day(timezone.localdate())
+
+    assert dict(LessonDailyStats.objects.values_list("lesson_id", "time_spent")) == {
+        lessons[0].id: 90, lessons[1].id: 15,
+    }
+    assert CourseDailyStats.objects.get().time_spent == 105
+
+
+def test_course_report_reads_only_rollups(lessons, django_assert_num_queries):
+    course = lessons[0].module.course
+    for days_ago in range(20):
+        CourseDailyStats.objects.create(
+            course=course, date=timezone.localdate() - timedelta(days=days_ago), enrollments=1
+        )
+
+    with django_assert_num_queries(4):
+        report = course_report(course, timezone.localdate() - timedelta(days=29), timezone.localdate())
+    assert report["totals"]["enrollments"] == 20
+    assert len(report["daily"]) == 20
+
+
+def test_analytics_restricted_to_instructors(user, lessons):
+    course = lessons[0].module.course
+    client = APIClient()
+    url = reverse("api:analytics_api:course-detail", kwargs={"slug": course.slug})
+
+    client.force_authenticate(user)
+    assert client.get(url).status_code == 404
+    assert client.get(reverse("api:analytics_api:course-list")).json()["results"] == []
+
+    client.force_authenticate(course.instructor)
+    response = client.get(url, {"days": 7})
+    assert response.status_code == 200
+    assert len(response.json()["lessons"]) == 2
+
+    client.force_login(course.instructor)
+    assert client.get(reverse("analytics:course", kwargs={"course_slug": course.slug})).status_code == 200
+    assert client.get(reverse("analytics:overview")).status_code == 200
+    client.force_login(user)
+    assert client.get(reverse("analytics:overview")).status_code == 403
@@ -0,0 +1,10 @@
+from django.urls import path
+
+from .views import AnalyticsOverviewView, CourseAnalyticsView
+
+app_name = "analytics"
+
+urlpatterns = [
+    path("", AnalyticsOverviewView.as_view(), name="overview"),
+    path("<slug:course_slug>/", CourseAnalyticsView.as_view(), name="course"),
+]
@@ -0,0 +1,53 @@
+from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
+from django.shortcuts import get_object_or_404
+from django.views.generic import TemplateView
+
+from .reports import analytics_courses, course_report, overview, period
+
+PERIOD_CHOICES = (7, 30, 90, 365)
+
+
+class InstructorRequiredMixin(LoginRequiredMixin, UserPassesTestMixin):
+    """
+    Restrict a view to teachers and staff
+    """
+    def test_func(self):
+        return self.request.user.is_teacher or self.request.user.is_staff
+
+
+class AnalyticsContextMixin:
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        start, end = period(self.request.GET.get("days"))
+        context.update({
+            "start": start,
+            "end": end,
+            "days": (end - start).days + 1,
+            "period_choices": PERIOD_CHOICES,
+        })
+        return context
+
+
+class AnalyticsOverviewView(InstructorRequiredMixin, AnalyticsContextMixin, TemplateView):
+    """
+    Period totals of the instructor's courses
+    """
+    template_name = "apps/analytics/overview.html"
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["courses"] = overview(self.request.user, context["start"], context["end"])
+        return context
+
+
+class CourseAnalyticsView(InstructorRequiredMixin, AnalyticsContextMixin, TemplateView):
+    """
+    Funnel, lesson drop-off and revenue of a course
+    """
+    template_name = "apps/analytics/course.html"
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        course = get_object_or_404(analytics_courses(self.request.user), slug=self.kwargs["course_slug"])
+        context["report"] = course_report(course, context["start"], context["end"])
+        return context
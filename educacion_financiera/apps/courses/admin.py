@@ -2,6 +2,8 @@ from django.contrib import admin
 from django.utils.translation import gettext_lazy as _
 from django.utils.html import format_html
 
+from educacion_financiera.exports import ExportMixin
+
 from .models import (
     Category, Course, Enrollment, Lesson, Module, Resource,
     LessonProgress, Certificate
@@ -27,18 +29,17 @@ class ModuleInline(admin.StackedInline):
 
 @admin.register(Course)
 class CourseAdmin(admin.ModelAdmin):
-    list_display = ["title", "instructor", "category", "price", "visibility", "enrollment_count", "created"]
+    list_display = [
+        "title", "instructor", "category", "price", "visibility", "active_enrollment_count", "created"
+    ]
     list_filter = ["visibility", "created", "category"]
     search_fields = ["title", "overview"]
     prepopulated_fields = {"slug": ("title",)}
     raw_id_fields = ["instructor"]
     date_hierarchy = "created"
+    readonly_fields = Course.COUNTER_FIELDS
     inlines = [ModuleInline]
 
-    def enrollment_count(self, obj):
-        return obj.enrollments.filter(active=True).count()
-    enrollment_count.short_description = _("Active Enrollments")
-
 
 class LessonInline(admin.StackedInline):
     model = Lesson
@@ -83,12 +84,27 @@ class ResourceAdmin(admin.ModelAdmin):
 
 
 @admin.register(Enrollment)
-class EnrollmentAdmin(admin.ModelAdmin):
+class EnrollmentAdmin(ExportMixin, admin.ModelAdmin):
     list_display = ["student", "course", "date_enrolled", "active", "progress_percentage"]
-    list_filter = ["active", "date_enrolled", "course__category"]
+    list_filter = ["active", "date_enrolled", "course__category", "course"]
+    list_select_related = ["student", "course"]
     search_fields = ["student__email", "course__title"]
     date_hierarchy = "date_enrolled"
     raw_id_fields = ["student", "course"]
+    readonly_fields = ["completed_lessons", "total_lessons", "progress", "last_lesson", "last_activity"]
+    export_columns = [
+        ("id", "id"),
+        ("student_id", "student_id"),
+        ("student_email", "student__email"),
+        ("course_id", "course_id"),
+        ("course", "course__title"),
+        ("date_enrolled", "date_enrolled"),
+        ("active", "active"),
+        ("completed_lessons", "completed_lessons"),
+        ("total_lessons", "total_lessons"),
+        ("progress", "progress"),
+        ("last_activity", "last_activity"),
+    ]
 
     def progress_percentage(self, obj):
         progress = obj.get_progress_percentage()
@@ -102,13 +118,25 @@ class EnrollmentAdmin(admin.ModelAdmin):
 
 
 @admin.register(LessonProgress)
-class LessonProgressAdmin(admin.ModelAdmin):
+class LessonProgressAdmin(ExportMixin, admin.ModelAdmin):
     list_display = ["student", "lesson", "is_completed", "completed_at", "time_spent_display", "modified"]
     list_filter = ["is_completed", "completed_at", "lesson__module__course"]
     search_fields = ["student__email", "lesson__title"]
     date_hierarchy = "completed_at"
     raw_id_fields = ["student", "lesson"]
     readonly_fields = ["completed_at", "created", "modified"]
+    export_columns = [
+        ("id", "id"),
+        ("student_id", "student_id"),
+        ("student_email", "student__email"),
+        ("course_id", "lesson__module__course_id"),
+        ("lesson_id", "lesson_id"),
+        ("lesson", "lesson__title"),
+        ("is_completed", "is_completed"),
+        ("completed_at", "completed_at"),
+        ("time_spent", "time_spent"),
+        ("modified", "modified"),
+    ]
 
     def time_spent_display(self, obj):
         if obj.time_spent:
@@ -125,13 +153,22 @@ class LessonProgressAdmin(admin.ModelAdmin):
 
 
 @admin.register(Certificate)
-class CertificateAdmin(admin.ModelAdmin):
+class CertificateAdmin(ExportMixin, admin.ModelAdmin):
     list_display = ["student", "course", "certificate_id", "issue_date", "is_active"]
-    list_filter = ["issue_date", "is_active", "course__category"]
+    list_filter = ["issue_date", "is_active", "course__category", "course"]
     search_fields = ["student__email", "course__title", "certificate_id"]
     date_hierarchy = "issue_date"
     raw_id_fields = ["student", "course"]
     readonly_fields = ["certificate_id", "issue_date"]
+    export_columns = [
+        ("certificate_id", "certificate_id"),
+        ("student_id", "student_id"),
+        ("student_email", "student__email"),
+        ("course_id", "course_id"),
+        ("course", "course__title"),
+        ("issue_date", "issue_date"),
+        ("is_active", "is_active"),
+    ]
 
     def get_queryset(self, request):
         return super().get_queryset(request).select_related(
@@ -4,7 +4,8 @@ from rest_framework.routers import DefaultRouter
 from .api_views import (
     CategoryViewSet, CourseViewSet, LessonViewSet,
     UserEnrollmentsAPIView, UserCertificatesAPIView,
-    UserProgressAPIView, LessonCompleteAPIView
+    UserProgressAPIView, LessonCompleteAPIView, ProgressSyncAPIView,
+    StudyHeartbeatAPIView
 )
 
 router = DefaultRouter()
@@ -15,6 +16,11 @@ router.register(r'lessons', LessonViewSet, basename='lesson')
 app_name = 'courses_api'
 
 urlpatterns = [
+    # Lesson completion endpoint, before the router so it is not taken for a lesson pk
+    path('lessons/complete/', LessonCompleteAPIView.as_view(), name='lesson-complete'),
+    path('lessons/heartbeat/', StudyHeartbeatAPIView.as_view(), name='lesson-heartbeat'),
+    path('progress/sync/', ProgressSyncAPIView.as_view(), name='progress-sync'),
+
     # Router URLs
     path('', include(router.urls)),
 
@@ -22,7 +28,4 @@ urlpatterns = [
     path('user/enrollments/', UserEnrollmentsAPIView.as_view(), name='user-enrollments'),
     path('user/certificates/', UserCertificatesAPIView.as_view(), name='user-certificates'),
     path('user/progress/', UserProgressAPIView.as_view(), name='user-progress'),
-
-    # Lesson completion endpoint
-    path('lessons/complete/', LessonCompleteAPIView.as_view(), name='lesson-complete'),
 ]
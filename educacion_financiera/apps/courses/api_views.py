@@ -2,26 +2,52 @@ from rest_framework import status, viewsets, permissions
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from django.shortcuts import get_object_or_404
-from django.db.models import Q, Count, Prefetch
+from django.db.models import Prefetch
 from django.utils import timezone
+from django.utils.decorators import method_decorator
 
 from .models import (
     Category, Course, Module, Lesson, Enrollment,
-    LessonProgress, Certificate
+    Certificate
 )
 from .serializers import (
-    CategorySerializer, CourseListSerializer, CourseDetailSerializer,
-    ModuleSerializer, LessonSerializer, EnrollmentSerializer,
-    CertificateSerializer, LessonCompleteSerializer
+    CategorySerializer, CourseListSerializer, CourseCompactSerializer, CourseDetailSerializer,
+    InstructorSerializer,
+    ModuleSerializer, LessonSerializer, LessonDetailSerializer, EnrollmentSerializer,
+    CertificateSerializer, LessonCompleteSerializer, LessonCompletionSerializer, ProgressSyncSerializer, SequenceEntrySerializer,
+    StudyHeartbeatSerializer
 )
+from .pagination import KeysetPagination
+from .progress import NOT_ENROLLED, set_lesson_completion, sync_lesson_progress
+from .search import search_courses
+from .sequence import LessonSequence
+from .study_time import is_enrolled_in_lesson, record_heartbeat
+from .versioning import catalog_validators, conditional_view, course_validators
 
 
+def course_list_queryset(user):
+    """Courses with everything CourseListSerializer needs, for a constant query count"""
+    return Course.objects.select_related(
+        'category', 'instructor', 'instructor__profile'
+    ).with_user_progress(user)
+
+
+def course_serializer_context(request):
+    """Serializer context for nested course listings"""
+    return {
+        'request': request,
+        'category_course_counts': Category.objects.course_count_map(),
+    }
+
+
+@method_decorator(conditional_view(catalog_validators), name='list')
+@method_decorator(conditional_view(catalog_validators), name='retrieve')
+@method_decorator(conditional_view(catalog_validators), name='courses')
 class CategoryViewSet(viewsets.ReadOnlyModelViewSet):
     """
     ViewSet for course categories
     """
-    queryset = Category.objects.all()
+    queryset = Category.objects.with_course_count()
     serializer_class = CategorySerializer
     permission_classes = [permissions.AllowAny]
     lookup_field = 'slug'
@@ -30,39 +56,43 @@ class CategoryViewSet(viewsets.ReadOnlyModelViewSet):
     def courses(self, request, slug=None):
         """Get courses for a specific category"""
         category = self.get_object()
-        courses = Course.objects.filter(
+        courses = course_list_queryset(request.user).filter(
             category=category,
             visibility='public'
-        ).select_related('category', 'instructor').annotate(
-            enrollment_count=Count('enrollments')
-        )
+        ).popular()
 
-        serializer = CourseListSerializer(courses, many=True, context={'request': request})
+        serializer = CourseListSerializer(
+            courses, many=True, context=course_serializer_context(request)
+        )
         return Response(serializer.data)
 
 
+@method_decorator(conditional_view(catalog_validators), name='list')
+@method_decorator(conditional_view(course_validators), name='retrieve')
 class CourseViewSet(viewsets.ReadOnlyModelViewSet):
     """
     ViewSet for courses
     """
     permission_classes = [permissions.AllowAny]
+    pagination_class = KeysetPagination
     lookup_field = 'slug'
 
+    # Stable orderings accepted by ?ordering=, each served by an index
+    ORDERINGS = {
+        'popularity': ('-active_enrollment_count', '-created'),
+        '-created': ('-created',),
+        'created': ('created',),
+        'price': ('price', '-created'),
+        '-price': ('-price', '-created'),
+    }
+
     def get_queryset(self):
-        queryset = Course.objects.filter(visibility='public').select_related(
-            'category', 'instructor'
-        ).annotate(
-            enrollment_count=Count('enrollments')
-        )
+        queryset = course_list_queryset(self.request.user).filter(visibility='public')
 
-        # Search functionality
+        # Search functionality, ordered by relevance unless asked otherwise
         search = self.request.query_params.get('search', None)
         if search:
-            queryset = queryset.filter(
-                Q(title__icontains=search) |
-                Q(overview__icontains=search) |
-                Q(category__name__icontains=search)
-            )
+            queryset = search_courses(queryset, search)
 
         # Category filter
         category = self.request.query_params.get('category', None)
@@ -76,17 +106,57 @@ class CourseViewSet(viewsets.ReadOnlyModelViewSet):
         elif price_filter == 'paid':
             queryset = queryset.filter(price__gt=0)
 
-        # Ordering
-        ordering = self.request.query_params.get('ordering', '-enrollment_count')
-        queryset = queryset.order_by(ordering)
+        # Ordering, by relevance when searching unless asked otherwise
+        ordering = self.ORDERINGS.get(self.request.query_params.get('ordering'))
+        if ordering:
+            queryset = queryset.order_by(*ordering)
+        elif not search:
+            queryset = queryset.popular()
 
         return queryset
 
     def get_serializer_class(self):
         if self.action == 'retrieve':
             return CourseDetailSerializer
+        if self.action == 'list':
+            return CourseCompactSerializer
         return CourseListSerializer
 
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context.update(course_serializer_context(self.request))
+        fields = self.request.query_params.get('fields')
+        if fields:
+            context['fields'] = [name.strip() for name in fields.split(',') if name.strip()]
+        return context
+
+    def list(self, request, *args, **kwargs):
+        """
+        Courses in pages of a keyset cursor, with their categories and
+        instructors side-loaded once in ``included``
+        """
+        page = self.paginate_queryset(self.filter_queryset(self.get_queryset()))
+        serializer = self.get_serializer(page, many=True)
+        response = self.get_paginated_response(serializer.data)
+        response.data['included'] = self.get_included(page, serializer.child)
+        return response
+
+    def get_included(self, courses, serializer):
+        """Distinct related objects of the serialized fields of a page"""
+        context = serializer.context
+        included = {}
+        if 'category' in serializer.fields:
+            categories = {course.category_id: course.category for course in courses}
+            included['categories'] = CategorySerializer(
+                categories.values(), many=True, context=context
+            ).data
+        if 'instructor' in serializer.fields:
+            instructors = {course.instructor_id: course.instructor for course in courses}
+            included['instructors'] = InstructorSerializer(
+                instructors.values(), many=True, context=context
+            ).data
+        return included
+
     @action(detail=True, methods=['post'], permission_classes=[permissions.IsAuthenticated])
     def enroll(self, request, slug=None):
         """Enroll user in a course"""
@@ -147,28 +217,24 @@ class CourseViewSet(viewsets.ReadOnlyModelViewSet):
         course = self.get_object()
 
         # Check if user is enrolled
-        if not Enrollment.objects.filter(
+        enrollment = Enrollment.objects.filter(
             course=course, student=request.user, active=True
-        ).exists():
+        ).first()
+        if enrollment is None:
             return Response(
                 {'error': 'Not enrolled in this course'},
                 status=status.HTTP_403_FORBIDDEN
             )
 
-        progress_percentage = course.get_progress_for_user(request.user)
-        total_lessons = course.get_total_lessons()
-        completed_lessons = LessonProgress.objects.filter(
-            lesson__module__course=course,
-            student=request.user,
-            is_completed=True
-        ).count()
+        resume_lesson = LessonSequence.for_course(course.id).resume_point(enrollment.last_lesson_id)
 
         return Response({
             'course_id': course.id,
-            'progress_percentage': progress_percentage,
-            'total_lessons': total_lessons,
-            'completed_lessons': completed_lessons,
-            'lessons_remaining': total_lessons - completed_lessons
+            'progress_percentage': enrollment.progress,
+            'total_lessons': enrollment.total_lessons,
+            'completed_lessons': enrollment.completed_lessons,
+            'lessons_remaining': enrollment.lessons_remaining,
+            'resume_lesson': SequenceEntrySerializer(resume_lesson).data if resume_lesson else None
         })
 
 
@@ -184,6 +250,11 @@ class LessonViewSet(viewsets.ReadOnlyModelViewSet):
             'module', 'module__course'
         ).prefetch_related('resources')
 
+    def get_serializer_class(self):
+        if self.action == 'retrieve':
+            return LessonDetailSerializer
+        return LessonSerializer
+
     def retrieve(self, request, *args, **kwargs):
         lesson = self.get_object()
 
@@ -205,51 +276,22 @@ class LessonViewSet(viewsets.ReadOnlyModelViewSet):
         """Mark lesson as completed"""
         lesson = self.get_object()
 
-        # Check enrollment
-        if not Enrollment.objects.filter(
-            course=lesson.module.course,
-            student=request.user,
-            active=True
-        ).exists():
+        serializer = LessonCompletionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        result = set_lesson_completion(
+            request.user, lesson.id, time_spent=serializer.validated_data['time_spent']
+        )
+        if result['status'] == NOT_ENROLLED:
             return Response(
                 {'error': 'Not enrolled in this course'},
                 status=status.HTTP_403_FORBIDDEN
             )
 
-        # Get or create progress
-        progress, created = LessonProgress.objects.get_or_create(
-            student=request.user,
-            lesson=lesson
-        )
-
-        # Update time spent if provided
-        time_spent = request.data.get('time_spent', 0)
-        if time_spent:
-            progress.time_spent += time_spent
-
-        # Mark as completed
-        if not progress.is_completed:
-            progress.mark_completed()
-
-            # Update user profile activity
-            if hasattr(request.user, 'profile'):
-                request.user.profile.update_activity_streak()
-
-        # Check for course completion
-        course_progress = lesson.module.course.get_progress_for_user(request.user)
-        certificate_awarded = False
-
-        if course_progress == 100:
-            certificate, created = Certificate.objects.get_or_create(
-                student=request.user,
-                course=lesson.module.course
-            )
-            certificate_awarded = created
-
         return Response({
             'completed': True,
-            'course_progress': course_progress,
-            'certificate_awarded': certificate_awarded,
+            'course_progress': result['course_progress'],
+            'certificate_awarded': result['certificate_awarded'],
             'message': 'Lesson marked as completed'
         })
 
@@ -264,9 +306,13 @@ class UserEnrollmentsAPIView(APIView):
         enrollments = Enrollment.objects.filter(
             student=request.user,
             active=True
-        ).select_related('course', 'course__category', 'course__instructor')
+        ).prefetch_related(
+            Prefetch('course', queryset=course_list_queryset(request.user))
+        )
 
-        serializer = EnrollmentSerializer(enrollments, many=True, context={'request': request})
+        serializer = EnrollmentSerializer(
+            enrollments, many=True, context=course_serializer_context(request)
+        )
         return Response(serializer.data)
 
 
@@ -280,9 +326,13 @@ class UserCertificatesAPIView(APIView):
         certificates = Certificate.objects.filter(
             student=request.user,
             is_active=True
-        ).select_related('course', 'course__category')
+        ).prefetch_related(
+            Prefetch('course', queryset=course_list_queryset(request.user))
+        )
 
-        serializer = CertificateSerializer(certificates, many=True, context={'request': request})
+        serializer = CertificateSerializer(
+            certificates, many=True, context=course_serializer_context(request)
+        )
         return Response(serializer.data)
 
 
@@ -297,31 +347,24 @@ class UserProgressAPIView(APIView):
         enrollments = Enrollment.objects.filter(
             student=request.user,
             active=True
-        ).select_related('course')
+        )
 
-        # Calculate statistics
-        total_courses = enrollments.count()
+        # Calculate statistics from the denormalized enrollment counters
+        enrollments = list(enrollments)
+        total_courses = len(enrollments)
         completed_courses = 0
         total_progress = 0
         total_lessons = 0
         completed_lessons = 0
 
         for enrollment in enrollments:
-            course_progress = enrollment.course.get_progress_for_user(request.user)
-            total_progress += course_progress
+            total_progress += enrollment.progress
 
-            if course_progress == 100:
+            if enrollment.progress == 100:
                 completed_courses += 1
 
-            course_total_lessons = enrollment.course.get_total_lessons()
-            total_lessons += course_total_lessons
-
-            course_completed_lessons = LessonProgress.objects.filter(
-                lesson__module__course=enrollment.course,
-                student=request.user,
-                is_completed=True
-            ).count()
-            completed_lessons += course_completed_lessons
+            total_lessons += enrollment.total_lessons
+            completed_lessons += enrollment.completed_lessons
 
         # Calculate averages
         avg_progress = round(total_progress / total_courses, 1) if total_courses > 0 else 0
@@ -363,49 +406,59 @@ class LessonCompleteAPIView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def post(self, request):
-        serializer = LessonCompleteSerializer(data=request.data, context={'request': request})
+        serializer = LessonCompleteSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        lesson_id = serializer.validated_data['lesson_id']
+
+        result = set_lesson_completion(
+            request.user, lesson_id, time_spent=serializer.validated_data['time_spent']
+        )
+        if result['status'] == NOT_ENROLLED:
+            return Response(
+                {'lesson_id': ['Not enrolled in this course']},
+                status=status.HTTP_400_BAD_REQUEST
+            )
 
-        if serializer.is_valid():
-            lesson_id = serializer.validated_data['lesson_id']
-            time_spent = serializer.validated_data.get('time_spent', 0)
+        return Response({
+            'success': True,
+            'lesson_id': lesson_id,
+            'completed': result['completed'],
+            'course_progress': result['course_progress'],
+            'certificate_awarded': result['certificate_awarded']
+        })
 
-            lesson = get_object_or_404(Lesson, id=lesson_id)
 
-            # Get or create progress
-            progress, created = LessonProgress.objects.get_or_create(
-                student=request.user,
-                lesson=lesson
-            )
+class ProgressSyncAPIView(APIView):
+    """
+    Apply a batch of lesson progress events, for clients that studied offline
+    """
+    permission_classes = [permissions.IsAuthenticated]
 
-            # Update time spent
-            if time_spent:
-                progress.time_spent += time_spent
+    def post(self, request):
+        serializer = ProgressSyncSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
 
-            # Mark as completed
-            if not progress.is_completed:
-                progress.mark_completed()
+        result = sync_lesson_progress(request.user, serializer.validated_data['events'])
+        return Response(result)
 
-                # Update user profile
-                if hasattr(request.user, 'profile'):
-                    request.user.profile.update_activity_streak()
 
-            # Check course completion
-            course_progress = lesson.module.course.get_progress_for_user(request.user)
-            certificate_awarded = False
+class StudyHeartbeatAPIView(APIView):
+    """
+    Credit study time to a lesson while its page is open. The time is
+    buffered and written to the database in batches.
+    """
+    permission_classes = [permissions.IsAuthenticated]
 
-            if course_progress == 100:
-                certificate, created = Certificate.objects.get_or_create(
-                    student=request.user,
-                    course=lesson.module.course
-                )
-                certificate_awarded = created
+    def post(self, request):
+        serializer = StudyHeartbeatSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        lesson_id = serializer.validated_data['lesson_id']
 
-            return Response({
-                'success': True,
-                'lesson_id': lesson_id,
-                'completed': progress.is_completed,
-                'course_progress': course_progress,
-                'certificate_awarded': certificate_awarded
-            })
+        if not is_enrolled_in_lesson(request.user, lesson_id):
+            return Response(
+                {'detail': 'Debes estar inscrito en el curso para registrar tiempo de estudio.'},
+                status=status.HTTP_403_FORBIDDEN
+            )
 
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        credited = record_heartbeat(request.user, lesson_id, serializer.validated_data.get('seconds'))
+        return Response({'credited': credited}, status=status.HTTP_202_ACCEPTED)
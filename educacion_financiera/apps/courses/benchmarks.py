@@ -0,0 +1,454 @@
+"""
+Query budgets and benchmarks for the views and API endpoints.
+
+Every endpoint declares the maximum number of queries it may run for each
+role. The budgets are enforced by tests/test_query_budgets.py against a small
+synthetic dataset and reported by the ``benchmark_endpoints`` management
+command against a dataset of any size. Every named URL of the project needs
+an endpoint here or an entry in UNBENCHMARKED, which the tests check.
+
+``benchmark_completions`` measures how many lessons per second the progress
+service completes when many requests run at once, reported by the
+``benchmark_completions`` management command.
+
+URLs of third party apps (allauth, admin, API docs) are not covered. The
+sample course is free, so checkout never reaches Stripe.
+"""
+import random
+import time
+import tracemalloc
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import connection, transaction
+from django.urls import reverse
+from django.utils import timezone
+
+from educacion_financiera.apps.discussions.models import Comment, Discussion, Note
+from educacion_financiera.apps.profiles.models import Profile
+from educacion_financiera.apps.subscriptions.models import SubscriptionType
+
+from .models import Category, Course, Enrollment, Lesson, LessonProgress, Module
+from .progress import APPLIED, set_lesson_completion
+
+User = get_user_model()
+
+ROLES = ("anonymous", "student", "teacher")
+
+
+class Endpoint:
+    """
+    An URL to benchmark with its query budget per role
+    """
+    def __init__(self, url_name, budgets, kwargs=None, method="get", data=None, content_type=None):
+        self.url_name = url_name
+        self.budgets = budgets
+        self.kwargs = kwargs or (lambda dataset, user: {})
+        self.method = method
+        self.data = data
+        self.content_type = content_type
+
+    def __str__(self):
+        return f"{self.method.upper()} {self.url_name}"
+
+    def get_url(self, dataset, user):
+        return reverse(self.url_name, kwargs=self.kwargs(dataset, user))
+
+
+def _course(dataset, user):
+    return {"slug": dataset["course"].slug}
+
+
+def _course_slug(dataset, user):
+    return {"course_slug": dataset["course"].slug}
+
+
+def _module(dataset, user):
+    return {"course_slug": dataset["course"].slug, "module_id": dataset["module"].id}
+
+
+def _lesson(dataset, user):
+    return {**_module(dataset, user), "pk": dataset["lesson"].id}
+
+
+def _lesson_id(dataset, user):
+    return {"lesson_id": dataset["lesson"].id}
+
+
+def _lesson_pk(dataset, user):
+    return {"pk": dataset["lesson"].id}
+
+
+def _category(dataset, user):
+    return {"slug": dataset["category"].slug}
+
+
+def _discussion(dataset, user):
+    return {"pk": dataset["discussion"].id}
+
+
+def _subscription_type(dataset, user):
+    return {"subscription_type_id": dataset["subscription_type"].id}
+
+
+def _user(dataset, user):
+    return {"pk": (user or dataset["student"]).pk}
+
+
+# Dataset the budgets below were measured against
+BUDGET_DATASET = {
+    "users": 6,
+    "courses": 4,
+    "modules_per_course": 2,
+    "lessons_per_module": 3,
+    "enrollments_per_user": 3,
+}
+
+
+# Budgets are measured against BUDGET_DATASET with a cold cache; lower them as
+# endpoints get cheaper
+ENDPOINTS = [
+    # Pages
+    Endpoint("home", {"anonymous": 2, "student": 4, "teacher": 4}),
+    Endpoint("about", {"anonymous": 2, "student": 8, "teacher": 7}),
+    Endpoint("users:detail", {"anonymous": 2, "student": 20, "teacher": 12}, kwargs=_user),
+    Endpoint("users:update", {"anonymous": 2, "student": 9, "teacher": 8}),
+    Endpoint("users:redirect", {"anonymous": 2, "student": 4, "teacher": 4}),
+    Endpoint("dashboard:home", {"anonymous": 2, "student": 16, "teacher": 14}),
+    Endpoint("dashboard:course_search", {"anonymous": 2, "student": 12, "teacher": 11}),
+    Endpoint("dashboard:certificates", {"anonymous": 2, "student": 12, "teacher": 11}),
+    Endpoint("dashboard:notes", {"anonymous": 2, "student": 11, "teacher": 9}),
+    Endpoint("dashboard:notes_export", {"anonymous": 2, "student": 4, "teacher": 4}),
+    Endpoint("courses:course_list", {"anonymous": 5, "student": 12, "teacher": 11}),
+    Endpoint("courses:category_detail", {"anonymous": 10, "student": 17, "teacher": 16}, kwargs=_category),
+    Endpoint("courses:course_detail", {"anonymous": 11, "student": 20, "teacher": 19}, kwargs=_course),
+    Endpoint("courses:module_detail", {"anonymous": 2, "student": 21, "teacher": 6}, kwargs=_module),
+    Endpoint("courses:lesson_detail", {"anonymous": 2, "student": 28, "teacher": 6}, kwargs=_lesson),
+    Endpoint("courses:course_enroll", {"anonymous": 2, "student": 6, "teacher": 12},
+             kwargs=_course_slug, method="post"),
+    Endpoint("courses:course_unenroll", {"anonymous": 2, "student": 8, "teacher": 6},
+             kwargs=_course_slug, method="post"),
+    Endpoint("courses:mark_lesson_complete", {"anonymous": 2, "student": 13, "teacher": 8},
+             kwargs=_lesson_id, method="post"),
+    Endpoint("analytics:overview", {"anonymous": 2, "student": 9, "teacher": 9}),
+    Endpoint("analytics:course", {"anonymous": 2, "student": 9, "teacher": 12}, kwargs=_course_slug),
+    Endpoint("payments:course_checkout", {"anonymous": 2, "student": 6, "teacher": 15}, kwargs=_course_slug),
+    Endpoint("payments:course_checkout", {"anonymous": 2, "student": 6, "teacher": 15},
+             kwargs=_course_slug, method="post"),
+    Endpoint("payments:subscription_checkout", {"anonymous": 2, "student": 10, "teacher": 9},
+             kwargs=_subscription_type),
+    Endpoint("payments:payment_success", {"anonymous": 2, "student": 8, "teacher": 7}),
+    Endpoint("payments:payment_cancel", {"anonymous": 2, "student": 8, "teacher": 7}),
+    Endpoint("metrics", {"anonymous": 3, "student": 9, "teacher": 8}),
+    # API
+    Endpoint("api:user-me", {"anonymous": 3, "student": 4, "teacher": 4}),
+    Endpoint("api:user-list", {"anonymous": 3, "student": 5, "teacher": 5}),
+    Endpoint("api:user-detail", {"anonymous": 3, "student": 5, "teacher": 5}, kwargs=_user),
+    Endpoint("api:courses_api:category-list", {"anonymous": 5, "student": 8, "teacher": 8}),
+    Endpoint("api:courses_api:category-detail", {"anonymous": 5, "student": 8, "teacher": 8}, kwargs=_category),
+    Endpoint("api:courses_api:category-courses", {"anonymous": 7, "student": 10, "teacher": 10},
+             kwargs=_category),
+    Endpoint("api:courses_api:course-list", {"anonymous": 6, "student": 9, "teacher": 9}),
+    Endpoint("api:courses_api:course-detail", {"anonymous": 8, "student": 12, "teacher": 12}, kwargs=_course),
+    Endpoint("api:courses_api:course-progress", {"anonymous": 3, "student": 7, "teacher": 6}, kwargs=_course),
+    Endpoint("api:courses_api:course-enroll", {"anonymous": 3, "student": 15, "teacher": 13},
+             kwargs=_course, method="post"),
+    Endpoint("api:courses_api:course-unenroll", {"anonymous": 3, "student": 8, "teacher": 6},
+             kwargs=_course, method="post"),
+    Endpoint("api:courses_api:lesson-list", {"anonymous": 3, "student": 30, "teacher": 30}),
+    Endpoint("api:courses_api:lesson-detail", {"anonymous": 3, "student": 11, "teacher": 7},
+             kwargs=_lesson_pk),
+    Endpoint("api:courses_api:lesson-complete", {"anonymous": 3, "student": 14, "teacher": 9},
+             kwargs=_lesson_pk, method="post"),
+    Endpoint("api:courses_api:lesson-complete", {"anonymous": 3, "student": 12, "teacher": 7},
+             method="post", data=lambda dataset, user: {"lesson_id": dataset["lesson"].id}),
+    Endpoint("api:courses_api:user-enrollments", {"anonymous": 3, "student": 7, "teacher": 6}),
+    Endpoint("api:courses_api:user-certificates", {"anonymous": 3, "student": 6, "teacher": 6}),
+    Endpoint("api:courses_api:user-progress", {"anonymous": 3, "student": 7, "teacher": 7}),
+    Endpoint("api:courses_api:progress-sync", {"anonymous": 3, "student": 17, "teacher": 7},
+             method="post", content_type="application/json",
+             data=lambda dataset, user: {"events": [{"lesson_id": dataset["lesson"].id, "completed": True}]}),
+    Endpoint("api:courses_api:lesson-heartbeat", {"anonymous": 3, "student": 5, "teacher": 5},
+             method="post", data=lambda dataset, user: {"lesson_id": dataset["lesson"].id}),
+    Endpoint("api:discussions_api:discussion-list", {"anonymous": 3, "student": 7, "teacher": 6},
+             data=lambda dataset, user: {"lesson": dataset["lesson"].id}),
+    Endpoint("api:discussions_api:discussion-list", {"anonymous": 3, "student": 10, "teacher": 9},
+             method="post", data=lambda dataset, user: {
+                 "lesson": dataset["lesson"].id, "title": "Pregunta", "body": "¿Cómo se calcula?",
+             }),
+    Endpoint("api:discussions_api:discussion-detail", {"anonymous": 3, "student": 8, "teacher": 7},
+             kwargs=_discussion),
+    Endpoint("api:discussions_api:discussion-reply", {"anonymous": 3, "student": 14, "teacher": 13},
+             kwargs=_discussion, method="post", data=lambda dataset, user: {"body": "Gracias"}),
+    Endpoint("api:discussions_api:note-list", {"anonymous": 3, "student": 5, "teacher": 5}),
+    Endpoint("api:discussions_api:note-autosave", {"anonymous": 3, "student": 6, "teacher": 6},
+             kwargs=_lesson_id),
+    Endpoint("api:discussions_api:note-autosave", {"anonymous": 3, "student": 6, "teacher": 6},
+             kwargs=_lesson_id, method="put", content_type="application/json",
+             data=lambda dataset, user: {"version": dataset["note"].version, "content": "Ahorrar primero"}),
+    Endpoint("api:discussions_api:note-history", {"anonymous": 3, "student": 6, "teacher": 5},
+             kwargs=_lesson_id),
+    Endpoint("api:analytics_api:course-list", {"anonymous": 3, "student": 4, "teacher": 6}),
+    Endpoint("api:analytics_api:course-detail", {"anonymous": 3, "student": 5, "teacher": 9}, kwargs=_course),
+]
+
+# Named project URLs left out on purpose, with the reason
+UNBENCHMARKED = {
+    "payments:stripe_webhook": "only accepts payloads signed by Stripe",
+}
+
+
+def _batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def build_dataset(
+    users=50, courses=10, modules_per_course=3, lessons_per_module=5,
+    enrollments_per_user=3, completion_ratio=0.5, batch_size=1000, seed=0,
+):
+    """
+    Create a synthetic dataset with bulk inserts and return sample objects
+    (category, course, module, lesson, student and teacher) to build URLs,
+    and the prefix of every slug and email it created.
+    """
+    rng = random.Random(seed)
+    now = timezone.now()
+    password = make_password("benchmark")
+    prefix = f"bench-{int(now.timestamp())}"
+
+    teacher = User.objects.create(
+        email=f"{prefix}-teacher@example.com", name="Benchmark Teacher",
+        is_teacher=True, is_student=False, password=password,
+    )
+
+    categories = Category.objects.bulk_create(
+        Category(name=f"Category {i}", slug=f"{prefix}-category-{i}")
+        for i in range(max(courses // 10, 1))
+    )
+    course_objects = Course.objects.bulk_create(
+        Course(
+            title=f"Course {i}", slug=f"{prefix}-course-{i}", overview=f"Overview of course {i}",
+            category=categories[i % len(categories)], instructor=teacher,
+            price=0, visibility="public",
+        )
+        for i in range(courses)
+    )
+    modules = Module.objects.bulk_create(
+        (
+            Module(course=course, title=f"Module {i}", order=i)
+            for course in course_objects
+            for i in range(modules_per_course)
+        ),
+        batch_size=batch_size,
+    )
+    lesson_ids_by_course = {course.id: [] for course in course_objects}
+    for batch in _batched(
+        (
+            Lesson(module=module, title=f"Lesson {i}", description=f"Lesson {i}", order=i)
+            for module in modules
+            for i in range(lessons_per_module)
+        ),
+        batch_size,
+    ):
+        for lesson in Lesson.objects.bulk_create(batch):
+            lesson_ids_by_course[lesson.module.course_id].append(lesson.id)
+
+    students = []
+    for batch in _batched(
+        (
+            User(email=f"{prefix}-student-{i}@example.com", name=f"Student {i}", password=password)
+            for i in range(users)
+        ),
+        batch_size,
+    ):
+        students.extend(User.objects.bulk_create(batch))
+    Profile.objects.bulk_create(
+        (Profile(user=student) for student in students), batch_size=batch_size,
+    )
+    Profile.objects.filter(user=teacher).update(role="instructor")
+
+    enrolled = [
+        (student, course)
+        for student in students
+        for course in rng.sample(course_objects, min(enrollments_per_user, len(course_objects)))
+    ]
+    for batch in _batched(
+        (Enrollment(student=student, course=course) for student, course in enrolled), batch_size,
+    ):
+        Enrollment.objects.bulk_create(batch)
+    for batch in _batched(
+        (
+            LessonProgress(
+                student=student, lesson_id=lesson_id, is_completed=True,
+                completed_at=now, time_spent=rng.randint(60, 1800),
+            )
+            for student, course in enrolled
+            for lesson_id in lesson_ids_by_course[course.id]
+            if rng.random() < completion_ratio
+        ),
+        batch_size,
+    ):
+        LessonProgress.objects.bulk_create(batch)
+    Enrollment.objects.filter(course__in=course_objects).recalculate_progress()
+    Course.objects.filter(pk__in=[course.pk for course in course_objects]).recalculate_counters()
+
+    # The first student is enrolled in the sample course, asked about its
+    # first lesson and took a note on it
+    course = enrolled[0][1] if enrolled else course_objects[0]
+    module = course.modules.order_by("order").first()
+    lesson = module.lessons.order_by("order").first() if module else None
+    student = students[0] if students else None
+    discussion = note = None
+    if lesson and student:
+        discussion = Discussion.objects.create(
+            lesson=lesson, title="Duda", body="¿Cuánto debo ahorrar?", created_by=student
+        )
+        Comment.objects.create(discussion=discussion, body="El 20% de tus ingresos", created_by=teacher)
+        note = Note.objects.create(user=student, lesson=lesson, content="Regla 50/30/20", version=1)
+    subscription_type = SubscriptionType.objects.create(
+        name=f"{prefix} plan", description="Benchmark plan", price=10, duration_days=30, features="Todo",
+    )
+    return {
+        "category": course.category,
+        "course": course,
+        "module": module,
+        "lesson": lesson,
+        "discussion": discussion,
+        "note": note,
+        "subscription_type": subscription_type,
+        "student": student,
+        "teacher": teacher,
+        "prefix": prefix,
+    }
+
+
+def measure(client, method, url, data=None, track_memory=False, content_type=None):
+    """Request an URL and record query count, SQL time, Python time and peak memory"""
+    query_times = []
+
+    def time_query(execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            query_times.append(time.perf_counter() - start)
+
+    if track_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    with connection.execute_wrapper(time_query):
+        if content_type:
+            response = getattr(client, method)(url, data, content_type=content_type)
+        else:
+            response = getattr(client, method)(url, data)
+    elapsed = time.perf_counter() - start
+    peak_memory = 0
+    if track_memory:
+        peak_memory = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    sql_time = sum(query_times)
+    return {
+        "status": response.status_code,
+        "queries": len(query_times),
+        "sql_ms": round(sql_time * 1000, 3),
+        "python_ms": round((elapsed - sql_time) * 1000, 3),
+        "total_ms": round(elapsed * 1000, 3),
+        "peak_memory_kb": round(peak_memory / 1024, 1),
+    }
+
+
+def run_benchmarks(client_class, dataset, endpoints=None, roles=ROLES, repeat=1, track_memory=True):
+    """
+    Measure every endpoint for every role. Requests run in a rolled back
+    transaction so POST endpoints leave the dataset untouched.
+    """
+    results = []
+    users = {"anonymous": None, "student": dataset["student"], "teacher": dataset["teacher"]}
+    for endpoint in endpoints or ENDPOINTS:
+        for role in roles:
+            # Errors are reported through the status code instead of aborting the run
+            client = client_class(raise_request_exception=False)
+            if users[role]:
+                client.force_login(users[role])
+            url = endpoint.get_url(dataset, users[role])
+            data = endpoint.data(dataset, users[role]) if endpoint.data else None
+            samples = []
+            for _ in range(repeat):
+                with transaction.atomic():
+                    samples.append(measure(client, endpoint.method, url, data, track_memory, endpoint.content_type))
+                    transaction.set_rollback(True)
+            best = min(samples, key=lambda sample: sample["total_ms"])
+            results.append({
+                "endpoint": str(endpoint),
+                "url": url,
+                "role": role,
+                "budget": endpoint.budgets.get(role),
+                "over_budget": best["queries"] > endpoint.budgets.get(role, best["queries"]),
+                **best,
+            })
+    return results
+
+
+def pending_completions(prefix, limit=None):
+    """(student, lesson id) pairs of a dataset whose lesson is not completed yet"""
+    lessons_by_course = defaultdict(list)
+    for course_id, lesson_id in Lesson.objects.filter(
+        module__course__slug__startswith=prefix
+    ).order_by("pk").values_list("module__course_id", "pk"):
+        lessons_by_course[course_id].append(lesson_id)
+    completed = set(LessonProgress.objects.filter(
+        lesson__module__course__slug__startswith=prefix, is_completed=True
+    ).values_list("student_id", "lesson_id"))
+
+    pairs = []
+    for student_id, course_id in Enrollment.objects.filter(
+        course__slug__startswith=prefix, active=True
+    ).order_by("student_id", "course_id").values_list("student_id", "course_id"):
+        student = User(pk=student_id)
+        pairs.extend(
+            (student, lesson_id) for lesson_id in lessons_by_course[course_id]
+            if (student_id, lesson_id) not in completed
+        )
+    return pairs[:limit]
+
+
+def benchmark_completions(pairs, workers=8):
+    """
+    Complete (student, lesson id) pairs from concurrent threads, each with its
+    own database connection, and report the throughput. Pairs are dealt out
+    in turn, so the lessons of a student are completed by different workers
+    and contend for the same enrollment lock.
+    """
+    latencies = []
+
+    def complete(batch):
+        try:
+            for student, lesson_id in batch:
+                start = time.perf_counter()
+                result = set_lesson_completion(student, lesson_id)
+                latencies.append(time.perf_counter() - start)
+                if result["status"] != APPLIED:
+                    raise RuntimeError(f"Lesson {lesson_id} was not completed: {result['status']}")
+        finally:
+            connection.close()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(complete, [pairs[worker::workers] for worker in range(workers)]))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "workers": workers,
+        "completions": len(pairs),
+        "seconds": round(elapsed, 3),
+        "completions_per_second": round(len(pairs) / elapsed, 1) if elapsed else 0,
+        "p50_ms": round(latencies[len(latencies) // 2] * 1000, 3) if latencies else 0,
+        "p99_ms": round(latencies[int(len(latencies) * 0.99)] * 1000, 3) if latencies else 0,
+    }
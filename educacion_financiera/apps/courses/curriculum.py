@@ -0,0 +1,90 @@
+"""
+Cached curriculum of a course.
+
+The user independent tree of modules, lessons and resources is serialized
+once per course version and cached under a key carrying the course
+``content_modified`` timestamp, so any content change simply starts a new
+entry (see versioning.py). The progress of a user is fetched in one query
+and merged in at response time.
+"""
+from django.core.cache import cache
+from django.db.models import Prefetch
+
+from .models import Lesson, LessonProgress, Module
+from .serializers import CurriculumModuleSerializer, LessonProgressSerializer
+
+CURRICULUM_CACHE_KEY = "courses:curriculum:{course_id}:{version}"
+# Old versions are never read again, let them expire
+CURRICULUM_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def progress_by_lesson(user, course_id):
+    """Lesson progress records of a user in a course, by lesson id"""
+    if user is None or not user.is_authenticated:
+        return {}
+    records = LessonProgress.objects.filter(student=user, lesson__module__course_id=course_id)
+    return {record.lesson_id: record for record in records}
+
+
+class Curriculum:
+    """
+    Serialized modules of a course, with their lessons and resources
+    """
+    def __init__(self, course_id, modules):
+        self.course_id = course_id
+        self.modules = modules
+
+    @classmethod
+    def build(cls, course_id):
+        modules = Module.objects.filter(course_id=course_id).prefetch_related(
+            Prefetch("lessons", queryset=Lesson.objects.prefetch_related("resources"))
+        )
+        return cls(course_id, CurriculumModuleSerializer(modules, many=True).data)
+
+    @classmethod
+    def for_course(cls, course):
+        key = CURRICULUM_CACHE_KEY.format(
+            course_id=course.pk, version=course.content_modified.timestamp()
+        )
+        modules = cache.get(key)
+        if modules is None:
+            curriculum = cls.build(course.pk)
+            cache.set(key, curriculum.modules, CURRICULUM_CACHE_TIMEOUT)
+            return curriculum
+        return cls(course.pk, modules)
+
+    def with_progress(self, user, request=None):
+        """
+        Modules with the progress of the user merged in, and absolute
+        resource URLs when a request is given
+        """
+        progress = progress_by_lesson(user, self.course_id)
+        modules = []
+        for module in self.modules:
+            lessons = []
+            completed = 0
+            for lesson in module["lessons"]:
+                record = progress.get(lesson["id"])
+                completed += bool(record and record.is_completed)
+                lessons.append({
+                    **lesson,
+                    "resources": [
+                        {**resource, "file_url": _absolute(request, resource["file_url"])}
+                        for resource in lesson["resources"]
+                    ],
+                    "progress": LessonProgressSerializer(record).data if record else None,
+                })
+
+            total = module["lessons_count"]
+            modules.append({
+                **module,
+                "lessons": lessons,
+                "progress": round(completed / total * 100, 1) if total else 0,
+            })
+        return modules
+
+
+def _absolute(request, url):
+    if url and request is not None:
+        return request.build_absolute_uri(url)
+    return url
@@ -0,0 +1,74 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from educacion_financiera.apps.courses.benchmarks import (
+    User, benchmark_completions, build_dataset, pending_completions,
+)
+from educacion_financiera.apps.courses.models import Course, Enrollment
+
+
+class Command(BaseCommand):
+    help = 'Benchmark concurrent lesson completions through the progress service and report JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--courses', type=int, default=20)
+        parser.add_argument('--enrollments-per-user', type=int, default=2)
+        parser.add_argument('--completions', type=int, default=2000, help='Completions per run')
+        parser.add_argument(
+            '--workers', type=int, action='append',
+            help='Concurrent workers of a run, repeat to compare (default 1, 4 and 8)',
+        )
+        parser.add_argument(
+            '--keep-data',
+            action='store_true',
+            help='Keep the generated dataset instead of deleting it',
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Concurrent completions need PostgreSQL row locks.')
+
+        # Workers use their own connections, so the dataset has to be committed
+        self.stderr.write('Building dataset...')
+        dataset = build_dataset(
+            users=options['users'],
+            courses=options['courses'],
+            enrollments_per_user=options['enrollments_per_user'],
+            completion_ratio=0,
+        )
+        prefix = dataset['prefix']
+
+        try:
+            runs = []
+            for workers in options['workers'] or [1, 4, 8]:
+                pairs = pending_completions(prefix, options['completions'])
+                if not pairs:
+                    self.stderr.write(self.style.WARNING('No lessons left to complete.'))
+                    break
+                self.stderr.write(f'Completing {len(pairs)} lessons with {workers} workers...')
+                runs.append(benchmark_completions(pairs, workers))
+
+            # Counters written under the locks must match a full recount
+            enrollments = Enrollment.objects.filter(course__slug__startswith=prefix)
+            before = set(enrollments.values_list('pk', 'completed_lessons'))
+            enrollments.recalculate_progress()
+            consistent = before == set(enrollments.values_list('pk', 'completed_lessons'))
+        finally:
+            if not options['keep_data']:
+                Course.objects.filter(slug__startswith=prefix).delete()
+                User.objects.filter(email__startswith=prefix).delete()
+
+        self.stdout.write(json.dumps({
+            'created': timezone.now().isoformat(),
+            'dataset': {
+                key: options[key] for key in ('users', 'courses', 'enrollments_per_user')
+            },
+            'consistent': consistent,
+            'runs': runs,
+        }, indent=2))
+        if not consistent:
+            raise CommandError('Enrollment counters drifted from the lesson progress records.')
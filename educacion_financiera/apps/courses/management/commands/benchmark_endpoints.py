@@ -0,0 +1,80 @@
+import json
+import platform
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from educacion_financiera.apps.courses.benchmarks import ROLES, build_dataset, run_benchmarks
+
+
+class Command(BaseCommand):
+    help = 'Benchmark every view and API endpoint against a synthetic dataset and report JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10000)
+        parser.add_argument('--courses', type=int, default=500)
+        parser.add_argument('--modules-per-course', type=int, default=10)
+        parser.add_argument('--lessons-per-module', type=int, default=10)
+        parser.add_argument('--enrollments-per-user', type=int, default=3)
+        parser.add_argument('--completion-ratio', type=float, default=0.5)
+        parser.add_argument('--repeat', type=int, default=3, help='Requests per endpoint, best is kept')
+        parser.add_argument('--role', action='append', choices=ROLES, help='Only benchmark these roles')
+        parser.add_argument('--output', help='Write the JSON report to this file instead of stdout')
+        parser.add_argument(
+            '--keep-data',
+            action='store_true',
+            help='Keep the generated dataset instead of rolling it back',
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.stderr.write('Building dataset...')
+            dataset = build_dataset(
+                users=options['users'],
+                courses=options['courses'],
+                modules_per_course=options['modules_per_course'],
+                lessons_per_module=options['lessons_per_module'],
+                enrollments_per_user=options['enrollments_per_user'],
+                completion_ratio=options['completion_ratio'],
+            )
+
+            self.stderr.write('Running benchmarks...')
+            with override_settings(ALLOWED_HOSTS=['testserver']):
+                results = run_benchmarks(
+                    Client, dataset, roles=options['role'] or ROLES, repeat=options['repeat'],
+                )
+
+            if not options['keep_data']:
+                transaction.set_rollback(True)
+
+        report = {
+            'created': timezone.now().isoformat(),
+            'database': connection.vendor,
+            'python': platform.python_version(),
+            'dataset': {
+                key: options[key] for key in (
+                    'users', 'courses', 'modules_per_course', 'lessons_per_module',
+                    'enrollments_per_user', 'completion_ratio',
+                )
+            },
+            'results': results,
+        }
+        output = json.dumps(report, indent=2)
+
+        if options['output']:
+            with open(options['output'], 'w') as report_file:
+                report_file.write(output)
+        else:
+            self.stdout.write(output)
+
+        over_budget = [result for result in results if result['over_budget']]
+        for result in over_budget:
+            self.stderr.write(self.style.ERROR(
+                f"{result['endpoint']} as {result['role']}: "
+                f"{result['queries']} queries, budget {result['budget']}"
+            ))
+        if not over_budget:
+            self.stderr.write(self.style.SUCCESS('All endpoints within their query budget.'))
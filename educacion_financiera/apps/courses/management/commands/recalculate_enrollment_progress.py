@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from educacion_financiera.apps.courses.models import Enrollment
+
+
+class Command(BaseCommand):
+    help = 'Recalculate the denormalized progress counters of enrollments'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--course',
+            help='Only recalculate enrollments of the course with this slug',
+        )
+
+    def handle(self, *args, **options):
+        enrollments = Enrollment.objects.all()
+        if options['course']:
+            enrollments = enrollments.filter(course__slug=options['course'])
+
+        updated = enrollments.recalculate_progress()
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Recalculated progress for {updated} enrollments.')
+        )
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from educacion_financiera.apps.courses.models import Course
+
+
+class Command(BaseCommand):
+    help = 'Recalculate the denormalized enrollment, completion and certificate counters of courses'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--course',
+            help='Only reconcile the course with this slug',
+        )
+
+    def handle(self, *args, **options):
+        courses = Course.objects.all()
+        if options['course']:
+            courses = courses.filter(slug=options['course'])
+
+        updated = courses.recalculate_counters()
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Reconciled counters for {updated} courses.')
+        )
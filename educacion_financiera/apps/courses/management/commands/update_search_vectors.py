@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from educacion_financiera.apps.courses.models import Course
+from educacion_financiera.apps.courses.search import is_full_text_available
+from educacion_financiera.apps.courses.search import update_search_vectors
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search vectors of courses'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--course',
+            help='Only rebuild the course with this slug',
+        )
+
+    def handle(self, *args, **options):
+        if not is_full_text_available():
+            self.stdout.write(self.style.WARNING('Full-text search needs PostgreSQL, nothing to do.'))
+            return
+
+        course_ids = None
+        if options['course']:
+            course_ids = Course.objects.filter(slug=options['course']).values('pk')
+
+        updated = update_search_vectors(course_ids)
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Rebuilt search vectors for {updated} courses.')
+        )
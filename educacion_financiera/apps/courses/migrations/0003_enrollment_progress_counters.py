@@ -0,0 +1,76 @@
+# Generated by Django 5.1.9 on 2026-10-18 10:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, FloatField, OuterRef, Subquery, Value
+from django.db.models.functions import Cast, Coalesce, NullIf, Round
+
+
+def backfill_progress(apps, schema_editor):
+    Enrollment = apps.get_model('courses', 'Enrollment')
+    Lesson = apps.get_model('courses', 'Lesson')
+    LessonProgress = apps.get_model('courses', 'LessonProgress')
+
+    total = Coalesce(Subquery(
+        Lesson.objects.filter(module__course=OuterRef('course')).order_by()
+        .values('module__course').annotate(total=Count('id')).values('total')[:1]
+    ), 0)
+    completed = Coalesce(Subquery(
+        LessonProgress.objects.filter(
+            student=OuterRef('student'),
+            lesson__module__course=OuterRef('course'),
+            is_completed=True,
+        ).order_by().values('student').annotate(total=Count('id')).values('total')[:1]
+    ), 0)
+    latest = LessonProgress.objects.filter(
+        student=OuterRef('student'),
+        lesson__module__course=OuterRef('course'),
+    ).order_by('-modified')
+
+    Enrollment.objects.update(
+        total_lessons=total,
+        completed_lessons=completed,
+        progress=Coalesce(
+            Round(Cast(completed, FloatField()) * 100 / NullIf(total, 0), 1),
+            Value(0.0),
+            output_field=FloatField(),
+        ),
+        last_lesson=Subquery(latest.values('lesson')[:1]),
+        last_activity=Subquery(latest.values('modified')[:1]),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0002_certificate_lessonprogress'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='enrollment',
+            name='completed_lessons',
+            field=models.PositiveIntegerField(default=0, verbose_name='Completed Lessons'),
+        ),
+        migrations.AddField(
+            model_name='enrollment',
+            name='last_activity',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Last Activity'),
+        ),
+        migrations.AddField(
+            model_name='enrollment',
+            name='last_lesson',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='courses.lesson', verbose_name='Last Lesson'),
+        ),
+        migrations.AddField(
+            model_name='enrollment',
+            name='progress',
+            field=models.FloatField(default=0, verbose_name='Progress (%)'),
+        ),
+        migrations.AddField(
+            model_name='enrollment',
+            name='total_lessons',
+            field=models.PositiveIntegerField(default=0, verbose_name='Total Lessons'),
+        ),
+        migrations.RunPython(backfill_progress, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,89 @@
+# Generated by Django 5.1.9 on 2026-10-18 10:44
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.conf import settings
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.operations import TrigramExtension, UnaccentExtension
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+from django.db.models import OuterRef, Subquery, Value
+from django.db.models.functions import Concat
+
+# Frozen copy of courses.search.SEARCH_CONFIG as of this migration
+SEARCH_CONFIG = "spanish_unaccent"
+
+
+def create_search_config(apps, schema_editor):
+    """Spanish stemming that ignores accents"""
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute(f"CREATE TEXT SEARCH CONFIGURATION {SEARCH_CONFIG} (COPY = spanish)")
+    schema_editor.execute(
+        f"ALTER TEXT SEARCH CONFIGURATION {SEARCH_CONFIG} "
+        "ALTER MAPPING FOR hword, hword_part, word WITH unaccent, spanish_stem"
+    )
+
+
+def drop_search_config(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute(f"DROP TEXT SEARCH CONFIGURATION IF EXISTS {SEARCH_CONFIG}")
+
+
+def backfill_search_vectors(apps, schema_editor):
+    """Search vectors of existing courses, as courses.search built them when this was written"""
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    Category = apps.get_model("courses", "Category")
+    Course = apps.get_model("courses", "Course")
+    Module = apps.get_model("courses", "Module")
+    Lesson = apps.get_model("courses", "Lesson")
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+
+    category_name = Subquery(Category.objects.filter(pk=OuterRef("category_id")).values("name")[:1])
+    instructor_name = Subquery(User.objects.filter(pk=OuterRef("instructor_id")).values("name")[:1])
+    module_text = Subquery(
+        Module.objects.filter(course=OuterRef("pk")).values("course").annotate(
+            text=StringAgg(Concat("title", Value(" "), "description"), delimiter=" ")
+        ).values("text")
+    )
+    lesson_text = Subquery(
+        Lesson.objects.filter(module__course=OuterRef("pk")).values("module__course").annotate(
+            text=StringAgg(Concat("title", Value(" "), "description"), delimiter=" ")
+        ).values("text")
+    )
+    Course.objects.update(search_vector=(
+        SearchVector("title", weight="A", config=SEARCH_CONFIG)
+        + SearchVector("overview", category_name, instructor_name, weight="B", config=SEARCH_CONFIG)
+        + SearchVector(module_text, weight="C", config=SEARCH_CONFIG)
+        + SearchVector(lesson_text, weight="D", config=SEARCH_CONFIG)
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0003_enrollment_progress_counters'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        UnaccentExtension(),
+        migrations.RunPython(create_search_config, drop_search_config),
+        migrations.AddField(
+            model_name='course',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True, verbose_name='Search Vector'),
+        ),
+        migrations.AddIndex(
+            model_name='course',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='course_search_vector_gin'),
+        ),
+        migrations.AddIndex(
+            model_name='course',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['title'], name='course_title_trgm', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.RunPython(backfill_search_vectors, migrations.RunPython.noop),
+    ]
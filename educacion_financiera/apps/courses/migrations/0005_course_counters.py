@@ -0,0 +1,61 @@
+# Generated by Django 5.1.9 on 2026-10-18 10:47
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_counters(apps, schema_editor):
+    Course = apps.get_model('courses', 'Course')
+    Enrollment = apps.get_model('courses', 'Enrollment')
+    Certificate = apps.get_model('courses', 'Certificate')
+
+    def count(queryset):
+        return Coalesce(Subquery(
+            queryset.filter(course=OuterRef('pk')).order_by()
+            .values('course').annotate(total=Count('id')).values('total')[:1]
+        ), 0)
+
+    Course.objects.update(
+        enrollment_count=count(Enrollment.objects.all()),
+        active_enrollment_count=count(Enrollment.objects.filter(active=True)),
+        completion_count=count(Enrollment.objects.filter(progress__gte=100)),
+        certificate_count=count(Certificate.objects.all()),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0004_course_search_vector'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='active_enrollment_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Active Enrollments'),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='certificate_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Certificates'),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='completion_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Completions'),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='enrollment_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Enrollments'),
+        ),
+        migrations.AddIndex(
+            model_name='course',
+            index=models.Index(fields=['visibility', '-active_enrollment_count', '-created'], name='course_popularity_idx'),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
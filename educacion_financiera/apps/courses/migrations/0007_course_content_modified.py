@@ -0,0 +1,42 @@
+# Generated by Django 5.1.9 on 2026-10-18 10:54
+
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import F, Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+
+def backfill_content_modified(apps, schema_editor):
+    Course = apps.get_model('courses', 'Course')
+    Module = apps.get_model('courses', 'Module')
+    Lesson = apps.get_model('courses', 'Lesson')
+    Resource = apps.get_model('courses', 'Resource')
+
+    def latest(queryset, course_path):
+        return Coalesce(Subquery(
+            queryset.filter(**{course_path: OuterRef('pk')}).order_by()
+            .values(course_path).annotate(latest=Max('modified')).values('latest')[:1]
+        ), F('modified'))
+
+    Course.objects.update(content_modified=Greatest(
+        F('modified'),
+        latest(Module.objects.all(), 'course'),
+        latest(Lesson.objects.all(), 'module__course'),
+        latest(Resource.objects.all(), 'lesson__module__course'),
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0006_course_listing_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='content_modified',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False, verbose_name='Content Modified'),
+        ),
+        migrations.RunPython(backfill_content_modified, migrations.RunPython.noop),
+    ]
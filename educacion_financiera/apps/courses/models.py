@@ -1,9 +1,51 @@
+from collections import defaultdict
+
 from django.conf import settings
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
+from django.db import transaction
+from django.db.models import Count
+from django.db.models import Exists
+from django.db.models import F
+from django.db.models import FloatField
+from django.db.models import OuterRef
+from django.db.models import Subquery
+from django.db.models import Value
+from django.db.models.functions import Cast
+from django.db.models.functions import Coalesce
+from django.db.models.functions import Greatest
+from django.db.models.functions import Now
+from django.db.models.functions import NullIf
+from django.db.models.functions import Round
 from django.urls import reverse
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
 
+def lesson_count_subquery(course_ref):
+    """Build a subquery counting the lessons of the referenced course"""
+    return Coalesce(Subquery(
+        Lesson.objects.filter(
+            module__course=course_ref
+        ).order_by().values("module__course").annotate(
+            total=Count("id")
+        ).values("total")[:1]
+    ), 0)
+
+
+class CategoryQuerySet(models.QuerySet):
+    def with_course_count(self):
+        """Annotate the number of public courses in each category"""
+        return self.annotate(
+            public_course_count=Count("courses", filter=models.Q(courses__visibility="public"))
+        )
+
+    def course_count_map(self):
+        """Map category ids to their public course count in a single query"""
+        return dict(self.with_course_count().values_list("id", "public_course_count"))
+
+
 class Category(models.Model):
     """
     Categories for courses
@@ -14,6 +56,8 @@ class Category(models.Model):
     created = models.DateTimeField(_("Created"), auto_now_add=True)
     modified = models.DateTimeField(_("Modified"), auto_now=True)
 
+    objects = CategoryQuerySet.as_manager()
+
     class Meta:
         ordering = ["name"]
         verbose_name = _("Category")
@@ -26,6 +70,73 @@ class Category(models.Model):
         return reverse("courses:category_detail", kwargs={"slug": self.slug})
 
 
+def _count_subquery(queryset, group_by):
+    return Coalesce(Subquery(
+        queryset.order_by().values(group_by).annotate(total=Count("id")).values("total")[:1]
+    ), 0)
+
+
+class CourseQuerySet(models.QuerySet):
+    def popular(self):
+        """Order by active enrollments, served by the popularity index"""
+        return self.order_by("-active_enrollment_count", "-created")
+
+    def adjust_counters(self, **deltas):
+        """Atomically shift counter columns, never below zero"""
+        return self.update(**{
+            field: Greatest(F(field) + delta, 0) for field, delta in deltas.items() if delta
+        }) if any(deltas.values()) else 0
+
+    def touch(self):
+        """Bump the content version, invalidating conditional GET validators"""
+        return self.update(content_modified=timezone.now())
+
+    def recount_completions(self):
+        """Recount enrollments that reached 100% progress"""
+        return self.update(completion_count=_count_subquery(
+            Enrollment.objects.filter(course=OuterRef("pk"), progress__gte=100), "course"
+        ))
+
+    def recalculate_counters(self):
+        """Recompute every denormalized counter from the source tables"""
+        enrollments = Enrollment.objects.filter(course=OuterRef("pk"))
+        return self.update(
+            enrollment_count=_count_subquery(enrollments, "course"),
+            active_enrollment_count=_count_subquery(enrollments.filter(active=True), "course"),
+            completion_count=_count_subquery(enrollments.filter(progress__gte=100), "course"),
+            certificate_count=_count_subquery(
+                Certificate.objects.filter(course=OuterRef("pk")), "course"
+            ),
+        )
+
+    def with_user_progress(self, user):
+        """
+        Annotate lesson totals and the user's enrollment status and progress
+        for every course using grouped subqueries instead of per-row COUNTs
+        """
+        queryset = self.annotate(
+            total_lessons_count=lesson_count_subquery(OuterRef("pk")),
+        )
+
+        if user is None or not user.is_authenticated:
+            return queryset.annotate(
+                user_is_enrolled=Value(False),
+                user_completed_lessons=Value(0),
+                user_progress=Value(0.0),
+            )
+
+        enrollment = Enrollment.objects.filter(course=OuterRef("pk"), student=user)
+        return queryset.annotate(
+            user_is_enrolled=Exists(enrollment.filter(active=True)),
+            user_completed_lessons=Coalesce(Subquery(enrollment.values("completed_lessons")[:1]), 0),
+            user_progress=Coalesce(
+                Subquery(enrollment.values("progress")[:1]),
+                Value(0.0),
+                output_field=FloatField(),
+            ),
+        )
+
+
 class Course(models.Model):
     """
     Course model
@@ -72,14 +183,49 @@ class Course(models.Model):
     created = models.DateTimeField(_("Created"), auto_now_add=True)
     modified = models.DateTimeField(_("Modified"), auto_now=True)
 
+    # Denormalized counters, kept in sync by courses.signals
+    enrollment_count = models.PositiveIntegerField(_("Enrollments"), default=0, editable=False)
+    active_enrollment_count = models.PositiveIntegerField(_("Active Enrollments"), default=0, editable=False)
+    completion_count = models.PositiveIntegerField(_("Completions"), default=0, editable=False)
+    certificate_count = models.PositiveIntegerField(_("Certificates"), default=0, editable=False)
+
+    # Latest change to the course or its modules, lessons and resources, see versioning.py
+    content_modified = models.DateTimeField(_("Content Modified"), default=timezone.now, editable=False)
+
+    # Maintained by signals and the update_search_vectors command, see search.py
+    search_vector = SearchVectorField(_("Search Vector"), null=True, editable=False)
+
+    objects = CourseQuerySet.as_manager()
+
+    COUNTER_FIELDS = ("enrollment_count", "active_enrollment_count", "completion_count", "certificate_count")
+
     class Meta:
         ordering = ["-created"]
         verbose_name = _("Course")
         verbose_name_plural = _("Courses")
+        indexes = [
+            GinIndex(fields=["search_vector"], name="course_search_vector_gin"),
+            GinIndex(fields=["title"], name="course_title_trgm", opclasses=["gin_trgm_ops"]),
+            models.Index(
+                fields=["visibility", "-active_enrollment_count", "-created"], name="course_popularity_idx"
+            ),
+            models.Index(fields=["visibility", "-created"], name="course_newest_idx"),
+            models.Index(fields=["visibility", "price", "-created"], name="course_price_idx"),
+        ]
 
     def __str__(self):
         return self.title
 
+    def save(self, *args, **kwargs):
+        self.content_modified = timezone.now()
+        if not self._state.adding and not args and kwargs.get("update_fields") is None:
+            # Counters only change through F() updates; never write back a stale copy
+            kwargs["update_fields"] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.COUNTER_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
     def get_absolute_url(self):
         return reverse("courses:course_detail", kwargs={"slug": self.slug})
 
@@ -88,21 +234,16 @@ class Course(models.Model):
         return Lesson.objects.filter(module__course=self).count()
 
     def get_progress_for_user(self, user):
-        """Calculate progress percentage for a specific user"""
+        """Get progress percentage for a specific user from their enrollment counters"""
         if not user.is_authenticated:
             return 0
 
-        total_lessons = self.get_total_lessons()
-        if total_lessons == 0:
-            return 0
-
-        completed_lessons = LessonProgress.objects.filter(
-            lesson__module__course=self,
-            student=user,
-            is_completed=True
-        ).count()
+        progress = Enrollment.objects.filter(
+            course=self,
+            student=user
+        ).values_list("progress", flat=True).first()
 
-        return round((completed_lessons / total_lessons) * 100, 1)
+        return progress or 0
 
 
 class Module(models.Model):
@@ -192,19 +333,18 @@ class Lesson(models.Model):
             is_completed=True
         ).exists()
 
+    def get_sequence(self):
+        """Flattened lesson order of the course this lesson belongs to"""
+        from .sequence import LessonSequence
+        return LessonSequence.for_course(self.module.course_id)
+
     def get_next_lesson(self):
-        """Get the next lesson in order"""
-        return Lesson.objects.filter(
-            module=self.module,
-            order__gt=self.order
-        ).first()
+        """Get the next lesson in course order, crossing module boundaries"""
+        return self.get_sequence().next(self.pk)
 
     def get_previous_lesson(self):
-        """Get the previous lesson in order"""
-        return Lesson.objects.filter(
-            module=self.module,
-            order__lt=self.order
-        ).last()
+        """Get the previous lesson in course order, crossing module boundaries"""
+        return self.get_sequence().previous(self.pk)
 
 
 class Resource(models.Model):
@@ -230,6 +370,90 @@ class Resource(models.Model):
         return self.title
 
 
+def progress_expression(completed, total):
+    """Build a SQL expression for the rounded progress percentage"""
+    return Coalesce(
+        Round(Cast(completed, FloatField()) * 100 / NullIf(total, 0), 1),
+        Value(0.0),
+        output_field=FloatField(),
+    )
+
+
+class EnrollmentQuerySet(models.QuerySet):
+    def recalculate_progress(self):
+        """Recompute the denormalized progress counters from the source tables"""
+        completed_lessons = Subquery(
+            LessonProgress.objects.filter(
+                student=OuterRef("student"),
+                lesson__module__course=OuterRef("course"),
+                is_completed=True
+            ).order_by().values("student").annotate(
+                total=Count("id")
+            ).values("total")[:1]
+        )
+        latest_progress = LessonProgress.objects.filter(
+            student=OuterRef("student"),
+            lesson__module__course=OuterRef("course")
+        ).order_by("-modified")
+        total = lesson_count_subquery(OuterRef("course"))
+        completed = Coalesce(completed_lessons, 0)
+        updated = self.update(
+            total_lessons=total,
+            completed_lessons=completed,
+            progress=progress_expression(completed, total),
+            last_lesson=Subquery(latest_progress.values("lesson")[:1]),
+            last_activity=Subquery(latest_progress.values("modified")[:1]),
+            modified=Now(),
+        )
+        self.refresh_course_completions()
+        return updated
+
+    def refresh_course_completions(self):
+        """Recount completions of the courses these enrollments belong to"""
+        return Course.objects.filter(pk__in=self.values("course_id")).recount_completions()
+
+    def _update_counting_completions(self, **fields):
+        """
+        Update progress counters and shift the completion count of every
+        course by the enrollments that crossed 100% either way
+        """
+        with transaction.atomic():
+            # Lock only the enrollments; locking joined courses would serialize every student
+            before = dict(self.select_for_update(of=("self",)).values_list("pk", "progress"))
+            if not before:
+                return 0
+            enrollments = Enrollment.objects.filter(pk__in=before)
+            updated = enrollments.update(modified=Now(), **fields)
+
+            completions = defaultdict(int)
+            for pk, course_id, progress in enrollments.values_list("pk", "course_id", "progress"):
+                finished = progress >= 100
+                if finished != (before[pk] >= 100):
+                    completions[course_id] += 1 if finished else -1
+            for course_id, delta in completions.items():
+                Course.objects.filter(pk=course_id).adjust_counters(completion_count=delta)
+        return updated
+
+    def apply_completed_delta(self, delta, **fields):
+        """Shift completed lesson counters by delta and refresh the percentage"""
+        if not delta:
+            return self.update(modified=Now(), **fields) if fields else 0
+        completed = F("completed_lessons") + delta
+        return self._update_counting_completions(
+            completed_lessons=completed,
+            progress=progress_expression(completed, F("total_lessons")),
+            **fields,
+        )
+
+    def apply_total_delta(self, delta):
+        """Shift total lesson counters by delta and refresh the percentage"""
+        total = F("total_lessons") + delta
+        return self._update_counting_completions(
+            total_lessons=total,
+            progress=progress_expression(F("completed_lessons"), total),
+        )
+
+
 class Enrollment(models.Model):
     """
     Course enrollment for students
@@ -249,17 +473,71 @@ class Enrollment(models.Model):
     date_enrolled = models.DateTimeField(_("Date Enrolled"), auto_now_add=True)
     active = models.BooleanField(_("Active"), default=True)
 
+    # Denormalized progress, kept in sync by courses.signals
+    completed_lessons = models.PositiveIntegerField(_("Completed Lessons"), default=0)
+    total_lessons = models.PositiveIntegerField(_("Total Lessons"), default=0)
+    progress = models.FloatField(_("Progress (%)"), default=0)
+    last_lesson = models.ForeignKey(
+        "Lesson",
+        related_name="+",
+        on_delete=models.SET_NULL,
+        verbose_name=_("Last Lesson"),
+        null=True,
+        blank=True
+    )
+    last_activity = models.DateTimeField(_("Last Activity"), null=True, blank=True)
+    # Bumped by every change, bulk updates included; the version of a student's
+    # progress in conditional GET (see versioning.py)
+    modified = models.DateTimeField(_("Modified"), auto_now=True)
+
+    objects = EnrollmentQuerySet.as_manager()
+
     class Meta:
         unique_together = [["student", "course"]]
         verbose_name = _("Enrollment")
         verbose_name_plural = _("Enrollments")
+        indexes = [
+            # Date ranges read by the analytics rollups
+            models.Index(fields=["date_enrolled"], name="enrollment_enrolled_idx"),
+            models.Index(fields=["last_activity"], name="enrollment_activity_idx"),
+        ]
 
     def __str__(self):
         return f"{self.student.email} enrolled in {self.course.title}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored state so signals can detect activation flips
+        instance._loaded_active = instance.__dict__.get("active", False)
+        return instance
+
+    def save(self, *args, **kwargs):
+        if self._state.adding:
+            # Seed the counters; the student may have progress from an earlier enrollment
+            self.total_lessons = Lesson.objects.filter(module__course_id=self.course_id).count()
+            self.completed_lessons = LessonProgress.objects.filter(
+                student_id=self.student_id,
+                lesson__module__course_id=self.course_id,
+                is_completed=True
+            ).count()
+            self.progress = self.calculate_progress(self.completed_lessons, self.total_lessons)
+        super().save(*args, **kwargs)
+
+    @staticmethod
+    def calculate_progress(completed_lessons, total_lessons):
+        """Calculate progress percentage from lesson counters"""
+        if total_lessons == 0:
+            return 0
+        return round((completed_lessons / total_lessons) * 100, 1)
+
+    @property
+    def lessons_remaining(self):
+        return max(self.total_lessons - self.completed_lessons, 0)
+
     def get_progress_percentage(self):
         """Get progress percentage for this enrollment"""
-        return self.course.get_progress_for_user(self.student)
+        return self.progress
 
 
 class LessonProgress(models.Model):
@@ -293,10 +571,26 @@ class LessonProgress(models.Model):
         verbose_name = _("Lesson Progress")
         verbose_name_plural = _("Lesson Progress")
         ordering = ["-modified"]
+        indexes = [
+            models.Index(fields=["created"], name="lesson_progress_created_idx"),
+            models.Index(fields=["completed_at"], name="lesson_progress_completed_idx"),
+        ]
 
     def __str__(self):
         return f"{self.student.email} - {self.lesson.title} ({'✓' if self.is_completed else '○'})"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored state so signals can detect completion flips
+        instance._loaded_is_completed = instance.__dict__.get("is_completed", False)
+        return instance
+
+    def save(self, *args, **kwargs):
+        # Enrollment counters are updated in post_save; keep both in one transaction
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
     def mark_completed(self):
         """Mark lesson as completed"""
         if not self.is_completed:
@@ -331,12 +625,19 @@ class Certificate(models.Model):
         verbose_name = _("Certificate")
         verbose_name_plural = _("Certificates")
         ordering = ["-issue_date"]
+        indexes = [
+            models.Index(fields=["issue_date"], name="certificate_issued_idx"),
+        ]
 
     def __str__(self):
         return f"Certificate for {self.student.email} - {self.course.title}"
 
     def save(self, *args, **kwargs):
         if not self.certificate_id:
-            import uuid
-            self.certificate_id = f"CERT-{uuid.uuid4().hex[:8].upper()}"
+            self.certificate_id = self.new_certificate_id()
         super().save(*args, **kwargs)
+
+    @staticmethod
+    def new_certificate_id():
+        import uuid
+        return f"CERT-{uuid.uuid4().hex[:8].upper()}"
@@ -0,0 +1,118 @@
+"""
+Keyset pagination for API listings.
+
+Pages are selected with a WHERE clause on the ordering columns of the last
+row seen instead of an OFFSET, so every page costs the same no matter how far
+a client has scrolled and rows do not shift between pages when courses are
+added. The ordering comes from the queryset and is made unique by appending
+the primary key; ordering columns must be plain, non-null fields or
+annotations of the model.
+"""
+import base64
+import binascii
+import json
+from collections import OrderedDict
+
+from django.core.exceptions import ImproperlyConfigured
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    page_size = 20
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(queryset)
+
+        cursor = self.decode_cursor(request)
+        if cursor is not None:
+            try:
+                queryset = queryset.filter(self.after(cursor))
+            except (DjangoValidationError, TypeError, ValueError) as exc:
+                raise NotFound(self.invalid_cursor_message) from exc
+
+        rows = list(queryset.order_by(*self.ordering)[:self.page_size + 1])
+        self.has_next = len(rows) > self.page_size
+        self.page = rows[:self.page_size]
+        return self.page
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(size, 1), self.max_page_size)
+
+    def get_ordering(self, queryset):
+        ordering = list(queryset.query.order_by or queryset.model._meta.ordering)
+        if not ordering:
+            raise ImproperlyConfigured('KeysetPagination requires an ordered queryset')
+        if not all(isinstance(field, str) and '__' not in field for field in ordering):
+            raise ImproperlyConfigured('KeysetPagination only orders by fields of the model')
+        if not {'pk', '-pk', 'id', '-id'} & set(ordering):
+            ordering.append('-pk' if ordering[-1].startswith('-') else 'pk')
+        return ordering
+
+    def after(self, values):
+        """Rows that come after the given ordering values"""
+        condition = Q()
+        for index, field in enumerate(self.ordering):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            ties = {
+                previous.lstrip('-'): value
+                for previous, value in zip(self.ordering[:index], values[:index], strict=True)
+            }
+            condition |= Q(**ties, **{f'{name}__{lookup}': values[index]})
+        return condition
+
+    def encode_cursor(self, instance):
+        values = [getattr(instance, field.lstrip('-')) for field in self.ordering]
+        payload = json.dumps([
+            value.isoformat() if hasattr(value, 'isoformat') else str(value) for value in values
+        ])
+        return base64.urlsafe_b64encode(payload.encode()).decode()
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            values = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+        except (binascii.Error, UnicodeDecodeError, ValueError) as exc:
+            raise NotFound(self.invalid_cursor_message) from exc
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return values
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.page[-1]))
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
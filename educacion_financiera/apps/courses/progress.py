@@ -0,0 +1,225 @@
+"""
+Lesson progress services.
+
+``set_lesson_completion`` is the single code path that marks one lesson as
+complete or incomplete, used by the lesson page, the AJAX toggle and both API
+endpoints. It locks the enrollment, so concurrent requests of a student in a
+course are applied one after the other, then writes with one progress upsert
+and one enrollment counter update, inserting the certificate only when the
+course has just been completed.
+
+``sync_lesson_progress`` applies a batch of events from offline and mobile
+clients. Enrollment is checked for all lessons in one query and progress is
+upserted with a single ``bulk_create(update_conflicts=True)``. Enrollment
+counters, the activity streak and certificates are then updated once per
+affected course instead of once per event.
+
+Both bypass the LessonProgress signals and send ``lesson_progress_synced``
+instead.
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Certificate, Course, Enrollment, Lesson, LessonProgress
+from .signals import lesson_progress_synced
+
+APPLIED = "applied"
+STALE = "stale"
+NOT_ENROLLED = "not_enrolled"
+
+
+@transaction.atomic
+def set_lesson_completion(user, lesson_id, completed=True, time_spent=0):
+    """
+    Mark a lesson as complete, or incomplete, for an enrolled student and
+    add the time spent. ``completed=None`` toggles the current state.
+
+    Returns the status, the lesson state and the resulting course progress.
+    """
+    # Lock only the enrollment; locking the joined course would serialize every student
+    enrollment = Enrollment.objects.select_for_update(of=("self",)).filter(
+        student=user, active=True, course__modules__lessons=lesson_id
+    ).first()
+    if enrollment is None:
+        return {"status": NOT_ENROLLED, "lesson_id": lesson_id}
+
+    now = timezone.now()
+    progress = LessonProgress.objects.select_for_update().filter(
+        student=user, lesson_id=lesson_id
+    ).first() or LessonProgress(student=user, lesson_id=lesson_id)
+    was_completed = progress.is_completed
+    completed = not was_completed if completed is None else completed
+    time_spent = max(time_spent, 0)
+
+    certificate_awarded = False
+    if completed != was_completed or time_spent:
+        progress.is_completed = completed
+        if completed and not was_completed:
+            progress.completed_at = now
+        elif not completed:
+            progress.completed_at = None
+        progress.time_spent += time_spent
+        LessonProgress.objects.bulk_create(
+            [progress],
+            update_conflicts=True,
+            unique_fields=["student", "lesson"],
+            update_fields=["is_completed", "completed_at", "time_spent", "modified"],
+        )
+
+        # The row is locked, so the counters can be written as plain values
+        previous_progress = enrollment.progress
+        delta = int(completed) - int(was_completed)
+        enrollment.completed_lessons = max(enrollment.completed_lessons + delta, 0)
+        enrollment.progress = Enrollment.calculate_progress(
+            enrollment.completed_lessons, enrollment.total_lessons
+        )
+        Enrollment.objects.filter(pk=enrollment.pk).update(
+            completed_lessons=enrollment.completed_lessons,
+            progress=enrollment.progress,
+            last_lesson=lesson_id,
+            last_activity=now,
+            modified=now,
+        )
+
+        finished = enrollment.progress >= 100
+        if finished != (previous_progress >= 100):
+            Course.objects.filter(pk=enrollment.course_id).adjust_counters(
+                completion_count=1 if finished else -1
+            )
+        if delta > 0:
+            if hasattr(user, "profile"):
+                user.profile.update_activity_streak()
+            if finished:
+                certificate, certificate_awarded = Certificate.objects.get_or_create(
+                    student=user, course_id=enrollment.course_id
+                )
+
+        lesson_progress_synced.send(
+            sender=LessonProgress, student_id=user.pk, course_ids=[enrollment.course_id]
+        )
+
+    return {
+        "status": APPLIED,
+        "lesson_id": lesson_id,
+        "completed": progress.is_completed,
+        "changed": progress.is_completed != was_completed,
+        "time_spent": progress.time_spent,
+        "course_id": enrollment.course_id,
+        "course_progress": enrollment.progress,
+        "completed_lessons": enrollment.completed_lessons,
+        "total_lessons": enrollment.total_lessons,
+        "certificate_awarded": certificate_awarded,
+    }
+
+
+def _latest_events(events, now):
+    """
+    Collapse events per lesson: time spent is summed and the most recent
+    completion flag wins
+    """
+    merged = {}
+    for event in sorted(events, key=lambda event: event.get("client_timestamp") or now):
+        lesson_id = event["lesson_id"]
+        previous = merged.get(lesson_id, {"time_spent": 0})
+        merged[lesson_id] = {
+            **event,
+            "time_spent": previous["time_spent"] + event.get("time_spent", 0),
+            "client_timestamp": min(event.get("client_timestamp") or now, now),
+        }
+    return merged
+
+
+@transaction.atomic
+def sync_lesson_progress(user, events):
+    """
+    Apply progress events of a user, dicts with ``lesson_id``, ``completed``,
+    ``time_spent`` (seconds to add) and an optional ``client_timestamp``.
+
+    Returns the status of each lesson and the resulting progress of each
+    affected course.
+    """
+    now = timezone.now()
+    events = _latest_events(events, now)
+
+    course_by_lesson = dict(Lesson.objects.filter(
+        pk__in=events,
+        module__course__enrollments__student=user,
+        module__course__enrollments__active=True,
+    ).values_list("pk", "module__course_id"))
+    existing = {
+        progress.lesson_id: progress
+        for progress in LessonProgress.objects.select_for_update().filter(
+            student=user, lesson_id__in=course_by_lesson
+        )
+    }
+
+    statuses = {}
+    rows = []
+    completed_delta = defaultdict(int)
+    last_lesson = {}
+    for lesson_id, event in events.items():
+        course_id = course_by_lesson.get(lesson_id)
+        if course_id is None:
+            statuses[lesson_id] = NOT_ENROLLED
+            continue
+
+        progress = existing.get(lesson_id) or LessonProgress(student=user, lesson_id=lesson_id)
+        was_completed = progress.is_completed
+        progress.time_spent += max(event["time_spent"], 0)
+
+        # The server copy wins over an older offline change of the completion flag
+        if progress.pk and progress.modified > event["client_timestamp"]:
+            statuses[lesson_id] = STALE
+        else:
+            statuses[lesson_id] = APPLIED
+            progress.is_completed = event["completed"]
+            if progress.is_completed and not was_completed:
+                progress.completed_at = event["client_timestamp"]
+            elif not progress.is_completed:
+                progress.completed_at = None
+
+        if progress.is_completed != was_completed:
+            completed_delta[course_id] += 1 if progress.is_completed else -1
+        rows.append(progress)
+        last_lesson[course_id] = lesson_id
+
+    LessonProgress.objects.bulk_create(
+        rows,
+        update_conflicts=True,
+        unique_fields=["student", "lesson"],
+        update_fields=["is_completed", "completed_at", "time_spent", "modified"],
+    )
+
+    # Side effects once per affected course
+    for course_id, lesson_id in last_lesson.items():
+        Enrollment.objects.filter(student=user, course_id=course_id).apply_completed_delta(
+            completed_delta[course_id], last_lesson=lesson_id, last_activity=now
+        )
+
+    if any(delta > 0 for delta in completed_delta.values()) and hasattr(user, "profile"):
+        user.profile.update_activity_streak()
+
+    courses = []
+    for enrollment in Enrollment.objects.filter(student=user, course_id__in=last_lesson):
+        certificate_awarded = False
+        if enrollment.progress >= 100:
+            certificate, certificate_awarded = Certificate.objects.get_or_create(
+                student=user, course_id=enrollment.course_id
+            )
+        courses.append({
+            "course_id": enrollment.course_id,
+            "progress": enrollment.progress,
+            "completed_lessons": enrollment.completed_lessons,
+            "total_lessons": enrollment.total_lessons,
+            "certificate_awarded": certificate_awarded,
+        })
+
+    if rows:
+        lesson_progress_synced.send(sender=LessonProgress, student_id=user.pk, course_ids=list(last_lesson))
+
+    return {
+        "lessons": [{"lesson_id": lesson_id, "status": status} for lesson_id, status in statuses.items()],
+        "courses": courses,
+    }
@@ -0,0 +1,99 @@
+"""
+Full-text search for courses.
+
+On PostgreSQL every course keeps a weighted ``search_vector`` over its title
+(A), overview, category and instructor (B), module text (C) and lesson text
+(D), built with the ``spanish_unaccent`` configuration (Spanish stemming
+without accents) and backed by a GIN index. Queries are ranked, and fall
+back to trigram similarity on the title when nothing matches, to forgive
+typos. Other databases, such as the SQLite one used in tests, get a simple
+``icontains`` search with the title matches ranked first.
+"""
+from django.apps import apps as global_apps
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector, TrigramWordSimilarity
+from django.db import connection
+from django.db.models import Case, F, FloatField, OuterRef, Q, Subquery, Value, When
+from django.db.models.functions import Concat
+
+SEARCH_CONFIG = "spanish_unaccent"
+TRIGRAM_THRESHOLD = 0.3
+
+
+def is_full_text_available():
+    return connection.vendor == "postgresql"
+
+
+def search_vector_expression(apps=global_apps):
+    """Weighted search vector of a course, usable in an UPDATE of courses"""
+    Category = apps.get_model("courses", "Category")
+    Module = apps.get_model("courses", "Module")
+    Lesson = apps.get_model("courses", "Lesson")
+    User = apps.get_model("users", "User")
+
+    category_name = Subquery(Category.objects.filter(pk=OuterRef("category_id")).values("name")[:1])
+    instructor_name = Subquery(User.objects.filter(pk=OuterRef("instructor_id")).values("name")[:1])
+    module_text = Subquery(
+        Module.objects.filter(course=OuterRef("pk")).values("course").annotate(
+            text=StringAgg(Concat("title", Value(" "), "description"), delimiter=" ")
+        ).values("text")
+    )
+    lesson_text = Subquery(
+        Lesson.objects.filter(module__course=OuterRef("pk")).values("module__course").annotate(
+            text=StringAgg(Concat("title", Value(" "), "description"), delimiter=" ")
+        ).values("text")
+    )
+    return (
+        SearchVector("title", weight="A", config=SEARCH_CONFIG)
+        + SearchVector("overview", category_name, instructor_name, weight="B", config=SEARCH_CONFIG)
+        + SearchVector(module_text, weight="C", config=SEARCH_CONFIG)
+        + SearchVector(lesson_text, weight="D", config=SEARCH_CONFIG)
+    )
+
+
+def update_search_vectors(course_ids=None, apps=global_apps):
+    """Rebuild the search vector of the given courses, or all, in one UPDATE"""
+    if not is_full_text_available():
+        return 0
+
+    courses = apps.get_model("courses", "Course").objects.all()
+    if course_ids is not None:
+        courses = courses.filter(pk__in=course_ids)
+    return courses.update(search_vector=search_vector_expression(apps))
+
+
+def search_courses(queryset, query):
+    """
+    Filter courses matching a user query, annotated with ``search_rank`` and
+    ordered by it
+    """
+    query = query.strip()
+    if not query:
+        return queryset
+
+    if not is_full_text_available():
+        matches = queryset.filter(
+            Q(title__icontains=query) |
+            Q(overview__icontains=query) |
+            Q(category__name__icontains=query) |
+            Q(instructor__name__icontains=query)
+        ).annotate(
+            search_rank=Case(
+                When(title__icontains=query, then=Value(1.0)),
+                default=Value(0.5),
+                output_field=FloatField()
+            )
+        )
+        return matches.order_by("-search_rank")
+
+    search_query = SearchQuery(query, config=SEARCH_CONFIG, search_type="websearch")
+    matches = queryset.filter(search_vector=search_query).annotate(
+        search_rank=SearchRank(F("search_vector"), search_query)
+    )
+    if matches.exists():
+        return matches.order_by("-search_rank")
+
+    # Nothing matched the stemmed words, look for similar titles instead
+    return queryset.annotate(
+        search_rank=TrigramWordSimilarity(query, "title")
+    ).filter(search_rank__gte=TRIGRAM_THRESHOLD).order_by("-search_rank")
@@ -0,0 +1,122 @@
+"""
+Flattened lesson order of a course.
+
+Lessons are ordered by module and then by lesson, so navigation crosses module
+boundaries. The sequence of each course is built with one query, cached and
+only rebuilt when a module or a lesson is added, removed or reordered (see
+signals.py).
+"""
+from collections import namedtuple
+
+from django.core.cache import cache
+
+from .models import Lesson
+
+SEQUENCE_CACHE_KEY = "courses:lesson_sequence:{course_id}"
+SEQUENCE_CACHE_TIMEOUT = None
+
+SequenceEntry = namedtuple("SequenceEntry", ["id", "module_id", "title", "position"])
+
+
+def invalidate_lesson_sequence(*course_ids):
+    """Drop the cached sequence of the given courses"""
+    cache.delete_many([
+        SEQUENCE_CACHE_KEY.format(course_id=course_id)
+        for course_id in course_ids if course_id
+    ])
+
+
+class LessonSequence:
+    """
+    Ordered lessons of a course with their global position
+    """
+    def __init__(self, course_id, lessons):
+        self.course_id = course_id
+        # (lesson id, module id, title) tuples in course order
+        self.lessons = lessons
+        self.indexes = {lesson_id: index for index, (lesson_id, _, _) in enumerate(lessons)}
+        self.module_bounds = {}
+        for index, (_, module_id, _) in enumerate(lessons):
+            first, _ = self.module_bounds.get(module_id, (index, index))
+            self.module_bounds[module_id] = (first, index)
+
+    def __len__(self):
+        return len(self.lessons)
+
+    def __contains__(self, lesson_id):
+        return lesson_id in self.indexes
+
+    @staticmethod
+    def _query(course_ids):
+        return Lesson.objects.filter(
+            module__course_id__in=course_ids
+        ).order_by(
+            "module__order", "module_id", "order", "id"
+        ).values_list("module__course_id", "id", "module_id", "title")
+
+    @classmethod
+    def for_course(cls, course_id):
+        """Get the cached sequence of a course, building it if needed"""
+        return cls.for_courses([course_id])[course_id]
+
+    @classmethod
+    def for_courses(cls, course_ids):
+        """Get the sequences of several courses with one cache round trip"""
+        keys = {SEQUENCE_CACHE_KEY.format(course_id=course_id): course_id for course_id in course_ids}
+        cached = cache.get_many(keys)
+        lessons = {keys[key]: value for key, value in cached.items()}
+
+        missing = [course_id for course_id in course_ids if course_id not in lessons]
+        if missing:
+            built = {course_id: [] for course_id in missing}
+            for course_id, lesson_id, module_id, title in cls._query(missing):
+                built[course_id].append((lesson_id, module_id, title))
+            cache.set_many(
+                {SEQUENCE_CACHE_KEY.format(course_id=course_id): value for course_id, value in built.items()},
+                SEQUENCE_CACHE_TIMEOUT
+            )
+            lessons.update(built)
+
+        return {course_id: cls(course_id, lessons[course_id]) for course_id in course_ids}
+
+    def entry(self, index):
+        """Lesson at a zero based index, or None when out of range"""
+        if 0 <= index < len(self.lessons):
+            lesson_id, module_id, title = self.lessons[index]
+            return SequenceEntry(lesson_id, module_id, title, index + 1)
+        return None
+
+    def get(self, lesson_id):
+        """Entry of a lesson, or None when it is not part of the course"""
+        index = self.indexes.get(lesson_id)
+        return None if index is None else self.entry(index)
+
+    def first(self):
+        return self.entry(0)
+
+    def next(self, lesson_id):
+        """Lesson after the given one, in this module or the following ones"""
+        index = self.indexes.get(lesson_id)
+        return None if index is None else self.entry(index + 1)
+
+    def previous(self, lesson_id):
+        """Lesson before the given one, in this module or the previous ones"""
+        index = self.indexes.get(lesson_id)
+        return None if index is None else self.entry(index - 1)
+
+    def position(self, lesson_id):
+        """One based position of a lesson in the course"""
+        index = self.indexes.get(lesson_id)
+        return None if index is None else index + 1
+
+    def is_module_end(self, lesson_id):
+        """Whether the lesson is the last of its module"""
+        index = self.indexes.get(lesson_id)
+        if index is None:
+            return False
+        _, module_id, _ = self.lessons[index]
+        return self.module_bounds[module_id][1] == index
+
+    def resume_point(self, last_lesson_id=None):
+        """Lesson to continue from: the last one visited or the first of the course"""
+        return self.get(last_lesson_id) or self.first()
@@ -18,6 +18,12 @@ class CategorySerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'slug', 'description', 'course_count', 'created']
 
     def get_course_count(self, obj):
+        if hasattr(obj, 'public_course_count'):
+            return obj.public_course_count
+        # Course listings share one grouped count through the context
+        course_counts = self.context.get('category_course_counts')
+        if course_counts is not None:
+            return course_counts.get(obj.id, 0)
         return obj.courses.filter(visibility='public').count()
 
 
@@ -96,6 +102,33 @@ class LessonSerializer(serializers.ModelSerializer):
         return obj.video_url
 
 
+class SequenceEntrySerializer(serializers.Serializer):
+    """Position of a lesson in the flattened course order"""
+    id = serializers.IntegerField()
+    module_id = serializers.IntegerField()
+    title = serializers.CharField()
+    position = serializers.IntegerField()
+
+
+class LessonDetailSerializer(LessonSerializer):
+    """Lesson with its navigation inside the course"""
+    navigation = serializers.SerializerMethodField()
+
+    class Meta(LessonSerializer.Meta):
+        fields = LessonSerializer.Meta.fields + ['navigation']
+
+    def get_navigation(self, obj):
+        sequence = obj.get_sequence()
+        next_lesson = sequence.next(obj.id)
+        previous_lesson = sequence.previous(obj.id)
+        return {
+            'position': sequence.position(obj.id),
+            'total_lessons': len(sequence),
+            'next_lesson': SequenceEntrySerializer(next_lesson).data if next_lesson else None,
+            'previous_lesson': SequenceEntrySerializer(previous_lesson).data if previous_lesson else None,
+        }
+
+
 class ModuleSerializer(serializers.ModelSerializer):
     lessons = LessonSerializer(many=True, read_only=True)
     progress = serializers.SerializerMethodField()
@@ -118,11 +151,43 @@ class ModuleSerializer(serializers.ModelSerializer):
         return obj.lessons.count()
 
 
+class CurriculumResourceSerializer(ResourceSerializer):
+    """Resource with a site relative URL, for the cached curriculum"""
+    def get_file_url(self, obj):
+        return obj.file.url if obj.file else None
+
+
+class CurriculumLessonSerializer(LessonSerializer):
+    """User independent part of a lesson, for the cached curriculum"""
+    resources = CurriculumResourceSerializer(many=True, read_only=True)
+
+    class Meta(LessonSerializer.Meta):
+        fields = [field for field in LessonSerializer.Meta.fields if field != 'progress']
+
+
+class CurriculumModuleSerializer(ModuleSerializer):
+    """
+    User independent part of a module, for the cached curriculum. Expects
+    lessons and their resources to be prefetched.
+    """
+    lessons = CurriculumLessonSerializer(many=True, read_only=True)
+
+    class Meta(ModuleSerializer.Meta):
+        fields = [field for field in ModuleSerializer.Meta.fields if field != 'progress']
+
+    def get_lessons_count(self, obj):
+        return len(obj.lessons.all())
+
+
 class CourseListSerializer(serializers.ModelSerializer):
-    """Simplified serializer for course listings"""
+    """
+    Simplified serializer for course listings.
+    Querysets built with Course.objects.with_user_progress() are serialized
+    without any per-row query.
+    """
     category = CategorySerializer(read_only=True)
     instructor = InstructorSerializer(read_only=True)
-    enrollment_count = serializers.SerializerMethodField()
+    enrollment_count = serializers.IntegerField(source='active_enrollment_count', read_only=True)
     progress = serializers.SerializerMethodField()
     is_enrolled = serializers.SerializerMethodField()
     total_lessons = serializers.SerializerMethodField()
@@ -136,16 +201,17 @@ class CourseListSerializer(serializers.ModelSerializer):
             'progress', 'is_enrolled', 'total_lessons', 'created'
         ]
 
-    def get_enrollment_count(self, obj):
-        return obj.enrollments.filter(active=True).count()
-
     def get_progress(self, obj):
+        if hasattr(obj, 'user_progress'):
+            return obj.user_progress
         request = self.context.get('request')
         if request and request.user.is_authenticated:
             return obj.get_progress_for_user(request.user)
         return 0
 
     def get_is_enrolled(self, obj):
+        if hasattr(obj, 'user_is_enrolled'):
+            return obj.user_is_enrolled
         request = self.context.get('request')
         if request and request.user.is_authenticated:
             return Enrollment.objects.filter(
@@ -154,6 +220,8 @@ class CourseListSerializer(serializers.ModelSerializer):
         return False
 
     def get_total_lessons(self, obj):
+        if hasattr(obj, 'total_lessons_count'):
+            return obj.total_lessons_count
         return obj.get_total_lessons()
 
     def get_image_url(self, obj):
@@ -163,13 +231,45 @@ class CourseListSerializer(serializers.ModelSerializer):
         return None
 
 
+class SparseFieldsetMixin:
+    """
+    Only serialize the fields named in the ``fields`` context entry, when
+    given. The id is always kept.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        requested = self.context.get('fields')
+        if requested:
+            for name in set(self.fields) - set(requested) - {'id'}:
+                self.fields.pop(name)
+
+
+class CourseCompactSerializer(SparseFieldsetMixin, CourseListSerializer):
+    """
+    Course listing row referencing its category and instructor by id; the
+    related objects are side-loaded once per page
+    """
+    category = serializers.IntegerField(source='category_id', read_only=True)
+    instructor = serializers.IntegerField(source='instructor_id', read_only=True)
+
+
 class CourseDetailSerializer(CourseListSerializer):
-    """Detailed serializer for individual course views"""
-    modules = ModuleSerializer(many=True, read_only=True)
+    """
+    Detailed serializer for individual course views. Modules come from the
+    cached curriculum with the progress of the user merged in.
+    """
+    modules = serializers.SerializerMethodField()
 
     class Meta(CourseListSerializer.Meta):
         fields = CourseListSerializer.Meta.fields + ['modules']
 
+    def get_modules(self, obj):
+        from .curriculum import Curriculum
+
+        request = self.context.get('request')
+        user = request.user if request else None
+        return Curriculum.for_course(obj).with_progress(user, request)
+
 
 class EnrollmentSerializer(serializers.ModelSerializer):
     course = CourseListSerializer(read_only=True)
@@ -191,25 +291,32 @@ class CertificateSerializer(serializers.ModelSerializer):
         fields = ['id', 'course', 'certificate_id', 'issue_date', 'is_active']
 
 
-class LessonCompleteSerializer(serializers.Serializer):
+class LessonCompletionSerializer(serializers.Serializer):
+    """Time spent reported when marking a lesson as complete"""
+    time_spent = serializers.IntegerField(default=0, min_value=0)
+
+
+class LessonCompleteSerializer(LessonCompletionSerializer):
     """Serializer for marking lessons as complete"""
     lesson_id = serializers.IntegerField()
-    time_spent = serializers.IntegerField(default=0)
 
-    def validate_lesson_id(self, value):
-        request = self.context.get('request')
-        if not request or not request.user.is_authenticated:
-            raise serializers.ValidationError("Authentication required")
 
-        try:
-            lesson = Lesson.objects.get(id=value)
-            # Check if user is enrolled in the course
-            if not Enrollment.objects.filter(
-                course=lesson.module.course,
-                student=request.user,
-                active=True
-            ).exists():
-                raise serializers.ValidationError("Not enrolled in this course")
-            return value
-        except Lesson.DoesNotExist:
-            raise serializers.ValidationError("Lesson not found")
+class ProgressEventSerializer(serializers.Serializer):
+    """A progress event recorded by a client, possibly while offline"""
+    lesson_id = serializers.IntegerField()
+    completed = serializers.BooleanField(default=False)
+    time_spent = serializers.IntegerField(default=0, min_value=0)
+    client_timestamp = serializers.DateTimeField(required=False)
+
+
+class ProgressSyncSerializer(serializers.Serializer):
+    """Serializer for syncing a batch of progress events"""
+    MAX_EVENTS = 500
+
+    events = ProgressEventSerializer(many=True, allow_empty=False, max_length=MAX_EVENTS)
+
+
+class StudyHeartbeatSerializer(serializers.Serializer):
+    """Serializer for a study heartbeat of a lesson page"""
+    lesson_id = serializers.IntegerField()
+    seconds = serializers.IntegerField(required=False, min_value=0)
@@ -0,0 +1,336 @@
+from django.conf import settings
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import Signal, receiver
+from django.utils import timezone
+
+from educacion_financiera.apps.profiles.models import Profile
+from educacion_financiera.context_processors import (
+    invalidate_categories_cache,
+    invalidate_user_stats_cache,
+)
+
+from .models import Category, Certificate, Course, Enrollment, Lesson, LessonProgress, Module, Resource
+from .search import update_search_vectors
+from .sequence import invalidate_lesson_sequence
+
+# Sent after progress is written in bulk, bypassing the LessonProgress signals,
+# with student_id and course_ids
+lesson_progress_synced = Signal()
+# Sent after buffered study time is written in bulk, with user_ids and
+# lesson_seconds, the seconds added per lesson
+study_time_flushed = Signal()
+
+
+def _deleted_directly(origin, model):
+    """Whether a delete started on this model rather than cascading from a parent"""
+    if isinstance(origin, QuerySet):
+        return origin.model is model
+    return isinstance(origin, model)
+
+
+@receiver(post_save, sender=LessonProgress)
+def sync_enrollment_progress(sender, instance, created, **kwargs):
+    """
+    Keep the enrollment progress counters in step with lesson progress
+    """
+    was_completed = getattr(instance, "_loaded_is_completed", False)
+    delta = 0
+    if instance.is_completed != was_completed:
+        delta = 1 if instance.is_completed else -1
+    instance._loaded_is_completed = instance.is_completed
+
+    Enrollment.objects.filter(
+        student_id=instance.student_id,
+        course__modules__lessons=instance.lesson_id
+    ).apply_completed_delta(
+        delta,
+        last_lesson=instance.lesson_id,
+        last_activity=instance.modified or timezone.now()
+    )
+
+
+@receiver(post_delete, sender=LessonProgress)
+def discount_deleted_progress(sender, instance, origin=None, **kwargs):
+    """
+    Remove a deleted completion from the enrollment counters
+    """
+    # Cascades from lessons, modules or courses are recounted by their own handlers
+    if not _deleted_directly(origin, LessonProgress) or not instance.is_completed:
+        return
+
+    Enrollment.objects.filter(
+        student_id=instance.student_id,
+        course__modules__lessons=instance.lesson_id
+    ).apply_completed_delta(-1)
+
+
+@receiver(pre_save, sender=Lesson)
+def remember_lesson_course(sender, instance, **kwargs):
+    """
+    Store the course and position a lesson had before it is saved
+    """
+    instance._previous_course_id = None
+    instance._previous_position = None
+    if instance.pk:
+        previous = Lesson.objects.filter(pk=instance.pk).values_list(
+            "module__course_id", "module_id", "order", "title"
+        ).first()
+        if previous:
+            instance._previous_course_id = previous[0]
+            instance._previous_position = previous[1:]
+
+
+@receiver(post_save, sender=Lesson)
+def count_saved_lesson(sender, instance, created, **kwargs):
+    """
+    Update enrollment totals and the lesson sequence when a lesson is added,
+    reordered or moved to another course
+    """
+    course_id = instance.module.course_id
+    previous_course_id = getattr(instance, "_previous_course_id", None)
+
+    if created:
+        Enrollment.objects.filter(course_id=course_id).apply_total_delta(1)
+    elif previous_course_id != course_id:
+        Enrollment.objects.filter(
+            course_id__in=[previous_course_id, course_id]
+        ).recalculate_progress()
+
+    position = (instance.module_id, instance.order, instance.title)
+    if created or getattr(instance, "_previous_position", None) != position:
+        invalidate_lesson_sequence(previous_course_id, course_id)
+
+
+@receiver(post_delete, sender=Lesson)
+def discount_deleted_lesson(sender, instance, origin=None, **kwargs):
+    """
+    Recount enrollments after a lesson, and its progress records, are deleted
+    """
+    if not _deleted_directly(origin, Lesson):
+        return
+
+    course_id = Module.objects.filter(
+        pk=instance.module_id
+    ).values_list("course_id", flat=True).first()
+    if course_id:
+        Enrollment.objects.filter(course_id=course_id).recalculate_progress()
+        invalidate_lesson_sequence(course_id)
+
+
+@receiver(post_delete, sender=Module)
+def discount_deleted_module(sender, instance, origin=None, **kwargs):
+    """
+    Recount enrollments after a whole module is deleted
+    """
+    if not _deleted_directly(origin, Module):
+        return
+
+    Enrollment.objects.filter(course_id=instance.course_id).recalculate_progress()
+    invalidate_lesson_sequence(instance.course_id)
+
+
+@receiver(pre_save, sender=Module)
+def remember_module_position(sender, instance, **kwargs):
+    """
+    Store the course and order a module had before it is saved
+    """
+    instance._previous_position = None
+    if instance.pk:
+        instance._previous_position = Module.objects.filter(
+            pk=instance.pk
+        ).values_list("course_id", "order").first()
+
+
+@receiver(post_save, sender=Module)
+def reorder_module_lessons(sender, instance, created, **kwargs):
+    """
+    Rebuild the lesson sequence when a module is added, reordered or moved,
+    and recount the enrollments of both courses when it is moved
+    """
+    previous = getattr(instance, "_previous_position", None)
+    if previous and previous[0] != instance.course_id:
+        Enrollment.objects.filter(
+            course_id__in=[previous[0], instance.course_id]
+        ).recalculate_progress()
+    if created or previous != (instance.course_id, instance.order):
+        invalidate_lesson_sequence(previous[0] if previous else None, instance.course_id)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Course)
+@receiver(post_delete, sender=Course)
+def invalidate_category_navigation(sender, instance, **kwargs):
+    """
+    Drop the cached categories and navigation when their courses change
+    """
+    invalidate_categories_cache()
+
+
+@receiver(post_save, sender=Enrollment)
+def count_saved_enrollment(sender, instance, created, **kwargs):
+    """
+    Keep the course enrollment counters in step with new or (de)activated
+    enrollments
+    """
+    was_active = False if created else getattr(instance, "_loaded_active", instance.active)
+    instance._loaded_active = instance.active
+    Course.objects.filter(pk=instance.course_id).adjust_counters(
+        enrollment_count=1 if created else 0,
+        active_enrollment_count=int(instance.active) - int(was_active),
+        completion_count=1 if created and instance.progress >= 100 else 0,
+    )
+
+
+@receiver(post_delete, sender=Enrollment)
+def discount_deleted_enrollment(sender, instance, **kwargs):
+    """
+    Recount the course after an enrollment is removed
+    """
+    # The deleted instance may hold stale progress or state; deletes are rare
+    Course.objects.filter(pk=instance.course_id).recalculate_counters()
+
+
+@receiver(post_save, sender=Certificate)
+def count_saved_certificate(sender, instance, created, **kwargs):
+    if created:
+        Course.objects.filter(pk=instance.course_id).adjust_counters(certificate_count=1)
+
+
+@receiver(post_delete, sender=Certificate)
+def discount_deleted_certificate(sender, instance, **kwargs):
+    Course.objects.filter(pk=instance.course_id).adjust_counters(certificate_count=-1)
+
+
+@receiver(post_save, sender=Enrollment)
+@receiver(post_delete, sender=Enrollment)
+@receiver(post_save, sender=Certificate)
+@receiver(post_delete, sender=Certificate)
+def invalidate_student_stats(sender, instance, **kwargs):
+    """
+    Drop the cached navigation stats of the student
+    """
+    invalidate_user_stats_cache(instance.student_id)
+
+
+@receiver(post_save, sender=Course)
+def index_saved_course(sender, instance, **kwargs):
+    """
+    Rebuild the search vector of a saved course
+    """
+    update_search_vectors([instance.pk])
+
+
+@receiver(post_save, sender=Category)
+def index_category_courses(sender, instance, created, **kwargs):
+    """
+    Rebuild the search vectors of the courses of a renamed category
+    """
+    if not created:
+        update_search_vectors(Course.objects.filter(category=instance).values("pk"))
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def index_instructor_courses(sender, instance, created, update_fields=None, **kwargs):
+    """
+    Rebuild the search vectors of the courses of an instructor whose name may have changed
+    """
+    if created or (update_fields is not None and "name" not in update_fields):
+        return
+    update_search_vectors(Course.objects.filter(instructor=instance).values("pk"))
+
+
+@receiver(post_save, sender=Module)
+@receiver(post_save, sender=Lesson)
+def index_course_content(sender, instance, **kwargs):
+    """
+    Rebuild the search vector of the course a module or lesson belongs to,
+    and of the course it was moved from
+    """
+    if sender is Module:
+        previous = getattr(instance, "_previous_position", None)
+        course_ids = [instance.course_id, previous and previous[0]]
+    else:
+        course_ids = [instance.module.course_id, getattr(instance, "_previous_course_id", None)]
+    update_search_vectors({course_id for course_id in course_ids if course_id})
+
+
+@receiver(post_delete, sender=Module)
+@receiver(post_delete, sender=Lesson)
+def unindex_course_content(sender, instance, origin=None, **kwargs):
+    """
+    Rebuild the search vector of a course after some of its content is deleted
+    """
+    if not _deleted_directly(origin, sender):
+        return
+    if sender is Module:
+        update_search_vectors([instance.course_id])
+    else:
+        update_search_vectors(Module.objects.filter(pk=instance.module_id).values("course_id"))
+
+
+@receiver(post_save, sender=Module)
+@receiver(post_save, sender=Lesson)
+@receiver(post_save, sender=Resource)
+def touch_course_content(sender, instance, **kwargs):
+    """
+    Bump the content version of the course a module, lesson or resource
+    belongs to, and of the course it was moved from
+    """
+    if sender is Module:
+        previous = getattr(instance, "_previous_position", None)
+        courses = Course.objects.filter(pk__in=[instance.course_id, previous and previous[0]])
+    elif sender is Lesson:
+        courses = Course.objects.filter(
+            pk__in=[instance.module.course_id, getattr(instance, "_previous_course_id", None)]
+        )
+    else:
+        courses = Course.objects.filter(modules__lessons=instance.lesson_id)
+    courses.touch()
+
+
+@receiver(post_delete, sender=Module)
+@receiver(post_delete, sender=Lesson)
+@receiver(post_delete, sender=Resource)
+def touch_course_after_delete(sender, instance, origin=None, **kwargs):
+    """
+    Bump the content version of a course after some of its content is deleted
+    """
+    if not _deleted_directly(origin, sender):
+        return
+    if sender is Module:
+        courses = Course.objects.filter(pk=instance.course_id)
+    elif sender is Lesson:
+        courses = Course.objects.filter(modules=instance.module_id)
+    else:
+        courses = Course.objects.filter(modules__lessons=instance.lesson_id)
+    courses.touch()
+
+
+@receiver(post_save, sender=Category)
+def touch_category_courses(sender, instance, created, **kwargs):
+    """
+    Bump the content version of the courses showing a renamed category
+    """
+    if not created:
+        Course.objects.filter(category=instance).touch()
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def touch_instructor_courses(sender, instance, created, update_fields=None, **kwargs):
+    """
+    Bump the content version of the courses showing an instructor's name
+    """
+    if created or (update_fields is not None and "name" not in update_fields):
+        return
+    Course.objects.filter(instructor=instance).touch()
+
+
+@receiver(post_save, sender=Profile)
+def touch_instructor_profile_courses(sender, instance, created, **kwargs):
+    """
+    Bump the content version of the courses showing an instructor's profile
+    """
+    if not created and instance.user.is_teacher:
+        Course.objects.filter(instructor_id=instance.user_id).touch()
@@ -0,0 +1,182 @@
+"""
+Study time from lesson page heartbeats.
+
+Lesson and video pages send a heartbeat every STUDY_HEARTBEAT_INTERVAL
+seconds while visible. Heartbeats only increment a counter per user and
+lesson in Redis (HINCRBY); ``flush_study_time`` periodically drains the
+counters and writes them to LessonProgress and Profile in a few bulk queries,
+so thousands of viewers do not cost a database write per heartbeat.
+
+Without a Redis cache (development and tests) counters are kept in process.
+"""
+import logging
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from redis.exceptions import ConnectionError as RedisConnectionError
+from redis.exceptions import TimeoutError as RedisTimeoutError
+
+from educacion_financiera.apps.profiles.models import Profile
+from educacion_financiera.context_processors import invalidate_user_stats_cache
+
+from .models import Lesson, LessonProgress
+from .signals import study_time_flushed
+
+PENDING_KEY = "study_time:pending"
+THROTTLE_CACHE_KEY = "study_time:throttle:{user_id}"
+ENROLLED_CACHE_KEY = "study_time:enrolled:{user_id}:{lesson_id}"
+
+# Reads and deletes the counters in one step, so a worker dying mid-drain
+# cannot leave them in a key no flush will ever read
+DRAIN_SCRIPT = """
+local pending = redis.call('HGETALL', KEYS[1])
+redis.call('DEL', KEYS[1])
+return pending
+"""
+
+logger = logging.getLogger(__name__)
+
+
+class RedisStudyTimeBuffer:
+    """
+    Counters in a Redis hash, drained atomically by a script
+    """
+    def __init__(self, client):
+        self.client = client
+        self.drain_script = client.register_script(DRAIN_SCRIPT)
+
+    def add(self, user_id, lesson_id, seconds):
+        self.client.hincrby(PENDING_KEY, f"{user_id}:{lesson_id}", seconds)
+
+    def drain(self):
+        pending = self.drain_script(keys=[PENDING_KEY])
+        return {
+            tuple(int(part) for part in field.decode().split(":")): int(seconds)
+            for field, seconds in zip(pending[::2], pending[1::2], strict=True)
+        }
+
+
+class LocalStudyTimeBuffer:
+    """
+    Counters in process memory, for development and tests
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pending = defaultdict(int)
+
+    def add(self, user_id, lesson_id, seconds):
+        with self.lock:
+            self.pending[(user_id, lesson_id)] += seconds
+
+    def drain(self):
+        with self.lock:
+            pending, self.pending = dict(self.pending), defaultdict(int)
+        return pending
+
+
+_local_buffer = LocalStudyTimeBuffer()
+
+
+def get_buffer():
+    try:
+        from django_redis import get_redis_connection
+        return RedisStudyTimeBuffer(get_redis_connection("default"))
+    except (ImportError, NotImplementedError):
+        # The default cache is not django-redis
+        return _local_buffer
+
+
+def is_enrolled_in_lesson(user, lesson_id):
+    """Whether the user may study the lesson, cached between heartbeats"""
+    key = ENROLLED_CACHE_KEY.format(user_id=user.pk, lesson_id=lesson_id)
+    enrolled = cache.get(key)
+    if enrolled is None:
+        enrolled = Lesson.objects.filter(
+            pk=lesson_id,
+            module__course__enrollments__student=user,
+            module__course__enrollments__active=True,
+        ).exists()
+        cache.set(key, enrolled, settings.STUDY_HEARTBEAT_INTERVAL * 10)
+    return enrolled
+
+
+def record_heartbeat(user, lesson_id, seconds=None):
+    """
+    Credit up to one heartbeat interval of study time to a user and lesson.
+    Returns the seconds credited, 0 when heartbeats come faster than the
+    interval or Redis is unreachable.
+    """
+    interval = settings.STUDY_HEARTBEAT_INTERVAL
+    seconds = interval if seconds is None else min(max(int(seconds), 0), interval)
+    # A user studies one lesson at a time, however many tabs are open
+    throttle = THROTTLE_CACHE_KEY.format(user_id=user.pk)
+    if not seconds or not cache.add(throttle, True, timeout=max(interval - 5, 1)):
+        return 0
+
+    try:
+        get_buffer().add(user.pk, lesson_id, seconds)
+    except (RedisConnectionError, RedisTimeoutError):
+        # Losing a beat is cheaper than failing the lesson page
+        logger.warning("Dropped a study heartbeat, Redis is unreachable")
+        return 0
+    return seconds
+
+
+def flush_study_time(buffer=None):
+    """
+    Write buffered study time to lesson progress and profile totals. Returns
+    the number of (user, lesson) pairs flushed.
+    """
+    buffer = buffer or get_buffer()
+    pending = buffer.drain()
+    if not pending:
+        return 0
+
+    try:
+        _write_study_time(pending)
+    except Exception:
+        # Keep the counters for the next run
+        for (user_id, lesson_id), seconds in pending.items():
+            buffer.add(user_id, lesson_id, seconds)
+        raise
+    return len(pending)
+
+
+@transaction.atomic
+def _write_study_time(pending):
+    user_ids = {user_id for user_id, _lesson_id in pending}
+    lesson_ids = {lesson_id for _user_id, lesson_id in pending}
+    # Make sure every row exists first, so rows inserted concurrently (a
+    # completion, a sync) are locked and added to below instead of dropped
+    LessonProgress.objects.bulk_create(
+        [LessonProgress(student_id=user_id, lesson_id=lesson_id) for user_id, lesson_id in pending],
+        batch_size=500,
+        ignore_conflicts=True,
+    )
+    updated = []
+    for progress in LessonProgress.objects.select_for_update().filter(
+        student_id__in=user_ids, lesson_id__in=lesson_ids
+    ):
+        seconds = pending.get((progress.student_id, progress.lesson_id))
+        if seconds is not None:
+            progress.time_spent += seconds
+            updated.append(progress)
+    LessonProgress.objects.bulk_update(updated, ["time_spent"], batch_size=500)
+
+    # Profile totals are minutes, recomputed from the lesson records
+    Profile.objects.filter(user_id__in=user_ids).update(total_study_time=Coalesce(Subquery(
+        LessonProgress.objects.filter(student=OuterRef("user")).order_by().values("student").annotate(
+            total=Sum("time_spent") / 60
+        ).values("total")[:1]
+    ), 0))
+    for user_id in user_ids:
+        invalidate_user_stats_cache(user_id)
+    lesson_seconds = defaultdict(int)
+    for (_user_id, lesson_id), seconds in pending.items():
+        lesson_seconds[lesson_id] += seconds
+    study_time_flushed.send(sender=LessonProgress, user_ids=sorted(user_ids), lesson_seconds=dict(lesson_seconds))
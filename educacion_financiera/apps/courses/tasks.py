@@ -0,0 +1,9 @@
+from celery import shared_task
+
+from .study_time import flush_study_time
+
+
+@shared_task()
+def flush_buffered_study_time():
+    """Write study time buffered from heartbeats to the database"""
+    return flush_study_time()
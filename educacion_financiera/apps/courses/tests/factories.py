@@ -0,0 +1,58 @@
+from factory import Faker
+from factory import Sequence
+from factory import SubFactory
+from factory.django import DjangoModelFactory
+
+from educacion_financiera.apps.courses.models import Category
+from educacion_financiera.apps.courses.models import Course
+from educacion_financiera.apps.courses.models import Enrollment
+from educacion_financiera.apps.courses.models import Lesson
+from educacion_financiera.apps.courses.models import Module
+from educacion_financiera.users.tests.factories import UserFactory
+
+
+class CategoryFactory(DjangoModelFactory[Category]):
+    name = Faker("word")
+    slug = Sequence(lambda n: f"category-{n}")
+
+    class Meta:
+        model = Category
+
+
+class CourseFactory(DjangoModelFactory[Course]):
+    title = Faker("sentence", nb_words=4)
+    slug = Sequence(lambda n: f"course-{n}")
+    category = SubFactory(CategoryFactory)
+    instructor = SubFactory(UserFactory, is_teacher=True, is_student=False)
+    overview = Faker("paragraph")
+    visibility = "public"
+
+    class Meta:
+        model = Course
+
+
+class ModuleFactory(DjangoModelFactory[Module]):
+    course = SubFactory(CourseFactory)
+    title = Faker("sentence", nb_words=3)
+    order = Sequence(lambda n: n)
+
+    class Meta:
+        model = Module
+
+
+class LessonFactory(DjangoModelFactory[Lesson]):
+    module = SubFactory(ModuleFactory)
+    title = Faker("sentence", nb_words=3)
+    description = Faker("paragraph")
+    order = Sequence(lambda n: n)
+
+    class Meta:
+        model = Lesson
+
+
+class EnrollmentFactory(DjangoModelFactory[Enrollment]):
+    student = SubFactory(UserFactory)
+    course = SubFactory(CourseFactory)
+
+    class Meta:
+        model = Enrollment
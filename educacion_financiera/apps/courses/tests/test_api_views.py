@@ -0,0 +1,127 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from educacion_financiera.apps.courses.models import Certificate
+from educacion_financiera.apps.courses.models import LessonProgress
+from educacion_financiera.apps.courses.tests.factories import CourseFactory
+from educacion_financiera.apps.courses.tests.factories import EnrollmentFactory
+from educacion_financiera.apps.courses.tests.factories import LessonFactory
+from educacion_financiera.apps.courses.tests.factories import ModuleFactory
+from educacion_financiera.users.tests.factories import UserFactory
+
+pytestmark = pytest.mark.django_db
+
+
+def _create_enrolled_courses(student, count, certified=False):
+    for _ in range(count):
+        module = ModuleFactory(course=CourseFactory())
+        lesson, _other = LessonFactory.create_batch(2, module=module)
+        EnrollmentFactory(student=student, course=module.course)
+        LessonProgress.objects.create(student=student, lesson=lesson, is_completed=True)
+        if certified:
+            Certificate.objects.create(student=student, course=module.course)
+
+
+def _count_queries(client, url):
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get(url)
+    assert response.status_code == 200
+    return len(queries), response.json()
+
+
+def _results(data):
+    return data["results"] if isinstance(data, dict) else data
+
+
+class TestBatchCourseProgress:
+    @pytest.mark.parametrize(
+        "url",
+        [
+            "/api/courses/courses/",
+            "/api/courses/user/enrollments/",
+            "/api/courses/user/certificates/",
+        ],
+    )
+    def test_query_count_does_not_grow_with_page_size(self, url):
+        student = UserFactory()
+        client = APIClient()
+        client.force_authenticate(student)
+
+        # Certificates too, so the certificate list has several courses to load
+        _create_enrolled_courses(student, 2, certified=True)
+        small, small_data = _count_queries(client, url)
+        _create_enrolled_courses(student, 5, certified=True)
+        large, large_data = _count_queries(client, url)
+
+        assert small == large
+        assert len(_results(large_data)) == 7
+        assert len(_results(small_data)) == 2
+
+    def test_course_list_progress_fields(self):
+        student = UserFactory()
+        client = APIClient()
+        client.force_authenticate(student)
+        _create_enrolled_courses(student, 1)
+        CourseFactory()
+
+        _queries, data = _count_queries(client, "/api/courses/courses/")
+
+        by_enrollment = {course["is_enrolled"]: course for course in data["results"]}
+        assert by_enrollment[True]["progress"] == 50.0
+        assert by_enrollment[True]["total_lessons"] == 2
+        assert by_enrollment[True]["enrollment_count"] == 1
+        assert by_enrollment[False]["progress"] == 0
+        categories = {category["id"]: category for category in data["included"]["categories"]}
+        assert categories[by_enrollment[True]["category"]]["course_count"] == 1
+
+
+class TestCourseListPagination:
+    def test_cursor_walks_every_course_once(self):
+        courses = CourseFactory.create_batch(5)
+        for course in courses[:2]:
+            EnrollmentFactory(course=course)
+        client = APIClient()
+
+        seen = []
+        url = "/api/courses/courses/?page_size=2"
+        while url:
+            data = client.get(url).json()
+            assert len(data["results"]) <= 2
+            seen.extend(course["id"] for course in data["results"])
+            url = data["next"]
+
+        assert sorted(seen) == sorted(course.id for course in courses)
+        assert set(seen[:2]) == {course.id for course in courses[:2]}
+
+    @pytest.mark.parametrize("ordering", ["popularity", "-created", "created", "price", "-price"])
+    def test_orderings_are_stable(self, ordering):
+        for price in (0, 10, 10, 20):
+            CourseFactory(price=price)
+        client = APIClient()
+        expected = [
+            course["id"] for course in
+            client.get(f"/api/courses/courses/?ordering={ordering}").json()["results"]
+        ]
+
+        first = client.get(f"/api/courses/courses/?ordering={ordering}&page_size=3").json()
+        second = client.get(first["next"]).json()
+
+        assert [course["id"] for course in first["results"] + second["results"]] == expected
+        assert second["next"] is None
+
+    def test_invalid_cursor(self):
+        response = APIClient().get("/api/courses/courses/", {"cursor": "not-a-cursor"})
+        assert response.status_code == 404
+
+    def test_sparse_fieldset_and_included(self):
+        instructor = UserFactory()
+        CourseFactory.create_batch(3, instructor=instructor)
+        client = APIClient()
+
+        data = client.get("/api/courses/courses/", {"fields": "title,instructor"}).json()
+
+        assert all(set(course) == {"id", "title", "instructor"} for course in data["results"])
+        assert [item["id"] for item in data["included"]["instructors"]] == [instructor.id]
+        assert "categories" not in data["included"]
@@ -0,0 +1,41 @@
+import pytest
+from django.test import RequestFactory
+from django.urls import resolve
+
+from educacion_financiera.apps.courses.models import Enrollment
+from educacion_financiera.apps.courses.tests.factories import CategoryFactory, CourseFactory
+from educacion_financiera.context_processors import global_context
+
+pytestmark = pytest.mark.django_db
+
+
+def _context(user, rf: RequestFactory):
+    request = rf.get("/")
+    request.user = user
+    request.resolver_match = resolve("/")
+    return global_context(request)
+
+
+def test_global_context_is_lazy(user, rf: RequestFactory, django_assert_num_queries):
+    with django_assert_num_queries(0):
+        _context(user, rf)
+
+
+def test_user_stats_cached_until_enrollment_changes(user, rf: RequestFactory, django_assert_num_queries):
+    course = CourseFactory()
+    assert _context(user, rf)["user_stats"]["enrolled_courses"] == 0
+    with django_assert_num_queries(0):
+        assert _context(user, rf)["user_stats"]["enrolled_courses"] == 0
+
+    Enrollment.objects.create(student=user, course=course)
+    assert _context(user, rf)["user_stats"]["enrolled_courses"] == 1
+
+
+def test_categories_cached_until_course_changes(user, rf: RequestFactory, django_assert_num_queries):
+    category = CategoryFactory()
+    assert [c.course_count for c in _context(user, rf)["categories"]] == [0]
+    with django_assert_num_queries(0):
+        assert len(_context(user, rf)["categories"]) == 1
+
+    CourseFactory(category=category)
+    assert [c.course_count for c in _context(user, rf)["categories"]] == [1]
@@ -0,0 +1,65 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from educacion_financiera.apps.courses.curriculum import Curriculum
+from educacion_financiera.apps.courses.models import Course
+from educacion_financiera.apps.courses.models import LessonProgress
+from educacion_financiera.apps.courses.tests.factories import CourseFactory
+from educacion_financiera.apps.courses.tests.factories import EnrollmentFactory
+from educacion_financiera.apps.courses.tests.factories import LessonFactory
+from educacion_financiera.apps.courses.tests.factories import ModuleFactory
+
+pytestmark = pytest.mark.django_db
+
+
+def _course_with_lessons(modules, lessons):
+    course = CourseFactory()
+    for module in ModuleFactory.create_batch(modules, course=course):
+        LessonFactory.create_batch(lessons, module=module)
+    return Course.objects.get(pk=course.pk)
+
+
+def test_curriculum_cached_per_version(django_assert_num_queries):
+    course = _course_with_lessons(2, 3)
+    modules = Curriculum.for_course(course).modules
+    assert [len(module["lessons"]) for module in modules] == [3, 3]
+
+    with django_assert_num_queries(0):
+        assert Curriculum.for_course(course).modules == modules
+
+    LessonFactory(module_id=modules[0]["id"], title="Nueva lección")
+    course.refresh_from_db()
+    assert Curriculum.for_course(course).modules[0]["lessons_count"] == 4
+
+
+def test_progress_overlay(user):
+    course = _course_with_lessons(1, 2)
+    enrollment = EnrollmentFactory(student=user, course=course)
+    lesson = course.modules.get().lessons.first()
+    LessonProgress.objects.create(student=enrollment.student, lesson=lesson, is_completed=True)
+
+    module, = Curriculum.for_course(course).with_progress(user)
+
+    assert module["progress"] == 50.0
+    progress = {item["id"]: item["progress"] for item in module["lessons"]}
+    assert progress[lesson.id]["is_completed"] is True
+    assert list(progress.values()).count(None) == 1
+
+
+def test_course_detail_queries_do_not_grow_with_lessons(user):
+    client = APIClient()
+    client.force_authenticate(user)
+    counts = []
+    for lessons in (1, 6):
+        course = _course_with_lessons(2, lessons)
+        url = reverse("api:courses_api:course-detail", kwargs={"slug": course.slug})
+        client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url)
+        assert len(response.json()["modules"][0]["lessons"]) == lessons
+        counts.append(len(queries))
+
+    assert counts[0] == counts[1]
@@ -0,0 +1,100 @@
+import csv
+import io
+import os
+import time
+
+import pyarrow.parquet as pq
+import pytest
+from django.core import signing
+from django.urls import reverse
+
+from educacion_financiera import exports
+from educacion_financiera.apps.courses.admin import EnrollmentAdmin
+from educacion_financiera.apps.courses.models import Enrollment
+from educacion_financiera.apps.courses.tests.factories import CourseFactory
+from educacion_financiera.apps.courses.tests.factories import EnrollmentFactory
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def course():
+    course = CourseFactory()
+    EnrollmentFactory.create_batch(5, course=course)
+    EnrollmentFactory.create_batch(2)
+    return course
+
+
+def test_csv_export_streams_the_filtered_changelist(admin_client, course):
+    url = reverse("admin:courses_enrollment_export_csv")
+
+    response = admin_client.get(url, {"course__id__exact": course.id})
+
+    assert response.streaming
+    assert response["Content-Disposition"].startswith('attachment; filename="enrollment-')
+    rows = list(csv.reader(io.StringIO(b"".join(response.streaming_content).decode())))
+    assert rows[0] == [header for header, _field in EnrollmentAdmin.export_columns]
+    assert len(rows) == 6
+    assert {row[4] for row in rows[1:]} == {course.title}
+
+
+def test_export_requires_staff(client, user, course):
+    client.force_login(user)
+    response = client.get(reverse("admin:courses_enrollment_export_csv"))
+    assert response.status_code == 302
+
+
+def test_parquet_export_in_row_groups(monkeypatch, course):
+    monkeypatch.setattr(exports, "EXPORT_CHUNK_SIZE", 2)
+    queryset = Enrollment.objects.filter(course=course)
+
+    exports.generate_parquet_export(
+        exports.dump_query(queryset), EnrollmentAdmin.export_columns, "enrollment-test.parquet"
+    )
+
+    with exports.get_export_storage().open("enrollment-test.parquet") as export:
+        parquet = pq.ParquetFile(export)
+        assert parquet.metadata.num_rows == 5
+        assert parquet.metadata.num_row_groups == 3
+        table = parquet.read()
+    assert str(table.schema.field("progress").type) == "double"
+    assert str(table.schema.field("date_enrolled").type) == "timestamp[us, tz=UTC]"
+    assert set(table.column("course_id").to_pylist()) == {course.id}
+
+
+def test_parquet_view_queues_the_export(admin_client, monkeypatch, course):
+    queued = []
+    monkeypatch.setattr(exports.generate_parquet_export, "delay", lambda *args: queued.append(args))
+
+    response = admin_client.get(reverse("admin:courses_enrollment_export_parquet"), {"course__id__exact": course.id})
+
+    assert response.status_code == 302
+    signed_query, columns, name = queued[0]
+    assert exports.load_query(signed_query).count() == 5
+    download = reverse("admin:courses_enrollment_export_download", args=[name])
+    assert admin_client.get(download).status_code == 404
+
+    exports.generate_parquet_export(signed_query, columns, name)
+    response = admin_client.get(download)
+    assert response.status_code == 200
+    assert pq.read_table(io.BytesIO(b"".join(response.streaming_content))).num_rows == 5
+
+
+def test_exports_are_private_and_expire(settings, course):
+    settings.EXPORT_RETENTION_DAYS = 7
+    queryset = Enrollment.objects.filter(course=course)
+    for name in ["enrollment-old.parquet", "enrollment-new.parquet"]:
+        exports.generate_parquet_export(exports.dump_query(queryset), EnrollmentAdmin.export_columns, name)
+    storage = exports.get_export_storage()
+    assert not storage.path("enrollment-new.parquet").startswith(settings.MEDIA_ROOT + os.sep)
+    eight_days_ago = time.time() - 8 * 24 * 3600
+    os.utime(storage.path("enrollment-old.parquet"), (eight_days_ago, eight_days_ago))
+
+    assert exports.delete_expired_exports() == 1
+    assert storage.listdir("")[1] == ["enrollment-new.parquet"]
+
+
+def test_tampered_query_is_rejected():
+    signed = exports.dump_query(Enrollment.objects.all())
+    with pytest.raises(signing.BadSignature):
+        exports.load_query("x" + signed)
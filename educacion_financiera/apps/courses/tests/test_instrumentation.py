@@ -0,0 +1,80 @@
+import json
+
+import pytest
+from django.db import connection
+from django.urls import reverse
+
+from educacion_financiera.apps.courses.models import Course
+from educacion_financiera.apps.courses.tests.factories import CourseFactory
+from educacion_financiera.instrumentation import RequestMetrics
+from educacion_financiera.instrumentation import registry
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture(autouse=True)
+def _clear_registry():
+    registry.clear()
+    yield
+    registry.clear()
+
+
+def test_metrics_recorded_per_view(client, settings):
+    settings.INSTRUMENTATION_SERVER_TIMING = True
+    CourseFactory()
+
+    response = client.get(reverse("courses:course_list"))
+
+    assert response.status_code == 200
+    assert response["Server-Timing"].startswith("db;dur=")
+    metrics = registry.render()
+    assert 'django_view_db_queries_count{view="courses:course_list"} 1' in metrics
+    assert 'django_view_render_seconds_count{view="courses:course_list"} 1' in metrics
+    assert 'processor="global_context",view="courses:course_list"' in metrics
+    assert 'django_http_responses_total{method="GET",status="200",view="courses:course_list"} 1' in metrics
+
+
+def test_metrics_add_up_worker_processes(client, settings, tmp_path):
+    settings.INSTRUMENTATION_METRICS_DIR = str(tmp_path)
+    # Totals another worker wrote
+    (tmp_path / "metrics-1-abcd.json").write_text(json.dumps({
+        "summaries": [["django_view_db_queries", [["view", "courses:course_list"]], 3, 12.0]],
+        "counters": [[
+            "django_http_responses_total",
+            [["method", "GET"], ["status", 200], ["view", "courses:course_list"]],
+            3,
+        ]],
+    }))
+
+    client.get(reverse("courses:course_list"))
+
+    metrics = registry.render()
+    assert 'django_view_db_queries_count{view="courses:course_list"} 4' in metrics
+    assert 'django_http_responses_total{method="GET",status="200",view="courses:course_list"} 4' in metrics
+    assert len(list(tmp_path.glob("metrics-*.json"))) == 2
+
+
+def test_repeated_queries_flagged_with_origin(settings):
+    settings.INSTRUMENTATION_N_PLUS_ONE_THRESHOLD = 3
+    courses = CourseFactory.create_batch(3)
+    metrics = RequestMetrics()
+
+    with connection.execute_wrapper(metrics):
+        for course in courses:
+            Course.objects.filter(pk=course.pk).first()
+        Course.objects.filter(pk=courses[0].pk).first()
+
+    assert metrics.queries == 4
+    assert metrics.duplicates == 1
+    [origin] = metrics.repeated.values()
+    assert origin.startswith("apps/courses/tests/test_instrumentation.py:")
+
+
+def test_metrics_endpoint_requires_staff_or_token(client, settings, admin_user):
+    settings.INSTRUMENTATION_METRICS_TOKEN = "secret"
+    url = reverse("metrics")
+
+    assert client.get(url).status_code == 403
+    assert client.get(url, HTTP_AUTHORIZATION="Bearer secret").status_code == 200
+    client.force_login(admin_user)
+    assert client.get(url).status_code == 200
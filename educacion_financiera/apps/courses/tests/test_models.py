@@ -0,0 +1,165 @@
+import pytest
+
+from educacion_financiera.apps.courses.models import Certificate
+from educacion_financiera.apps.courses.models import Course
+from educacion_financiera.apps.courses.models import Enrollment
+from educacion_financiera.apps.courses.models import LessonProgress
+from educacion_financiera.apps.courses.tests.factories import CourseFactory
+from educacion_financiera.apps.courses.tests.factories import EnrollmentFactory
+from educacion_financiera.apps.courses.tests.factories import LessonFactory
+from educacion_financiera.apps.courses.tests.factories import ModuleFactory
+
+pytestmark = pytest.mark.django_db
+
+
+class TestEnrollmentProgress:
+    def test_counters_seeded_on_enrollment(self):
+        module = ModuleFactory()
+        LessonFactory.create_batch(4, module=module)
+
+        enrollment = EnrollmentFactory(course=module.course)
+
+        assert enrollment.total_lessons == 4
+        assert enrollment.completed_lessons == 0
+        assert enrollment.progress == 0
+
+    def test_completion_flips_update_counters(self):
+        module = ModuleFactory()
+        lessons = LessonFactory.create_batch(4, module=module)
+        enrollment = EnrollmentFactory(course=module.course)
+
+        progress = LessonProgress.objects.create(student=enrollment.student, lesson=lessons[0])
+        progress.mark_completed()
+        enrollment.refresh_from_db()
+        assert enrollment.completed_lessons == 1
+        assert enrollment.progress == 25.0
+        assert enrollment.last_lesson == lessons[0]
+
+        # Saving again without a flip must not double count
+        progress.time_spent = 30
+        progress.save()
+        progress = LessonProgress.objects.get(pk=progress.pk)
+        progress.is_completed = False
+        progress.save()
+        enrollment.refresh_from_db()
+        assert enrollment.completed_lessons == 0
+        assert enrollment.progress == 0
+
+    def test_lessons_added_and_removed(self):
+        module = ModuleFactory()
+        lessons = LessonFactory.create_batch(2, module=module)
+        enrollment = EnrollmentFactory(course=module.course)
+        LessonProgress.objects.create(
+            student=enrollment.student, lesson=lessons[0], is_completed=True,
+        )
+
+        LessonFactory.create_batch(2, module=module)
+        enrollment.refresh_from_db()
+        assert (enrollment.completed_lessons, enrollment.total_lessons) == (1, 4)
+        assert enrollment.progress == 25.0
+
+        lessons[0].delete()
+        enrollment.refresh_from_db()
+        assert (enrollment.completed_lessons, enrollment.total_lessons) == (0, 3)
+
+    def test_module_moved_between_courses(self):
+        module = ModuleFactory()
+        lessons = LessonFactory.create_batch(2, module=module)
+        old_course = module.course
+        LessonFactory(module=ModuleFactory(course=old_course))
+        new_course = CourseFactory()
+        LessonFactory(module=ModuleFactory(course=new_course))
+        leaving = EnrollmentFactory(course=old_course)
+        joining = EnrollmentFactory(student=leaving.student, course=new_course)
+        LessonProgress.objects.create(student=leaving.student, lesson=lessons[0], is_completed=True)
+
+        module.course = new_course
+        module.save()
+
+        leaving.refresh_from_db()
+        joining.refresh_from_db()
+        assert (leaving.completed_lessons, leaving.total_lessons, leaving.progress) == (0, 1, 0)
+        assert (joining.completed_lessons, joining.total_lessons) == (1, 3)
+        assert joining.progress == 33.3
+
+    def test_recalculate_progress_matches_source(self):
+        module = ModuleFactory()
+        lessons = LessonFactory.create_batch(3, module=module)
+        enrollment = EnrollmentFactory(course=module.course)
+        LessonProgress.objects.create(
+            student=enrollment.student, lesson=lessons[1], is_completed=True,
+        )
+        Enrollment.objects.filter(pk=enrollment.pk).update(
+            completed_lessons=0, total_lessons=0, progress=0,
+        )
+
+        Enrollment.objects.filter(pk=enrollment.pk).recalculate_progress()
+
+        enrollment.refresh_from_db()
+        assert (enrollment.completed_lessons, enrollment.total_lessons) == (1, 3)
+        assert enrollment.progress == 33.3
+        assert enrollment.last_lesson == lessons[1]
+
+
+class TestCourseCounters:
+    def counters(self, course):
+        return Course.objects.values_list(*Course.COUNTER_FIELDS).get(pk=course.pk)
+
+    def test_enrollments_and_certificates_are_counted(self):
+        module = ModuleFactory()
+        lesson = LessonFactory(module=module)
+        course = module.course
+        first, second = EnrollmentFactory.create_batch(2, course=course)
+        assert self.counters(course) == (2, 2, 0, 0)
+
+        second = Enrollment.objects.get(pk=second.pk)
+        second.active = False
+        second.save()
+        second.save()
+        LessonProgress.objects.create(student=first.student, lesson=lesson, is_completed=True)
+        Certificate.objects.create(student=first.student, course=course)
+        assert self.counters(course) == (2, 1, 1, 1)
+
+        first.delete()
+        assert self.counters(course) == (1, 0, 0, 1)
+
+    def test_completions_shift_the_count_instead_of_recounting(self, django_assert_num_queries):
+        module = ModuleFactory()
+        lesson = LessonFactory(module=module)
+        course = module.course
+        first, second = EnrollmentFactory.create_batch(2, course=course)
+        # Drift left by earlier writes is kept, proving nothing recounts
+        Course.objects.filter(pk=course.pk).update(completion_count=5)
+
+        progress = LessonProgress.objects.create(student=first.student, lesson=lesson, is_completed=True)
+        assert self.counters(course)[2] == 6
+
+        # Progress changes that cross no boundary leave it alone
+        progress.time_spent = 30
+        progress.save()
+        assert self.counters(course)[2] == 6
+
+        # A new lesson takes the finished enrollment back below 100%
+        # Savepoint, lock, update, new progress, counter shift and release
+        with django_assert_num_queries(6):
+            Enrollment.objects.filter(course=course).apply_total_delta(1)
+        assert self.counters(course)[2] == 5
+
+    def test_course_save_keeps_counters(self):
+        enrollment = EnrollmentFactory()
+        course = Course.objects.get(pk=enrollment.course_id)
+        EnrollmentFactory(course=course)
+
+        course.title = "Renamed"
+        course.save()
+
+        assert self.counters(course)[:2] == (2, 2)
+
+    def test_recalculate_counters_matches_source(self):
+        course = CourseFactory()
+        EnrollmentFactory.create_batch(3, course=course)
+        Course.objects.filter(pk=course.pk).update(enrollment_count=0, active_enrollment_count=7)
+
+        Course.objects.filter(pk=course.pk).recalculate_counters()
+
+        assert self.counters(course) == (3, 3, 0, 0)
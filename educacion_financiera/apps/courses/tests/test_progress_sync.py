@@ -0,0 +1,171 @@
+from datetime import timedelta
+
+import pytest
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from educacion_financiera.apps.courses.models import Certificate
+from educacion_financiera.apps.courses.models import Course
+from educacion_financiera.apps.courses.models import Enrollment
+from educacion_financiera.apps.courses.models import LessonProgress
+from educacion_financiera.apps.courses.benchmarks import benchmark_completions
+from educacion_financiera.apps.courses.benchmarks import build_dataset
+from educacion_financiera.apps.courses.benchmarks import pending_completions
+from educacion_financiera.apps.courses.progress import set_lesson_completion
+from educacion_financiera.apps.courses.progress import sync_lesson_progress
+from educacion_financiera.apps.courses.tests.factories import EnrollmentFactory
+from educacion_financiera.apps.courses.tests.factories import LessonFactory
+from educacion_financiera.apps.courses.tests.factories import ModuleFactory
+from educacion_financiera.apps.profiles.tasks import evaluate_user_achievements
+
+pytestmark = pytest.mark.django_db
+
+
+def _enrolled_lessons(user, count):
+    module = ModuleFactory()
+    lessons = LessonFactory.create_batch(count, module=module)
+    EnrollmentFactory(student=user, course=module.course)
+    return lessons
+
+
+def test_sync_applies_events_per_course(user):
+    first = _enrolled_lessons(user, 2)
+    second = _enrolled_lessons(user, 4)
+    other = LessonFactory()
+    LessonProgress.objects.create(student=user, lesson=second[0], time_spent=60)
+
+    result = sync_lesson_progress(user, [
+        {"lesson_id": first[0].id, "completed": True, "time_spent": 30},
+        {"lesson_id": first[1].id, "completed": True, "time_spent": 20},
+        {"lesson_id": second[0].id, "completed": True, "time_spent": 15},
+        {"lesson_id": second[0].id, "completed": False, "time_spent": 5},
+        {"lesson_id": other.id, "completed": True, "time_spent": 10},
+    ])
+
+    statuses = {item["lesson_id"]: item["status"] for item in result["lessons"]}
+    assert statuses[other.id] == "not_enrolled"
+    courses = {item["course_id"]: item for item in result["courses"]}
+    assert courses[first[0].module.course_id]["progress"] == 100
+    assert courses[first[0].module.course_id]["certificate_awarded"] is True
+    assert courses[second[0].module.course_id]["completed_lessons"] == 0
+
+    progress = LessonProgress.objects.get(student=user, lesson=second[0])
+    assert (progress.is_completed, progress.time_spent) == (False, 80)
+    assert Certificate.objects.filter(student=user).count() == 1
+    assert not LessonProgress.objects.filter(lesson=other).exists()
+
+
+def test_older_offline_change_does_not_override_the_server(user):
+    lesson, _other = _enrolled_lessons(user, 2)
+    LessonProgress.objects.create(student=user, lesson=lesson, is_completed=True)
+
+    result = sync_lesson_progress(user, [{
+        "lesson_id": lesson.id,
+        "completed": False,
+        "time_spent": 40,
+        "client_timestamp": timezone.now() - timedelta(hours=1),
+    }])
+
+    assert result["lessons"] == [{"lesson_id": lesson.id, "status": "stale"}]
+    progress = LessonProgress.objects.get(student=user, lesson=lesson)
+    assert (progress.is_completed, progress.time_spent) == (True, 40)
+    assert Enrollment.objects.get(student=user).completed_lessons == 1
+
+
+def test_sync_endpoint(user, django_assert_max_num_queries):
+    lessons = _enrolled_lessons(user, 10)
+    client = APIClient()
+    client.force_authenticate(user)
+    events = [{"lesson_id": lesson.id, "time_spent": 12} for lesson in lessons]
+
+    with django_assert_max_num_queries(12):
+        response = client.post(reverse("api:courses_api:progress-sync"), {"events": events}, format="json")
+
+    assert response.status_code == 200
+    assert len(response.json()["lessons"]) == 10
+    assert LessonProgress.objects.filter(student=user, time_spent=12).count() == 10
+
+    response = client.post(reverse("api:courses_api:progress-sync"), {"events": []}, format="json")
+    assert response.status_code == 400
+
+
+def test_completion_updates_counters_and_awards_the_certificate(user, django_assert_num_queries):
+    first, last = _enrolled_lessons(user, 2)
+    course = first.module.course
+
+    assert set_lesson_completion(user, first.id, time_spent=30)["course_progress"] == 50
+    with django_assert_num_queries(14):
+        result = set_lesson_completion(user, last.id)
+
+    assert result["completed"] and result["changed"] and result["certificate_awarded"]
+    assert (result["course_progress"], result["completed_lessons"]) == (100, 2)
+    enrollment = Enrollment.objects.get(student=user, course=course)
+    assert (enrollment.progress, enrollment.last_lesson_id) == (100, last.id)
+    course.refresh_from_db()
+    assert (course.completion_count, course.certificate_count) == (1, 1)
+    assert user.profile.current_streak == 1
+
+    # Completing again only adds the time spent
+    result = set_lesson_completion(user, first.id, time_spent=15)
+    assert (result["changed"], result["time_spent"], result["certificate_awarded"]) == (False, 45, False)
+
+    result = set_lesson_completion(user, last.id, completed=None)
+    assert (result["completed"], result["course_progress"]) == (False, 50)
+    assert LessonProgress.objects.get(student=user, lesson=last).completed_at is None
+    assert Course.objects.get(pk=course.pk).completion_count == 0
+    assert Certificate.objects.filter(student=user, course=course).count() == 1
+
+
+def test_completion_requires_an_active_enrollment(user):
+    lesson = LessonFactory()
+    assert set_lesson_completion(user, lesson.id)["status"] == "not_enrolled"
+
+    lesson, _other = _enrolled_lessons(user, 2)
+    Enrollment.objects.filter(student=user).update(active=False)
+    assert set_lesson_completion(user, lesson.id)["status"] == "not_enrolled"
+    assert not LessonProgress.objects.exists()
+
+
+def test_completion_entry_points(user, client):
+    lessons = _enrolled_lessons(user, 4)
+    api = APIClient()
+    api.force_authenticate(user)
+    client.force_login(user)
+
+    response = api.post(reverse("api:courses_api:lesson-complete", args=[lessons[0].id]), {"time_spent": 20})
+    assert response.json()["course_progress"] == 25
+    response = api.post(reverse("api:courses_api:lesson-complete"), {"lesson_id": lessons[1].id})
+    assert response.json()["completed"] is True
+    response = client.post(reverse("courses:mark_lesson_complete", args=[lessons[0].id]))
+    assert response.json()["action"] == "uncompleted"
+    lesson = lessons[2]
+    response = client.post(
+        reverse("courses:lesson_detail", args=[lesson.module.course.slug, lesson.module_id, lesson.id]),
+        {"action": "complete_lesson"},
+    )
+    assert response.status_code == 302
+
+    completed = set(LessonProgress.objects.filter(student=user, is_completed=True).values_list("lesson_id", flat=True))
+    assert completed == {lessons[1].id, lessons[2].id}
+    assert Enrollment.objects.get(student=user).completed_lessons == 2
+    assert LessonProgress.objects.get(lesson=lessons[0]).time_spent == 20
+
+    other = LessonFactory()
+    response = api.post(reverse("api:courses_api:lesson-complete"), {"lesson_id": other.id})
+    assert response.status_code == 400
+    assert client.post(reverse("courses:mark_lesson_complete", args=[other.id])).json()["success"] is False
+
+
+@pytest.mark.django_db(transaction=True)
+def test_benchmark_completions_keeps_counters_consistent(monkeypatch):
+    monkeypatch.setattr(evaluate_user_achievements, "delay", lambda user_ids: None)
+    dataset = build_dataset(users=4, courses=2, modules_per_course=1, lessons_per_module=3, completion_ratio=0)
+    pairs = pending_completions(dataset["prefix"])
+
+    # SQLite locks whole tables, concurrent workers are benchmarked on PostgreSQL
+    result = benchmark_completions(pairs, workers=1)
+
+    assert result["completions"] == len(pairs) == 24
+    enrollments = Enrollment.objects.filter(course__slug__startswith=dataset["prefix"])
+    assert set(enrollments.values_list("progress", flat=True)) == {100}
@@ -0,0 +1,60 @@
+import pytest
+from django.test import Client
+from django.urls import URLResolver
+from django.urls import get_resolver
+
+from educacion_financiera.apps.courses import study_time
+from educacion_financiera.apps.courses.benchmarks import BUDGET_DATASET
+from educacion_financiera.apps.courses.benchmarks import ENDPOINTS
+from educacion_financiera.apps.courses.benchmarks import ROLES
+from educacion_financiera.apps.courses.benchmarks import UNBENCHMARKED
+from educacion_financiera.apps.courses.benchmarks import build_dataset
+from educacion_financiera.apps.courses.benchmarks import run_benchmarks
+from educacion_financiera.apps.discussions import autosave
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def dataset(monkeypatch):
+    # Buffered writes stay in this test
+    note_buffer = autosave.LocalNoteBuffer()
+    study_buffer = study_time.LocalStudyTimeBuffer()
+    monkeypatch.setattr(autosave, "get_buffer", lambda: note_buffer)
+    monkeypatch.setattr(study_time, "get_buffer", lambda: study_buffer)
+    return build_dataset(**BUDGET_DATASET)
+
+
+def _project_url_names(resolver, namespace=None):
+    for pattern in resolver.url_patterns:
+        if isinstance(pattern, URLResolver):
+            if pattern.namespace == "admin":
+                continue
+            inner = ":".join(filter(None, [namespace, pattern.namespace])) or None
+            yield from _project_url_names(pattern, inner)
+        elif pattern.name and pattern.callback.__module__.startswith("educacion_financiera."):
+            yield f"{namespace}:{pattern.name}" if namespace else pattern.name
+
+
+def test_every_project_url_has_a_budget():
+    budgeted = {endpoint.url_name for endpoint in ENDPOINTS} | set(UNBENCHMARKED)
+    missing = set(_project_url_names(get_resolver())) - budgeted
+    assert not missing, f"URLs without a query budget: {sorted(missing)}"
+
+
+@pytest.mark.parametrize("role", ROLES)
+@pytest.mark.parametrize(
+    "endpoint",
+    ENDPOINTS,
+    ids=[f"{endpoint}-{index}" for index, endpoint in enumerate(ENDPOINTS)],
+)
+def test_endpoint_query_budget(dataset, endpoint, role):
+    [result] = run_benchmarks(
+        Client, dataset, endpoints=[endpoint], roles=[role], track_memory=False,
+    )
+
+    assert result["status"] < 500, f"{result['endpoint']} as {role} failed with {result['status']}"
+    assert result["queries"] <= result["budget"], (
+        f"{result['endpoint']} as {role} ran {result['queries']} queries, "
+        f"budget is {result['budget']}"
+    )
@@ -0,0 +1,49 @@
+import pytest
+from django.urls import reverse
+
+from educacion_financiera.apps.courses import signals
+from educacion_financiera.apps.courses.models import Course
+from educacion_financiera.apps.courses.search import search_courses
+from educacion_financiera.apps.courses.tests.factories import CourseFactory
+from educacion_financiera.apps.courses.tests.factories import ModuleFactory
+
+pytestmark = pytest.mark.django_db
+
+
+def test_title_matches_rank_first():
+    overview_match = CourseFactory(title="Ahorro", overview="Aprende sobre inversiones")
+    title_match = CourseFactory(title="Inversiones para principiantes")
+    CourseFactory(title="Presupuesto personal")
+
+    results = list(search_courses(Course.objects.all(), "inversiones"))
+
+    assert results == [title_match, overview_match]
+
+
+def test_search_entry_points(client, user):
+    course = CourseFactory(title="Inversiones para principiantes")
+    CourseFactory(title="Presupuesto personal")
+
+    response = client.get(reverse("courses:course_list"), {"q": "inversiones"})
+    assert list(response.context["courses"]) == [course]
+
+    response = client.get(reverse("api:courses_api:course-list"), {"search": "inversiones"})
+    assert [item["slug"] for item in response.json()["results"]] == [course.slug]
+
+    client.force_login(user)
+    response = client.get(reverse("dashboard:course_search"), {"q": "inversiones"})
+    assert list(response.context["courses"]) == [course]
+    assert response.context["selected_sort"] == "relevance"
+
+
+def test_moved_modules_reindex_both_courses(monkeypatch):
+    module = ModuleFactory()
+    old_course = module.course
+    new_course = CourseFactory()
+    indexed = []
+    monkeypatch.setattr(signals, "update_search_vectors", lambda course_ids: indexed.append(set(course_ids)))
+
+    module.course = new_course
+    module.save()
+
+    assert indexed == [{old_course.pk, new_course.pk}]
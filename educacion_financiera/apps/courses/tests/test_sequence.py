@@ -0,0 +1,55 @@
+import pytest
+
+from educacion_financiera.apps.courses.sequence import LessonSequence
+from educacion_financiera.apps.courses.tests.factories import CourseFactory, LessonFactory, ModuleFactory
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def course_lessons():
+    course = CourseFactory()
+    second = ModuleFactory(course=course, order=2)
+    first = ModuleFactory(course=course, order=1)
+    lessons = [
+        LessonFactory(module=first, order=1),
+        LessonFactory(module=first, order=2),
+        LessonFactory(module=second, order=1),
+    ]
+    return course, lessons
+
+
+class TestLessonSequence:
+    def test_navigation_crosses_modules(self, course_lessons):
+        course, lessons = course_lessons
+        sequence = LessonSequence.for_course(course.id)
+
+        assert len(sequence) == 3
+        assert sequence.next(lessons[1].id).id == lessons[2].id
+        assert sequence.previous(lessons[2].id).id == lessons[1].id
+        assert sequence.previous(lessons[0].id) is None
+        assert sequence.next(lessons[2].id) is None
+        assert sequence.position(lessons[2].id) == 3
+        assert sequence.is_module_end(lessons[1].id)
+        assert sequence.resume_point(None).id == lessons[0].id
+
+    def test_cached_until_order_changes(self, course_lessons, django_assert_num_queries):
+        course, lessons = course_lessons
+        LessonSequence.for_course(course.id)
+        with django_assert_num_queries(0):
+            LessonSequence.for_course(course.id)
+
+        lessons[0].title = "Renamed"
+        lessons[0].order = 3
+        lessons[0].save()
+        sequence = LessonSequence.for_course(course.id)
+        assert [entry[0] for entry in sequence.lessons] == [lessons[1].id, lessons[0].id, lessons[2].id]
+
+    def test_rebuilt_when_module_reordered(self, course_lessons):
+        course, lessons = course_lessons
+        LessonSequence.for_course(course.id)
+
+        module = lessons[2].module
+        module.order = 0
+        module.save()
+        assert LessonSequence.for_course(course.id).first().id == lessons[2].id
@@ -0,0 +1,99 @@
+import pytest
+from django.core.cache import cache
+from django.test import override_settings
+from django.urls import reverse
+from redis.exceptions import ConnectionError as RedisConnectionError
+from rest_framework.test import APIClient
+
+from educacion_financiera.apps.courses import study_time
+from educacion_financiera.apps.courses.models import LessonProgress
+from educacion_financiera.apps.courses.study_time import LocalStudyTimeBuffer
+from educacion_financiera.apps.courses.study_time import flush_study_time
+from educacion_financiera.apps.courses.study_time import record_heartbeat
+from educacion_financiera.apps.courses.tests.factories import EnrollmentFactory
+from educacion_financiera.apps.courses.tests.factories import LessonFactory
+from educacion_financiera.apps.profiles.models import Profile
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def buffer(monkeypatch):
+    buffer = LocalStudyTimeBuffer()
+    monkeypatch.setattr(study_time, "get_buffer", lambda: buffer)
+    cache.clear()
+    return buffer
+
+
+@override_settings(STUDY_HEARTBEAT_INTERVAL=30)
+def test_heartbeats_are_clamped_and_throttled(user, buffer):
+    lesson = LessonFactory()
+
+    assert record_heartbeat(user, lesson.id, seconds=600) == 30
+    assert record_heartbeat(user, lesson.id) == 0
+    cache.clear()
+    assert record_heartbeat(user, lesson.id, seconds=10) == 10
+
+    assert buffer.drain() == {(user.id, lesson.id): 40}
+
+
+def test_heartbeats_are_dropped_when_redis_is_down(user, buffer, monkeypatch):
+    def add(*args):
+        raise RedisConnectionError("Connection refused")
+    monkeypatch.setattr(buffer, "add", add)
+
+    assert record_heartbeat(user, LessonFactory().id) == 0
+
+
+def test_flush_writes_progress_and_profile(user, buffer):
+    first, second = LessonFactory.create_batch(2)
+    LessonProgress.objects.create(student=user, lesson=first, time_spent=60, is_completed=True)
+    buffer.add(user.id, first.id, 90)
+    buffer.add(user.id, second.id, 30)
+    buffer.add(user.id, first.id, 30)
+
+    assert flush_study_time() == 2
+
+    progress = dict(LessonProgress.objects.filter(student=user).values_list("lesson_id", "time_spent"))
+    assert progress == {first.id: 180, second.id: 30}
+    assert LessonProgress.objects.get(lesson=first).is_completed
+    assert Profile.objects.get(user=user).total_study_time == 3
+    assert flush_study_time() == 0
+
+
+def test_flush_adds_to_rows_inserted_concurrently(user, buffer, monkeypatch):
+    lesson = LessonFactory()
+    buffer.add(user.id, lesson.id, 45)
+    bulk_create = type(LessonProgress.objects).bulk_create
+
+    def completed_meanwhile(manager, objs, *args, **kwargs):
+        # A completion inserts the row just before the flush does
+        if manager.model is LessonProgress and not LessonProgress.objects.exists():
+            LessonProgress.objects.create(student=user, lesson=lesson, time_spent=20, is_completed=True)
+        return bulk_create(manager, objs, *args, **kwargs)
+
+    monkeypatch.setattr(type(LessonProgress.objects), "bulk_create", completed_meanwhile)
+    flush_study_time()
+
+    progress = LessonProgress.objects.get(student=user, lesson=lesson)
+    assert (progress.time_spent, progress.is_completed) == (65, True)
+
+
+def test_heartbeat_endpoint_does_not_write_progress(user, buffer, django_assert_max_num_queries):
+    enrollment = EnrollmentFactory(student=user)
+    lesson = LessonFactory(module__course=enrollment.course)
+    client = APIClient()
+    client.force_authenticate(user)
+    url = reverse("api:courses_api:lesson-heartbeat")
+
+    response = client.post(url, {"lesson_id": LessonFactory().id}, format="json")
+    assert response.status_code == 403
+
+    with django_assert_max_num_queries(3):
+        response = client.post(url, {"lesson_id": lesson.id, "seconds": 5}, format="json")
+    assert response.status_code == 202
+    assert response.json() == {"credited": 5}
+    assert not LessonProgress.objects.exists()
+
+    flush_study_time()
+    assert LessonProgress.objects.get(student=user, lesson=lesson).time_spent == 5
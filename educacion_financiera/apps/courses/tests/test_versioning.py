@@ -0,0 +1,114 @@
+import pytest
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from educacion_financiera.apps.courses.models import Course
+from educacion_financiera.apps.courses.tests.factories import CourseFactory
+from educacion_financiera.apps.courses.tests.factories import EnrollmentFactory
+from educacion_financiera.apps.courses.tests.factories import LessonFactory
+from educacion_financiera.apps.courses.tests.factories import ModuleFactory
+
+pytestmark = pytest.mark.django_db
+
+
+def _revalidate(client, url, response, django_assert_max_num_queries, queries=4):
+    # Validators plus the savepoint of the atomic request
+    with django_assert_max_num_queries(queries):
+        return client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+
+
+@pytest.mark.parametrize(
+    "url_name",
+    ["courses:course_detail", "courses:category_detail", "api:courses_api:course-detail"],
+)
+def test_anonymous_revalidation_is_cheap(client, url_name, django_assert_max_num_queries):
+    course = CourseFactory()
+    slug = course.category.slug if url_name == "courses:category_detail" else course.slug
+    url = reverse(url_name, kwargs={"slug": slug})
+
+    client.get(url)
+    response = client.get(url)
+    assert response.status_code == 200
+    assert _revalidate(client, url, response, django_assert_max_num_queries).status_code == 304
+
+    # The course page renders the enroll form, so only its ETag follows the CSRF token
+    if url_name == "courses:course_detail":
+        assert not response.has_header("Last-Modified")
+    else:
+        assert client.get(url, HTTP_IF_MODIFIED_SINCE=response["Last-Modified"]).status_code == 304
+
+
+def test_course_content_changes_the_etag(client):
+    module = ModuleFactory()
+    url = reverse("courses:course_detail", kwargs={"slug": module.course.slug})
+    etag = client.get(url)["ETag"]
+
+    LessonFactory(module=module)
+
+    response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert response["ETag"] != etag
+
+
+def test_course_content_modified_follows_lessons():
+    module = ModuleFactory()
+    before = Course.objects.get(pk=module.course_id).content_modified
+
+    lesson = LessonFactory(module=module)
+    lesson.delete()
+
+    assert Course.objects.get(pk=module.course_id).content_modified > before
+
+
+def test_personal_progress_changes_the_etag(user, django_assert_max_num_queries):
+    course = CourseFactory()
+    client = APIClient()
+    client.force_authenticate(user)
+    url = reverse("api:courses_api:course-detail", kwargs={"slug": course.slug})
+
+    response = client.get(url)
+    assert not response.has_header("Last-Modified")
+    assert _revalidate(client, url, response, django_assert_max_num_queries, queries=5).status_code == 304
+
+    EnrollmentFactory(student=user, course=course)
+    assert client.get(url, HTTP_IF_NONE_MATCH=response["ETag"]).status_code == 200
+
+
+def test_login_changes_the_etag_of_pages_with_forms(client, user):
+    course = CourseFactory()
+    url = reverse("courses:course_detail", kwargs={"slug": course.slug})
+    client.force_login(user)
+    client.get(url)
+    etag = client.get(url)["ETag"]
+
+    # Logging in again rotates the CSRF token the enroll form carries
+    client.logout()
+    client.force_login(user)
+    client.get(reverse("courses:course_list"))
+    assert client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 200
+
+
+def test_swapping_enrollments_changes_the_etag(user):
+    first, second = CourseFactory.create_batch(2)
+    enrollment = EnrollmentFactory(student=user, course=first)
+    client = APIClient()
+    client.force_authenticate(user)
+    url = reverse("api:courses_api:course-detail", kwargs={"slug": second.slug})
+    etag = client.get(url)["ETag"]
+
+    # Same number of active enrollments and completed lessons as before
+    enrollment.active = False
+    enrollment.save()
+    EnrollmentFactory(student=user, course=second)
+    assert client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 200
+
+
+def test_list_endpoints_revalidate(django_assert_max_num_queries):
+    CourseFactory.create_batch(2)
+    client = APIClient()
+    for url in ["/api/courses/courses/", "/api/courses/categories/"]:
+        response = client.get(url)
+        assert _revalidate(client, url, response, django_assert_max_num_queries).status_code == 304
+
+    CourseFactory()
+    assert client.get(url, HTTP_IF_NONE_MATCH=response["ETag"]).status_code == 200
@@ -0,0 +1,146 @@
+"""
+Conditional GET for catalog pages and the courses API.
+
+Every course keeps a ``content_modified`` timestamp, bumped whenever the
+course or one of its modules, lessons or resources changes (see signals.py).
+Validators are computed from it and from a few counter columns in a single
+cheap query, so a client holding a current copy gets a 304 before any view
+query runs or anything is serialized or rendered.
+
+Validators are split in a shared part, identical for every visitor, and a
+personal part added for authenticated users: the number of their
+enrollments and the latest ``Enrollment.modified``, which every enrollment
+change bumps. Shared responses carry Last-Modified as well as a strong ETag;
+personal ones only the ETag. Pages rendering forms also put the CSRF cookie
+in the ETag, so a copy kept across a login, which rotates the token, is
+never revalidated with a stale token in its forms.
+"""
+import functools
+import hashlib
+
+from django.contrib.messages import get_messages
+from django.db.models import Count, Max, Q, Sum
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+from educacion_financiera.context_processors import get_cached_user_stats
+
+from .models import Category, Course, Enrollment
+
+
+def _latest(*timestamps):
+    timestamps = [timestamp for timestamp in timestamps if timestamp is not None]
+    return max(timestamps) if timestamps else None
+
+
+def catalog_validators(request, **kwargs):
+    """Shared state of the whole catalog, for listings and navigation"""
+    courses = Course.objects.aggregate(
+        modified=Max("content_modified"),
+        count=Count("id"),
+        enrollments=Sum("active_enrollment_count"),
+    )
+    categories = Category.objects.aggregate(modified=Max("modified"), count=Count("id"))
+    parts = (*courses.values(), *categories.values())
+    return parts, _latest(courses["modified"], categories["modified"])
+
+
+def course_validators(request, slug, **kwargs):
+    """Shared state of a single course"""
+    course = Course.objects.filter(slug=slug).values_list(
+        "pk", "content_modified", "active_enrollment_count"
+    ).first()
+    if course is None:
+        return None
+    return course, course[1]
+
+
+def category_validators(request, slug, **kwargs):
+    """Shared state of a category page and its courses"""
+    category = Category.objects.filter(slug=slug).annotate(
+        course_modified=Max("courses__content_modified"),
+        course_count=Count("courses"),
+    ).values_list("pk", "modified", "course_modified", "course_count").first()
+    if category is None:
+        return None
+    return category, _latest(category[1], category[2])
+
+
+def navigation_validators():
+    """Shared state of the category navigation rendered on every page"""
+    return tuple(Category.objects.aggregate(
+        modified=Max("modified"),
+        count=Count("id", distinct=True),
+        courses=Count("courses", filter=Q(courses__visibility="public")),
+    ).values())
+
+
+def personal_validators(user, navigation=False):
+    """Version of the enrollments of a user, and of their navigation stats"""
+    enrollments = Enrollment.objects.filter(student=user).aggregate(count=Count("id"), modified=Max("modified"))
+    parts = (user.pk, *enrollments.values())
+    if navigation:
+        # Cached, and needed by the page render anyway
+        stats = get_cached_user_stats(user)
+        parts += (
+            stats["enrolled_courses"],
+            stats["certificates"],
+            stats["total_study_time"],
+            stats["current_streak"],
+        )
+    return parts
+
+
+def make_etag(parts):
+    return hashlib.md5(":".join(str(part) for part in parts).encode(), usedforsecurity=False).hexdigest()
+
+
+def conditional_view(validators, navigation=False, forms=False):
+    """
+    Answer GET and HEAD requests with 304 when the client copy is current,
+    like django.views.decorators.http.condition, with the ETag and
+    Last-Modified computed together by ``validators(request, **kwargs)``.
+    Pages rendering the site navigation pass ``navigation=True``, pages
+    rendering a form with a CSRF token ``forms=True``.
+    Works on function views and, through method_decorator, on class based
+    and REST framework views.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def inner(request, *args, **kwargs):
+            # Pending flash messages must be rendered, never skipped by a 304
+            if request.method not in ("GET", "HEAD") or len(get_messages(request)):
+                return view(request, *args, **kwargs)
+
+            shared = validators(request, **kwargs)
+            if shared is None:
+                return view(request, *args, **kwargs)
+
+            parts, last_modified = shared
+            if navigation:
+                navigation_parts = navigation_validators()
+                parts = (*parts, *navigation_parts)
+                last_modified = _latest(last_modified, navigation_parts[0])
+            if forms:
+                parts = (*parts, request.META.get("CSRF_COOKIE", ""))
+                last_modified = None
+            if request.user.is_authenticated:
+                parts = (*parts, *personal_validators(request.user, navigation))
+                last_modified = None
+            etag = quote_etag(make_etag(parts))
+            timestamp = int(last_modified.timestamp()) if last_modified else None
+
+            response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+            if response is None:
+                response = view(request, *args, **kwargs)
+            if response.status_code in (200, 304):
+                if not response.has_header("ETag"):
+                    response.headers["ETag"] = etag
+                if timestamp and not response.has_header("Last-Modified"):
+                    response.headers["Last-Modified"] = http_date(timestamp)
+                patch_vary_headers(response, ("Cookie", "Authorization"))
+            return response
+
+        return inner
+
+    return decorator
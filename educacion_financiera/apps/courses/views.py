@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.shortcuts import get_object_or_404, redirect
 from django.urls import reverse
@@ -9,9 +10,14 @@ from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
 from django.utils import timezone
 from django.contrib import messages
-from django.db.models import Q, Count, Avg, Prefetch
+from django.db.models import Avg, Prefetch
 
-from .models import Category, Course, Enrollment, Lesson, Module, LessonProgress, Certificate
+from .models import Category, Course, Enrollment, Lesson, Module, LessonProgress
+from .curriculum import Curriculum
+from .progress import NOT_ENROLLED, set_lesson_completion
+from .search import search_courses
+from .sequence import LessonSequence
+from .versioning import category_validators, conditional_view, course_validators
 
 
 class CourseListView(ListView):
@@ -26,23 +32,17 @@ class CourseListView(ListView):
     def get_queryset(self):
         queryset = Course.objects.filter(visibility="public").select_related(
             "category", "instructor"
-        ).annotate(
-            enrollment_count=Count('enrollments')
-        ).order_by('-enrollment_count', '-created')
+        ).popular()
 
         # Filter by category
         category_slug = self.request.GET.get("category")
         if category_slug:
             queryset = queryset.filter(category__slug=category_slug)
 
-        # Search functionality
+        # Search functionality, ordered by relevance
         search_query = self.request.GET.get("q")
         if search_query:
-            queryset = queryset.filter(
-                Q(title__icontains=search_query) |
-                Q(overview__icontains=search_query) |
-                Q(category__name__icontains=search_query)
-            )
+            queryset = search_courses(queryset, search_query)
 
         return queryset
 
@@ -62,6 +62,7 @@ class CourseListView(ListView):
         return context
 
 
+@method_decorator(conditional_view(category_validators, navigation=True), name="dispatch")
 class CategoryDetailView(DetailView):
     """
     Show details of a category and its courses
@@ -76,6 +77,7 @@ class CategoryDetailView(DetailView):
         return context
 
 
+@method_decorator(conditional_view(course_validators, navigation=True, forms=True), name="dispatch")
 class CourseDetailView(DetailView):
     """
     Show details of a course
@@ -86,31 +88,43 @@ class CourseDetailView(DetailView):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context["modules"] = self.object.modules.all().order_by("order").prefetch_related(
-            'lessons__progress_records'
-        )
+        # Cached curriculum with the user's progress merged in
+        context["modules"] = Curriculum.for_course(self.object).with_progress(self.request.user)
 
         # Check if user is enrolled
         if self.request.user.is_authenticated:
-            context["is_enrolled"] = Enrollment.objects.filter(
+            enrollment = Enrollment.objects.filter(
                 course=self.object,
-                student=self.request.user,
-                active=True
-            ).exists()
+                student=self.request.user
+            ).first()
+            context["is_enrolled"] = bool(enrollment and enrollment.active)
 
             # Get user's progress for this course
-            context["course_progress"] = self.object.get_progress_for_user(self.request.user)
+            context["course_progress"] = enrollment.progress if enrollment else 0
 
             # Get module progress
-            module_progress = {}
-            for module in context["modules"]:
-                module_progress[module.id] = module.get_progress_for_user(self.request.user)
-            context["module_progress"] = module_progress
+            context["module_progress"] = {
+                module["id"]: module["progress"] for module in context["modules"]
+            }
 
         return context
 
 
-class ModuleDetailView(LoginRequiredMixin, DetailView):
+class EnrollmentRequiredMixin(LoginRequiredMixin):
+    """
+    Restrict a course page to its enrolled students, sending anyone else to
+    the course detail. The course is kept as ``self.course``.
+    """
+    def dispatch(self, request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return self.handle_no_permission()
+        self.course = get_object_or_404(Course, slug=kwargs["course_slug"])
+        if not Enrollment.objects.filter(course=self.course, student=request.user, active=True).exists():
+            return redirect("courses:course_detail", slug=self.course.slug)
+        return super().dispatch(request, *args, **kwargs)
+
+
+class ModuleDetailView(EnrollmentRequiredMixin, DetailView):
     """
     Show details of a module
     """
@@ -119,20 +133,7 @@ class ModuleDetailView(LoginRequiredMixin, DetailView):
     context_object_name = "module"
 
     def get_object(self):
-        course_slug = self.kwargs["course_slug"]
-        module_id = self.kwargs["module_id"]
-        course = get_object_or_404(Course, slug=course_slug)
-
-        # Check if user is enrolled
-        if not Enrollment.objects.filter(
-            course=course,
-            student=self.request.user,
-            active=True
-        ).exists():
-            # Redirect to course detail if not enrolled
-            return redirect("courses:course_detail", slug=course_slug)
-
-        return get_object_or_404(Module, id=module_id, course=course)
+        return get_object_or_404(Module, id=self.kwargs["module_id"], course=self.course)
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -151,7 +152,7 @@ class ModuleDetailView(LoginRequiredMixin, DetailView):
         return context
 
 
-class LessonDetailView(LoginRequiredMixin, DetailView):
+class LessonDetailView(EnrollmentRequiredMixin, DetailView):
     """
     Show details of a lesson
     """
@@ -160,23 +161,8 @@ class LessonDetailView(LoginRequiredMixin, DetailView):
     context_object_name = "lesson"
 
     def get_object(self):
-        course_slug = self.kwargs["course_slug"]
-        module_id = self.kwargs["module_id"]
-        lesson_id = self.kwargs["pk"]
-
-        course = get_object_or_404(Course, slug=course_slug)
-        module = get_object_or_404(Module, id=module_id, course=course)
-
-        # Check if user is enrolled
-        if not Enrollment.objects.filter(
-            course=course,
-            student=self.request.user,
-            active=True
-        ).exists():
-            # Redirect to course detail if not enrolled
-            return redirect("courses:course_detail", slug=course_slug)
-
-        return get_object_or_404(Lesson, id=lesson_id, module=module)
+        module = get_object_or_404(Module, id=self.kwargs["module_id"], course=self.course)
+        return get_object_or_404(Lesson, id=self.kwargs["pk"], module=module)
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -190,29 +176,38 @@ class LessonDetailView(LoginRequiredMixin, DetailView):
         )
         context["lesson_progress"] = lesson_progress
 
-        # Get user's notes
+        # Get user's note, including autosaves not written yet
         if self.request.user.is_authenticated:
-            from educacion_financiera.apps.discussions.models import Note
-            try:
-                context["note"] = Note.objects.get(lesson=self.object, user=self.request.user)
-            except Note.DoesNotExist:
-                context["note"] = None
+            from educacion_financiera.apps.discussions.autosave import load_note
+            context["note_content"], context["note_version"] = load_note(self.request.user.pk, self.object.pk)
+            context["note_autosave_delay"] = settings.NOTE_AUTOSAVE_DELAY
 
-        # Get comments
+        # Get a page of comment threads
         from educacion_financiera.apps.discussions.models import Comment, Discussion
-        context["comments"] = Comment.objects.filter(
-            lesson=self.object,
-            is_approved=True
-        ).order_by("created")
+        from educacion_financiera.apps.discussions.tree import lesson_comment_threads
+        context["comments"], context["comments_next"] = lesson_comment_threads(
+            self.object, after=self.request.GET.get("comments_after")
+        )
 
         context["discussions"] = Discussion.objects.filter(
             lesson=self.object,
             is_active=True
-        ).order_by("-created")
+        ).select_related("created_by").prefetch_related(
+            Prefetch(
+                "comments",
+                queryset=Comment.objects.filter(is_approved=True).select_related("created_by").order_by("path"),
+                to_attr="approved_comments",
+            )
+        ).order_by("-last_comment_at")
 
-        # Get next and previous lessons
-        context["next_lesson"] = self.object.get_next_lesson()
-        context["previous_lesson"] = self.object.get_previous_lesson()
+        # Get next and previous lessons across modules
+        sequence = LessonSequence.for_course(self.object.module.course_id)
+        context["next_lesson"] = sequence.next(self.object.id)
+        context["previous_lesson"] = sequence.previous(self.object.id)
+        context["lesson_position"] = sequence.position(self.object.id)
+        context["total_lessons"] = len(sequence)
+        context["is_module_end"] = sequence.is_module_end(self.object.id)
+        context["heartbeat_interval"] = settings.STUDY_HEARTBEAT_INTERVAL
 
         return context
 
@@ -222,49 +217,30 @@ class LessonDetailView(LoginRequiredMixin, DetailView):
         action = request.POST.get('action')
 
         if action == 'complete_lesson':
-            # Mark lesson as completed
-            lesson_progress, created = LessonProgress.objects.get_or_create(
-                student=request.user,
-                lesson=lesson
-            )
-            lesson_progress.mark_completed()
-
-            # Update user profile activity
-            profile = request.user.profile
-            profile.update_activity_streak()
-
-            # Check if course is completed and award certificate
-            course = lesson.module.course
-            if course.get_progress_for_user(request.user) == 100:
-                certificate, created = Certificate.objects.get_or_create(
-                    student=request.user,
-                    course=course
-                )
-                if created:
-                    messages.success(request, f'¡Felicidades! Has completado el curso "{course.title}" y obtenido tu certificado.')
+            result = set_lesson_completion(request.user, lesson.id)
+            if result['certificate_awarded']:
+                course = lesson.module.course
+                messages.success(request, f'¡Felicidades! Has completado el curso "{course.title}" y obtenido tu certificado.')
 
             messages.success(request, f'Lección "{lesson.title}" marcada como completada.')
 
         elif action == 'save_note':
-            # Save or update note
-            from educacion_financiera.apps.discussions.models import Note
+            # Save or clear the note through the autosave buffer, so a pending autosave cannot overwrite it.
+            # A cleared note keeps its row, and its version, empty.
+            from educacion_financiera.apps.discussions.autosave import NoteConflict, save_note
             note_content = request.POST.get('note_content', '').strip()
 
-            if note_content:
-                note, created = Note.objects.get_or_create(
-                    lesson=lesson,
-                    user=request.user,
-                    defaults={'content': note_content}
-                )
-                if not created:
-                    note.content = note_content
-                    note.save()
-
-                messages.success(request, 'Nota guardada exitosamente.')
+            try:
+                save_note(request.user.pk, lesson.pk, content=note_content)
+            except NoteConflict:
+                messages.error(request, 'La nota se está editando en otra ventana. Inténtalo de nuevo.')
+            except ValueError:
+                messages.error(request, f'La nota no puede superar los {settings.NOTE_MAX_LENGTH} caracteres.')
             else:
-                # Delete note if content is empty
-                Note.objects.filter(lesson=lesson, user=request.user).delete()
-                messages.info(request, 'Nota eliminada.')
+                if note_content:
+                    messages.success(request, 'Nota guardada exitosamente.')
+                else:
+                    messages.info(request, 'Nota vaciada.')
 
         return redirect('courses:lesson_detail',
                        course_slug=lesson.module.course.slug,
@@ -278,53 +254,18 @@ class MarkLessonCompleteView(LoginRequiredMixin, View):
     AJAX view to mark a lesson as completed
     """
     def post(self, request, *args, **kwargs):
-        lesson_id = kwargs.get('lesson_id')
-        lesson = get_object_or_404(Lesson, id=lesson_id)
-
-        # Check if user is enrolled in the course
-        if not Enrollment.objects.filter(
-            course=lesson.module.course,
-            student=request.user,
-            active=True
-        ).exists():
-            return JsonResponse({'success': False, 'error': 'Not enrolled in course'})
-
-        # Get or create progress record
-        progress, created = LessonProgress.objects.get_or_create(
-            student=request.user,
-            lesson=lesson
-        )
+        lesson = get_object_or_404(Lesson, id=kwargs.get('lesson_id'))
 
         # Toggle completion status
-        if progress.is_completed:
-            progress.is_completed = False
-            progress.completed_at = None
-            action = 'uncompleted'
-        else:
-            progress.mark_completed()
-            action = 'completed'
-
-            # Update user profile activity
-            profile, created = request.user.profile.get_or_create(user=request.user)
-            profile.update_activity_streak()
-
-        # Calculate new course progress
-        course_progress = lesson.module.course.get_progress_for_user(request.user)
-
-        # Check for course completion and certificate
-        certificate_awarded = False
-        if course_progress == 100 and action == 'completed':
-            certificate, created = Certificate.objects.get_or_create(
-                student=request.user,
-                course=lesson.module.course
-            )
-            certificate_awarded = created
+        result = set_lesson_completion(request.user, lesson.id, completed=None)
+        if result['status'] == NOT_ENROLLED:
+            return JsonResponse({'success': False, 'error': 'Not enrolled in course'})
 
         return JsonResponse({
             'success': True,
-            'action': action,
-            'course_progress': course_progress,
-            'certificate_awarded': certificate_awarded
+            'action': 'completed' if result['completed'] else 'uncompleted',
+            'course_progress': result['course_progress'],
+            'certificate_awarded': result['certificate_awarded']
         })
 
 
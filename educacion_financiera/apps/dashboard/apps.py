@@ -6,3 +6,9 @@ class DashboardConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "educacion_financiera.apps.dashboard"
     verbose_name = _("Dashboard")
+
+    def ready(self):
+        try:
+            import educacion_financiera.apps.dashboard.signals  # noqa F401
+        except ImportError:
+            pass
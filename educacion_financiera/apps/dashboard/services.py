@@ -0,0 +1,93 @@
+"""
+Data for the student dashboard.
+
+Everything per enrolled course comes from the denormalized enrollment
+counters and the cached lesson sequences, so the number of queries does not
+grow with the number of enrollments. The result can be cached per user as a
+snapshot that the progress signals drop (see signals.py).
+"""
+from django.conf import settings
+from django.core.cache import cache
+
+from educacion_financiera.apps.courses.models import Certificate, Course, Enrollment, LessonProgress
+from educacion_financiera.apps.courses.sequence import LessonSequence
+
+SNAPSHOT_CACHE_KEY = "dashboard:snapshot:{user_id}"
+
+
+def invalidate_dashboard_snapshot(user_id):
+    """Drop the cached dashboard of a user"""
+    cache.delete(SNAPSHOT_CACHE_KEY.format(user_id=user_id))
+
+
+def build_dashboard_data(user):
+    """
+    Enrolled courses with progress and resume lesson, average progress,
+    certificate count, recent activity and recommended courses
+    """
+    enrollments = list(Enrollment.objects.filter(
+        student=user,
+        active=True
+    ).select_related(
+        'course', 'course__category', 'course__instructor'
+    ))
+    sequences = LessonSequence.for_courses([enrollment.course_id for enrollment in enrollments])
+
+    enrolled_courses = []
+    for enrollment in enrollments:
+        # Resume from the last visited lesson, or the first one of the course
+        sequence = sequences[enrollment.course_id]
+        current_lesson = sequence.resume_point(enrollment.last_lesson_id)
+        lessons_info = "Sin lecciones"
+        if current_lesson:
+            lessons_info = f"Lección {current_lesson.position} de {len(sequence)}"
+
+        enrolled_courses.append({
+            'course': enrollment.course,
+            'progress': enrollment.progress,
+            'current_lesson': current_lesson,
+            'lessons_info': lessons_info,
+            'enrollment': enrollment
+        })
+
+    total_progress = sum(enrollment.progress for enrollment in enrollments)
+    avg_progress = round(total_progress / len(enrollments), 1) if enrollments else 0
+
+    # Recommended courses (courses not enrolled in)
+    recommended_courses = list(Course.objects.filter(
+        visibility='public'
+    ).exclude(
+        id__in=[enrollment.course_id for enrollment in enrollments]
+    ).select_related('category', 'instructor').popular()[:6])
+
+    certificates_count = Certificate.objects.filter(
+        student=user,
+        is_active=True
+    ).count()
+
+    recent_progress = list(LessonProgress.objects.filter(
+        student=user
+    ).select_related('lesson', 'lesson__module', 'lesson__module__course').order_by('-modified')[:5])
+
+    return {
+        'enrolled_courses': enrolled_courses,
+        'recommended_courses': recommended_courses,
+        'total_courses': len(enrolled_courses),
+        'avg_progress': avg_progress,
+        'certificates': certificates_count,
+        'recent_progress': recent_progress,
+    }
+
+
+def get_dashboard_data(user):
+    """Dashboard data from the per user snapshot, when enabled, or fresh"""
+    timeout = settings.DASHBOARD_SNAPSHOT_TIMEOUT
+    if not timeout:
+        return build_dashboard_data(user)
+
+    key = SNAPSHOT_CACHE_KEY.format(user_id=user.pk)
+    data = cache.get(key)
+    if data is None:
+        data = build_dashboard_data(user)
+        cache.set(key, data, timeout)
+    return data
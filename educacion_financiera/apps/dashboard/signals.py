@@ -0,0 +1,28 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from educacion_financiera.apps.courses.models import Certificate, Enrollment, LessonProgress
+from educacion_financiera.apps.courses.signals import lesson_progress_synced
+
+from .services import invalidate_dashboard_snapshot
+
+
+@receiver(post_save, sender=LessonProgress)
+@receiver(post_delete, sender=LessonProgress)
+@receiver(post_save, sender=Enrollment)
+@receiver(post_delete, sender=Enrollment)
+@receiver(post_save, sender=Certificate)
+@receiver(post_delete, sender=Certificate)
+def invalidate_student_dashboard(sender, instance, **kwargs):
+    """
+    Drop the dashboard snapshot when the student's progress changes
+    """
+    invalidate_dashboard_snapshot(instance.student_id)
+
+
+@receiver(lesson_progress_synced)
+def invalidate_synced_dashboard(sender, student_id, **kwargs):
+    """
+    Drop the dashboard snapshot after a bulk progress sync
+    """
+    invalidate_dashboard_snapshot(student_id)
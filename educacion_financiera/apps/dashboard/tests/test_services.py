@@ -0,0 +1,42 @@
+import pytest
+
+from educacion_financiera.apps.courses.models import LessonProgress
+from educacion_financiera.apps.courses.tests.factories import EnrollmentFactory
+from educacion_financiera.apps.courses.tests.factories import LessonFactory
+from educacion_financiera.apps.courses.tests.factories import ModuleFactory
+from educacion_financiera.apps.dashboard.services import build_dashboard_data
+from educacion_financiera.apps.dashboard.services import get_dashboard_data
+
+pytestmark = pytest.mark.django_db
+
+
+def _enroll(user, lessons=2):
+    enrollment = EnrollmentFactory(student=user)
+    module = ModuleFactory(course=enrollment.course)
+    return enrollment, LessonFactory.create_batch(lessons, module=module)
+
+
+def test_query_count_does_not_grow_with_enrollments(user, django_assert_max_num_queries):
+    _enroll(user)
+    with django_assert_max_num_queries(5):
+        build_dashboard_data(user)
+
+    for _ in range(5):
+        _enroll(user)
+    with django_assert_max_num_queries(5):
+        data = build_dashboard_data(user)
+    assert data["total_courses"] == 6
+    assert all(item["lessons_info"] == "Lección 1 de 2" for item in data["enrolled_courses"])
+
+
+def test_snapshot_invalidated_by_progress(user, settings, django_assert_num_queries):
+    settings.DASHBOARD_SNAPSHOT_TIMEOUT = 60
+    enrollment, lessons = _enroll(user)
+    assert get_dashboard_data(user)["avg_progress"] == 0
+    with django_assert_num_queries(0):
+        get_dashboard_data(user)
+
+    LessonProgress.objects.create(student=user, lesson=lessons[1], is_completed=True)
+    [course] = get_dashboard_data(user)["enrolled_courses"]
+    assert course["progress"] == 50
+    assert course["lessons_info"] == "Lección 2 de 2"
@@ -1,6 +1,6 @@
 from django.urls import path
 
-from .views import DashboardView, CourseSearchView, CertificatesView
+from .views import DashboardView, CourseSearchView, CertificatesView, NotesView, NotesExportView
 
 app_name = "dashboard"
 
@@ -8,4 +8,6 @@ urlpatterns = [
     path("", DashboardView.as_view(), name="home"),
     path("search/", CourseSearchView.as_view(), name="course_search"),
     path("certificates/", CertificatesView.as_view(), name="certificates"),
+    path("notes/", NotesView.as_view(), name="notes"),
+    path("notes/export/", NotesExportView.as_view(), name="notes_export"),
 ]
@@ -1,12 +1,17 @@
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.db.models import Q, Avg, Sum, Count
-from django.views.generic import TemplateView, ListView
+from django.http import StreamingHttpResponse
+from django.views.generic import TemplateView, ListView, View
 from django.utils import timezone
-from datetime import timedelta
 
-from educacion_financiera.apps.courses.models import Course, Enrollment, LessonProgress, Certificate
+from educacion_financiera.apps.courses.models import Course, Enrollment, Certificate
+from educacion_financiera.apps.courses.search import search_courses
+from educacion_financiera.apps.discussions.notes import (
+    group_notes, recent_notes, search_notes, stream_markdown, stream_zip, user_notes, with_snippets
+)
 from educacion_financiera.apps.profiles.models import Profile
 
+from .services import get_dashboard_data
+
 
 class DashboardView(LoginRequiredMixin, TemplateView):
     """
@@ -20,83 +25,7 @@ class DashboardView(LoginRequiredMixin, TemplateView):
         # Get or create user profile
         profile, created = Profile.objects.get_or_create(user=self.request.user)
 
-        # Get user's enrollments with related data
-        enrollments = Enrollment.objects.filter(
-            student=self.request.user,
-            active=True
-        ).select_related('course', 'course__category', 'course__instructor').prefetch_related(
-            'course__modules__lessons'
-        )
-
-        # Get enrolled courses with progress
-        enrolled_courses = []
-        total_progress = 0
-        total_study_time = 0
-
-        for enrollment in enrollments:
-            course = enrollment.course
-            progress = course.get_progress_for_user(self.request.user)
-
-            # Get current lesson/module info
-            latest_progress = LessonProgress.objects.filter(
-                student=self.request.user,
-                lesson__module__course=course
-            ).order_by('-modified').first()
-
-            current_lesson = None
-            current_module = None
-            lessons_info = "Sin lecciones"
-
-            if latest_progress:
-                current_lesson = latest_progress.lesson
-                current_module = current_lesson.module
-                total_lessons = course.get_total_lessons()
-                completed_lessons = LessonProgress.objects.filter(
-                    student=self.request.user,
-                    lesson__module__course=course,
-                    is_completed=True
-                ).count()
-                lessons_info = f"Lección {completed_lessons + 1} de {total_lessons}"
-            else:
-                # Get first lesson
-                first_module = course.modules.first()
-                if first_module:
-                    first_lesson = first_module.lessons.first()
-                    if first_lesson:
-                        current_lesson = first_lesson
-                        current_module = first_module
-                        total_lessons = course.get_total_lessons()
-                        lessons_info = f"Lección 1 de {total_lessons}"
-
-            enrolled_courses.append({
-                'course': course,
-                'progress': progress,
-                'current_lesson': current_lesson,
-                'current_module': current_module,
-                'lessons_info': lessons_info,
-                'enrollment': enrollment
-            })
-
-            total_progress += progress
-
-        # Calculate average progress
-        avg_progress = round(total_progress / len(enrolled_courses), 1) if enrolled_courses else 0
-
-        # Get recommended courses (courses not enrolled in)
-        enrolled_course_ids = [item['course'].id for item in enrolled_courses]
-        recommended_courses = Course.objects.filter(
-            visibility='public'
-        ).exclude(
-            id__in=enrolled_course_ids
-        ).select_related('category', 'instructor').annotate(
-            enrollment_count=Count('enrollments')
-        ).order_by('-enrollment_count', '-created')[:6]
-
-        # Get certificates count
-        certificates_count = Certificate.objects.filter(
-            student=self.request.user,
-            is_active=True
-        ).count()
+        dashboard_data = get_dashboard_data(self.request.user)
 
         # Calculate total study time from profile
         study_time_hours = profile.total_study_time // 60
@@ -106,23 +35,13 @@ class DashboardView(LoginRequiredMixin, TemplateView):
         else:
             study_time_display = f"{study_time_minutes}m"
 
-        # Get recent activity
-        recent_progress = LessonProgress.objects.filter(
-            student=self.request.user
-        ).select_related('lesson', 'lesson__module', 'lesson__module__course').order_by('-modified')[:5]
-
         # Get user badges
         user_badges = self.request.user.earned_badges.select_related('badge')[:3]
 
+        context.update(dashboard_data)
         context.update({
-            'enrolled_courses': enrolled_courses,
-            'recommended_courses': recommended_courses,
-            'total_courses': len(enrolled_courses),
-            'avg_progress': avg_progress,
-            'certificates': certificates_count,
             'study_time': study_time_display,
             'profile': profile,
-            'recent_progress': recent_progress,
             'user_badges': user_badges,
             'current_streak': profile.current_streak,
             'longest_streak': profile.longest_streak,
@@ -146,8 +65,6 @@ class CourseSearchView(LoginRequiredMixin, ListView):
     def get_queryset(self):
         queryset = Course.objects.filter(visibility='public').select_related(
             'category', 'instructor'
-        ).annotate(
-            enrollment_count=Count('enrollments')
         )
 
         query = self.request.GET.get('q')
@@ -156,12 +73,7 @@ class CourseSearchView(LoginRequiredMixin, ListView):
         price_filter = self.request.GET.get('price')
 
         if query:
-            queryset = queryset.filter(
-                Q(title__icontains=query) |
-                Q(overview__icontains=query) |
-                Q(category__name__icontains=query) |
-                Q(instructor__name__icontains=query)
-            )
+            queryset = search_courses(queryset, query)
 
         if category:
             queryset = queryset.filter(category__slug=category)
@@ -171,16 +83,16 @@ class CourseSearchView(LoginRequiredMixin, ListView):
         elif price_filter == 'paid':
             queryset = queryset.filter(price__gt=0)
 
-        # Default ordering
-        sort = self.request.GET.get('sort', 'popularity')
+        # Default ordering, by relevance when searching
+        sort = self.request.GET.get('sort', 'relevance' if query else 'popularity')
         if sort == 'newest':
             queryset = queryset.order_by('-created')
         elif sort == 'price_low':
             queryset = queryset.order_by('price')
         elif sort == 'price_high':
             queryset = queryset.order_by('-price')
-        else:  # popularity
-            queryset = queryset.order_by('-enrollment_count', '-created')
+        elif sort != 'relevance' or not query:  # popularity
+            queryset = queryset.popular()
 
         return queryset
 
@@ -196,7 +108,9 @@ class CourseSearchView(LoginRequiredMixin, ListView):
         context['selected_category'] = self.request.GET.get('category', '')
         context['selected_level'] = self.request.GET.get('level', '')
         context['selected_price'] = self.request.GET.get('price', '')
-        context['selected_sort'] = self.request.GET.get('sort', 'popularity')
+        context['selected_sort'] = self.request.GET.get(
+            'sort', 'relevance' if context['search_query'] else 'popularity'
+        )
 
         # Get user's enrolled courses for comparison
         if self.request.user.is_authenticated:
@@ -242,3 +156,42 @@ class CertificatesView(LoginRequiredMixin, ListView):
         context['certificates_by_category'] = certificates_by_category
 
         return context
+
+
+class NotesView(LoginRequiredMixin, ListView):
+    """
+    The user's notes of every lesson, grouped by course and module, with search
+    """
+    template_name = "apps/dashboard/notes.html"
+    context_object_name = "notes"
+    paginate_by = 50
+
+    def get_queryset(self):
+        return with_snippets(search_notes(user_notes(self.request.user), self.request.GET.get('q', '')))
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['query'] = self.request.GET.get('q', '')
+        context['note_groups'] = group_notes(context['notes'])
+        if not context['query']:
+            context['recent_notes'] = recent_notes(self.request.user)
+        return context
+
+
+class NotesExportView(LoginRequiredMixin, View):
+    """
+    Download the user's notes, or those matching ``q``, as one Markdown file
+    or, with ``format=zip``, as a ZIP with a file per lesson. Streamed as
+    the notes are read.
+    """
+    def get(self, request):
+        notes = search_notes(user_notes(request.user), request.GET.get('q', ''))
+        filename = f"mis-notas-{timezone.now():%Y%m%d}"
+        if request.GET.get('format') == 'zip':
+            response = StreamingHttpResponse(stream_zip(notes), content_type='application/zip')
+            filename += '.zip'
+        else:
+            response = StreamingHttpResponse(stream_markdown(notes), content_type='text/markdown; charset=utf-8')
+            filename += '.md'
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
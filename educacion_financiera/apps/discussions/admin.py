@@ -1,7 +1,20 @@
-from django.contrib import admin
+from django.contrib import admin, messages
 from django.utils.translation import gettext_lazy as _
 
-from .models import Comment, Discussion, Note
+from .models import Comment, CommentModeration, Discussion, Note
+from .moderation import set_approval
+
+
+@admin.action(description=_("Approve selected comments"))
+def approve_comments(modeladmin, request, queryset):
+    count = set_approval(modeladmin.get_comments(queryset), approved=True)
+    modeladmin.message_user(request, _("%(count)d comments approved.") % {"count": count}, messages.SUCCESS)
+
+
+@admin.action(description=_("Reject selected comments"))
+def reject_comments(modeladmin, request, queryset):
+    count = set_approval(modeladmin.get_comments(queryset), approved=False)
+    modeladmin.message_user(request, _("%(count)d comments rejected.") % {"count": count}, messages.SUCCESS)
 
 
 class CommentInline(admin.TabularInline):
@@ -13,11 +26,11 @@ class CommentInline(admin.TabularInline):
 
 @admin.register(Discussion)
 class DiscussionAdmin(admin.ModelAdmin):
-    list_display = ["title", "lesson", "created_by", "created", "is_active"]
+    list_display = ["title", "lesson", "created_by", "reply_count", "last_comment_at", "is_active"]
     list_filter = ["is_active", "created", "lesson__module__course"]
     search_fields = ["title", "body", "created_by__email"]
     date_hierarchy = "created"
-    readonly_fields = ["created", "modified"]
+    readonly_fields = ["reply_count", "last_comment_at", "last_comment_by", "created", "modified"]
     raw_id_fields = ["lesson", "created_by"]
     inlines = [CommentInline]
 
@@ -28,8 +41,12 @@ class CommentAdmin(admin.ModelAdmin):
     list_filter = ["is_approved", "created"]
     search_fields = ["body", "created_by__email"]
     date_hierarchy = "created"
-    readonly_fields = ["created", "modified"]
+    readonly_fields = ["path", "created", "modified"]
     raw_id_fields = ["discussion", "lesson", "parent", "created_by"]
+    actions = [approve_comments, reject_comments]
+
+    def get_comments(self, queryset):
+        return queryset
 
     def get_comment_source(self, obj):
         if obj.discussion:
@@ -42,11 +59,28 @@ class CommentAdmin(admin.ModelAdmin):
     get_comment_source.short_description = _("Source")
 
 
+@admin.register(CommentModeration)
+class CommentModerationAdmin(admin.ModelAdmin):
+    list_display = ["comment", "status", "reasons", "created", "reviewed_at"]
+    list_filter = ["status", "created"]
+    search_fields = ["comment__body", "comment__created_by__email"]
+    date_hierarchy = "created"
+    readonly_fields = ["comment", "status", "reasons", "created", "reviewed_at"]
+    list_select_related = ["comment"]
+    actions = [approve_comments, reject_comments]
+
+    def get_comments(self, queryset):
+        return Comment.objects.filter(moderation__in=queryset)
+
+    def has_add_permission(self, request):
+        return False
+
+
 @admin.register(Note)
 class NoteAdmin(admin.ModelAdmin):
-    list_display = ["user", "lesson", "created", "modified"]
+    list_display = ["user", "lesson", "version", "created", "modified"]
     list_filter = ["created", "lesson__module__course"]
     search_fields = ["content", "user__email", "lesson__title"]
     date_hierarchy = "created"
-    readonly_fields = ["created", "modified"]
+    readonly_fields = ["version", "created", "modified"]
     raw_id_fields = ["lesson", "user"]
@@ -0,0 +1,16 @@
+from django.urls import path, include
+from rest_framework.routers import SimpleRouter
+
+from .api_views import DiscussionViewSet, NoteAutosaveAPIView, NoteHistoryAPIView, NoteListAPIView
+
+router = SimpleRouter()
+router.register(r'', DiscussionViewSet, basename='discussion')
+
+app_name = 'discussions_api'
+
+urlpatterns = [
+    path('notes/', NoteListAPIView.as_view(), name='note-list'),
+    path('notes/<int:lesson_id>/', NoteAutosaveAPIView.as_view(), name='note-autosave'),
+    path('notes/<int:lesson_id>/history/', NoteHistoryAPIView.as_view(), name='note-history'),
+    path('', include(router.urls)),
+]
@@ -0,0 +1,184 @@
+from django.shortcuts import get_object_or_404
+from rest_framework import mixins, permissions, status, viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import PermissionDenied, ValidationError
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from educacion_financiera.apps.courses.models import Lesson
+from educacion_financiera.apps.courses.pagination import KeysetPagination
+from educacion_financiera.apps.courses.study_time import is_enrolled_in_lesson
+
+from .autosave import NoteConflict, load_note, note_history, save_note
+from .models import Comment, Discussion, Note
+from .notes import group_notes, search_notes, user_notes, with_snippets
+from .serializers import (
+    CommentSerializer, DiscussionSerializer, NoteAutosaveSerializer, NoteSummarySerializer, ReplySerializer
+)
+from .tree import comment_threads
+
+
+def can_discuss(user, lesson):
+    """Whether the user may read and post in the discussions of a lesson"""
+    return (
+        user.is_staff
+        or lesson.module.course.instructor_id == user.pk
+        or is_enrolled_in_lesson(user, lesson.pk)
+    )
+
+
+class DiscussionViewSet(mixins.CreateModelMixin, viewsets.ReadOnlyModelViewSet):
+    """
+    Discussions of a lesson, most recently active first. Listing requires
+    ``lesson``; the detail includes a page of comment threads
+    (``comments_after`` is the cursor of the next one).
+    """
+    serializer_class = DiscussionSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetPagination
+
+    def get_queryset(self):
+        return Discussion.objects.filter(is_active=True).select_related(
+            'lesson__module__course', 'created_by__profile', 'last_comment_by__profile'
+        ).order_by('-last_comment_at')
+
+    def check_lesson(self, lesson):
+        if not can_discuss(self.request.user, lesson):
+            raise PermissionDenied('Not enrolled in this course')
+
+    def get_object(self):
+        discussion = super().get_object()
+        self.check_lesson(discussion.lesson)
+        return discussion
+
+    def list(self, request, *args, **kwargs):
+        try:
+            lesson_id = int(request.query_params['lesson'])
+        except (KeyError, ValueError) as exc:
+            raise ValidationError({'lesson': ['A lesson id is required']}) from exc
+        lesson = get_object_or_404(Lesson.objects.select_related('module__course'), pk=lesson_id)
+        self.check_lesson(lesson)
+
+        page = self.paginate_queryset(self.get_queryset().filter(lesson=lesson))
+        return self.get_paginated_response(self.get_serializer(page, many=True).data)
+
+    def retrieve(self, request, *args, **kwargs):
+        discussion = self.get_object()
+        threads, next_cursor = comment_threads(
+            discussion.comments.filter(is_approved=True),
+            after=request.query_params.get('comments_after'),
+        )
+        return Response({
+            **self.get_serializer(discussion).data,
+            'comments': CommentSerializer(threads, many=True).data,
+            'comments_next': next_cursor,
+        })
+
+    def perform_create(self, serializer):
+        self.check_lesson(
+            Lesson.objects.select_related('module__course').get(pk=serializer.validated_data['lesson'].pk)
+        )
+        serializer.save(created_by=self.request.user)
+
+    @action(detail=True, methods=['post'])
+    def reply(self, request, pk=None):
+        """Comment on a discussion, or answer one of its comments"""
+        discussion = self.get_object()
+        serializer = ReplySerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        parent_id = serializer.validated_data.get('parent')
+        if parent_id is not None and not discussion.comments.filter(pk=parent_id, is_approved=True).exists():
+            raise ValidationError({'parent': ['Comment not found in this discussion']})
+
+        comment = Comment.objects.create(
+            discussion=discussion,
+            parent_id=parent_id,
+            body=serializer.validated_data['body'],
+            created_by=request.user,
+        )
+        return Response(CommentSerializer(comment).data, status=status.HTTP_201_CREATED)
+
+
+class NoteListAPIView(APIView):
+    """
+    The notes of the user grouped by course and module, each with the start
+    of its content; ``q`` searches them. A whole note is read from its
+    autosave endpoint.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        notes = with_snippets(search_notes(user_notes(request.user), request.query_params.get('q', '')))
+        return Response({'courses': [
+            {
+                'id': course.pk,
+                'title': course.title,
+                'modules': [
+                    {
+                        'id': module.pk,
+                        'title': module.title,
+                        'notes': NoteSummarySerializer(module_notes, many=True).data,
+                    }
+                    for module, module_notes in modules
+                ],
+            }
+            for course, modules in group_notes(notes)
+        ]})
+
+
+class NoteAutosaveAPIView(APIView):
+    """
+    The note of the user on a lesson. PUT saves it as made on ``version``
+    and answers 409 with the latest note when it has moved on since.
+    Saves are buffered and written to the database every few seconds.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def check_lesson(self, lesson_id):
+        if not is_enrolled_in_lesson(self.request.user, lesson_id):
+            raise PermissionDenied('Not enrolled in this course')
+
+    def get(self, request, lesson_id):
+        self.check_lesson(lesson_id)
+        content, version = load_note(request.user.pk, lesson_id)
+        return Response({'content': content, 'version': version})
+
+    def put(self, request, lesson_id):
+        self.check_lesson(lesson_id)
+        serializer = NoteAutosaveSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        changes = data.get('changes')
+        if changes is not None:
+            changes = [[change['start'], change['end'], change['text']] for change in changes]
+
+        try:
+            version = save_note(
+                request.user.pk, lesson_id, content=data.get('content'), changes=changes, version=data['version']
+            )
+        except NoteConflict as conflict:
+            return Response(
+                {'detail': 'The note changed since this version', 'content': conflict.content,
+                 'version': conflict.version},
+                status=status.HTTP_409_CONFLICT
+            )
+        except ValueError as exc:
+            raise ValidationError([str(exc)]) from exc
+        return Response({'version': version})
+
+
+class NoteHistoryAPIView(APIView):
+    """Earlier versions of the note of the user on a lesson, newest first"""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, lesson_id):
+        note = Note.objects.filter(user=request.user, lesson_id=lesson_id).first()
+        history = note_history(note) if note else []
+        return Response({
+            'version': note.version if note else 0,
+            'versions': [
+                {'version': version, 'content': content, 'replaced_at': replaced_at}
+                for version, content, replaced_at in history
+            ],
+        })
@@ -0,0 +1,329 @@
+"""
+Note autosave.
+
+The lesson page editor saves a note every few seconds while the student
+types. A save only replaces the pending content of the note in Redis and
+marks it dirty; ``flush_notes`` (the ``flush_note_autosaves`` task) writes
+the dirty notes with one upsert every few seconds, so a note costs at most
+one database write per flush however often it is saved.
+
+Every save names the version it was made on and bumps it. A save made on
+an older version is refused, so two open editors cannot overwrite each
+other silently. Saves send either the whole content or a list of
+``[start, end, text]`` replacements against that version.
+
+When NOTE_HISTORY_ENABLED, each flush keeps the replaced content as a
+NoteRevision holding the patch back from the new content, so history costs
+about the size of the edits. Saves coalesced into one flush leave no
+revision of their own.
+
+Without a Redis cache (development and tests) pending notes are kept in
+process. While Redis is unreachable, notes are read from and saved straight
+to the database.
+"""
+import logging
+import threading
+from difflib import SequenceMatcher
+
+from django.conf import settings
+from django.db import transaction
+from redis.exceptions import ConnectionError as RedisConnectionError
+from redis.exceptions import TimeoutError as RedisTimeoutError
+from redis.exceptions import WatchError
+
+from .models import Note, NoteRevision
+from .notes import note_search_vector
+
+PENDING_KEY = "notes:autosave:{user_id}:{lesson_id}"
+DIRTY_KEY = "notes:autosave:dirty"
+# Attempts at a save racing a flush or another save of the same note
+SAVE_ATTEMPTS = 3
+
+# Reads and deletes the dirty set in one step, so a worker dying mid-drain
+# cannot leave it in a key no flush will ever read
+DRAIN_SCRIPT = """
+local dirty = redis.call('SMEMBERS', KEYS[1])
+redis.call('DEL', KEYS[1])
+return dirty
+"""
+
+# Deletes a pending note unless it was saved again after being read
+RELEASE_SCRIPT = """
+if redis.call('HGET', KEYS[1], 'version') == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+logger = logging.getLogger(__name__)
+
+
+class NoteConflict(Exception):
+    """A save made on a version of the note that is no longer the latest"""
+    def __init__(self, content, version):
+        super().__init__(f"Note is at version {version}")
+        self.content = content
+        self.version = version
+
+
+def make_patch(text, target):
+    """Replacements turning ``text`` into ``target``"""
+    opcodes = SequenceMatcher(None, text, target, autojunk=False).get_opcodes()
+    return [
+        [start, end, target[target_start:target_end]]
+        for tag, start, end, target_start, target_end in opcodes
+        if tag != "equal"
+    ]
+
+
+def apply_patch(text, patch):
+    """
+    Apply ``[start, end, text]`` replacements, positions in the original
+    text and ordered, to ``text``
+    """
+    parts = []
+    position = 0
+    for start, end, replacement in patch:
+        if not position <= start <= end <= len(text):
+            raise ValueError("Replacements must be ordered and within the text")
+        parts.append(text[position:start])
+        parts.append(replacement)
+        position = end
+    parts.append(text[position:])
+    return "".join(parts)
+
+
+def _stored_note(user_id, lesson_id):
+    note = Note.objects.filter(user_id=user_id, lesson_id=lesson_id).values_list("content", "version").first()
+    return note or ("", 0)
+
+
+class RedisNoteBuffer:
+    """
+    Pending notes as Redis hashes, with a set of the dirty ones
+    """
+    def __init__(self, client):
+        self.client = client
+        self.drain_script = client.register_script(DRAIN_SCRIPT)
+        self.release_script = client.register_script(RELEASE_SCRIPT)
+
+    def get(self, user_id, lesson_id):
+        pending = self.client.hgetall(PENDING_KEY.format(user_id=user_id, lesson_id=lesson_id))
+        if not pending:
+            return None
+        return pending[b"content"].decode(), int(pending[b"version"])
+
+    def save(self, user_id, lesson_id, edit):
+        key = PENDING_KEY.format(user_id=user_id, lesson_id=lesson_id)
+        for _ in range(SAVE_ATTEMPTS):
+            with self.client.pipeline() as pipe:
+                try:
+                    pipe.watch(key)
+                    pending = pipe.hgetall(key)
+                    if pending:
+                        current = pending[b"content"].decode(), int(pending[b"version"])
+                    else:
+                        current = _stored_note(user_id, lesson_id)
+                    content, version = edit(*current)
+                    pipe.multi()
+                    pipe.hset(key, mapping={"content": content, "version": version})
+                    pipe.sadd(DIRTY_KEY, f"{user_id}:{lesson_id}")
+                    pipe.execute()
+                    return version
+                except WatchError:
+                    continue
+        raise NoteConflict(*(self.get(user_id, lesson_id) or _stored_note(user_id, lesson_id)))
+
+    def drain(self):
+        dirty = self.drain_script(keys=[DIRTY_KEY])
+        keys = [tuple(int(part) for part in member.decode().split(":")) for member in dirty]
+        if not keys:
+            return {}
+
+        with self.client.pipeline(transaction=False) as pipe:
+            for user_id, lesson_id in keys:
+                pipe.hgetall(PENDING_KEY.format(user_id=user_id, lesson_id=lesson_id))
+            values = pipe.execute()
+        return {
+            key: (pending[b"content"].decode(), int(pending[b"version"]))
+            for key, pending in zip(keys, values)
+            if pending
+        }
+
+    def release(self, flushed):
+        with self.client.pipeline(transaction=False) as pipe:
+            for (user_id, lesson_id), (_content, version) in flushed.items():
+                self.release_script(
+                    keys=[PENDING_KEY.format(user_id=user_id, lesson_id=lesson_id)], args=[version], client=pipe
+                )
+            pipe.execute()
+
+    def mark_dirty(self, keys):
+        self.client.sadd(DIRTY_KEY, *[f"{user_id}:{lesson_id}" for user_id, lesson_id in keys])
+
+
+class LocalNoteBuffer:
+    """
+    Pending notes in process memory, for development and tests
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pending = {}
+        self.dirty = set()
+
+    def get(self, user_id, lesson_id):
+        return self.pending.get((user_id, lesson_id))
+
+    def save(self, user_id, lesson_id, edit):
+        with self.lock:
+            current = self.pending.get((user_id, lesson_id)) or _stored_note(user_id, lesson_id)
+            content, version = edit(*current)
+            self.pending[(user_id, lesson_id)] = (content, version)
+            self.dirty.add((user_id, lesson_id))
+        return version
+
+    def drain(self):
+        with self.lock:
+            dirty, self.dirty = self.dirty, set()
+            return {key: self.pending[key] for key in dirty if key in self.pending}
+
+    def release(self, flushed):
+        with self.lock:
+            for key, note in flushed.items():
+                if self.pending.get(key) == note:
+                    del self.pending[key]
+
+    def mark_dirty(self, keys):
+        with self.lock:
+            self.dirty.update(keys)
+
+
+_local_buffer = LocalNoteBuffer()
+
+
+def get_buffer():
+    try:
+        from django_redis import get_redis_connection
+        return RedisNoteBuffer(get_redis_connection("default"))
+    except (ImportError, NotImplementedError):
+        # The default cache is not django-redis
+        return _local_buffer
+
+
+def _save_to_database(user_id, lesson_id, edit):
+    """Save a note without the buffer, for when Redis is unreachable"""
+    with transaction.atomic():
+        note = Note.objects.select_for_update().filter(user_id=user_id, lesson_id=lesson_id).first()
+        if note is None:
+            note = Note(user_id=user_id, lesson_id=lesson_id, content="")
+        content, version = edit(note.content, note.version)
+        if note.pk and settings.NOTE_HISTORY_ENABLED and note.content != content:
+            NoteRevision.objects.create(note=note, version=note.version, patch=make_patch(content, note.content))
+        note.content = content
+        note.version = version
+        note.search_vector = note_search_vector(content)
+        note.save()
+    return version
+
+
+def load_note(user_id, lesson_id, buffer=None):
+    """Latest content and version of a note, saved or still pending"""
+    buffer = buffer or get_buffer()
+    try:
+        pending = buffer.get(user_id, lesson_id)
+    except (RedisConnectionError, RedisTimeoutError):
+        logger.warning("Reading note without the autosave buffer, Redis is unreachable")
+        pending = None
+    return pending or _stored_note(user_id, lesson_id)
+
+
+def save_note(user_id, lesson_id, content=None, changes=None, version=None, buffer=None):
+    """
+    Save the whole ``content`` of a note, or apply ``changes`` to it, as made
+    on ``version``. Returns the new version. Raises NoteConflict when the
+    note has moved past ``version``; without a version the save always wins.
+    """
+    buffer = buffer or get_buffer()
+
+    def edit(current_content, current_version):
+        if version is not None and version != current_version:
+            raise NoteConflict(current_content, current_version)
+        new_content = apply_patch(current_content, changes) if changes is not None else content
+        if len(new_content) > settings.NOTE_MAX_LENGTH:
+            raise ValueError(f"Notes are limited to {settings.NOTE_MAX_LENGTH} characters")
+        return new_content, current_version + 1
+
+    try:
+        return buffer.save(user_id, lesson_id, edit)
+    except (RedisConnectionError, RedisTimeoutError):
+        logger.warning("Saving note without the autosave buffer, Redis is unreachable")
+        return _save_to_database(user_id, lesson_id, edit)
+
+
+def flush_notes(buffer=None):
+    """
+    Write pending notes to the database. Returns the number of notes
+    flushed.
+    """
+    buffer = buffer or get_buffer()
+    pending = buffer.drain()
+    if not pending:
+        return 0
+
+    try:
+        _write_notes(pending)
+    except Exception:
+        # Keep them dirty for the next run
+        buffer.mark_dirty(pending)
+        raise
+    buffer.release(pending)
+    return len(pending)
+
+
+@transaction.atomic
+def _write_notes(pending):
+    user_ids = {user_id for user_id, _lesson_id in pending}
+    lesson_ids = {lesson_id for _user_id, lesson_id in pending}
+    existing = {
+        (note.user_id, note.lesson_id): note
+        for note in Note.objects.select_for_update().filter(user_id__in=user_ids, lesson_id__in=lesson_ids)
+        if (note.user_id, note.lesson_id) in pending
+    }
+
+    notes, revisions = [], []
+    for (user_id, lesson_id), (content, version) in pending.items():
+        note = existing.get((user_id, lesson_id))
+        if note is not None and note.version >= version:
+            # Already written by an earlier flush
+            continue
+        if note is not None and settings.NOTE_HISTORY_ENABLED and note.content != content:
+            revisions.append(NoteRevision(note=note, version=note.version, patch=make_patch(content, note.content)))
+        notes.append(Note(
+            user_id=user_id,
+            lesson_id=lesson_id,
+            content=content,
+            version=version,
+            search_vector=note_search_vector(content),
+        ))
+
+    Note.objects.bulk_create(
+        notes,
+        batch_size=500,
+        update_conflicts=True,
+        unique_fields=["lesson", "user"],
+        update_fields=["content", "version", "modified", "search_vector"],
+    )
+    NoteRevision.objects.bulk_create(revisions, batch_size=500, ignore_conflicts=True)
+
+
+def note_history(note, limit=20):
+    """
+    The latest ``limit`` earlier versions of a note, newest first, as
+    (version, content, replaced_at)
+    """
+    content = note.content
+    history = []
+    for revision in note.revisions.order_by("-version")[:limit]:
+        content = apply_patch(content, revision.patch)
+        history.append((revision.version, content, revision.created))
+    return history
@@ -0,0 +1,46 @@
+# Generated by Django 5.1.9 on 2026-10-18 11:19
+
+from django.conf import settings
+from django.db import migrations, models
+
+PATH_DIGITS = 10
+
+
+def backfill_paths(apps, schema_editor):
+    Comment = apps.get_model('discussions', 'Comment')
+
+    # One level at a time, so every parent has its path before its replies
+    paths = {}
+    level = list(Comment.objects.filter(parent__isnull=True).only('pk', 'parent'))
+    while level:
+        for comment in level:
+            comment.path = paths.get(comment.parent_id, '') + f'{comment.pk:0{PATH_DIGITS}d}/'
+            paths[comment.pk] = comment.path
+        Comment.objects.bulk_update(level, ['path'], batch_size=1000)
+        level = list(Comment.objects.filter(parent__in=[comment.pk for comment in level]).only('pk', 'parent'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0008_analytics_indexes'),
+        ('discussions', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='path',
+            field=models.CharField(blank=True, default='', editable=False, max_length=255, verbose_name='Path'),
+        ),
+        migrations.RunPython(backfill_paths, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['lesson', 'path'], name='comment_lesson_path_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['discussion', 'path'], name='comment_discussion_path_idx'),
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.1.9 on 2026-10-18 11:21
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_reply_counters(apps, schema_editor):
+    Comment = apps.get_model('discussions', 'Comment')
+    Discussion = apps.get_model('discussions', 'Discussion')
+
+    replies = Comment.objects.filter(discussion=OuterRef('pk'), is_approved=True)
+    latest = replies.order_by('-created', '-pk')
+    Discussion.objects.update(
+        reply_count=Coalesce(Subquery(
+            replies.order_by().values('discussion').annotate(total=Count('id')).values('total')[:1]
+        ), 0),
+        last_comment_at=Coalesce(Subquery(latest.values('created')[:1]), F('created')),
+        last_comment_by=Subquery(latest.values('created_by')[:1]),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0008_analytics_indexes'),
+        ('discussions', '0002_comment_path'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='discussion',
+            name='last_comment_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False, help_text='Time of the last approved comment, or of the discussion until it has one', verbose_name='Last comment at'),
+        ),
+        migrations.AddField(
+            model_name='discussion',
+            name='last_comment_by',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Last comment by'),
+        ),
+        migrations.AddField(
+            model_name='discussion',
+            name='reply_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Replies'),
+        ),
+        migrations.RunPython(backfill_reply_counters, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='discussion',
+            index=models.Index(fields=['lesson', 'is_active', 'last_comment_at'], name='discussion_activity_idx'),
+        ),
+    ]
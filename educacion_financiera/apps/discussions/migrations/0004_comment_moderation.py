@@ -0,0 +1,31 @@
+# Generated by Django 5.1.9 on 2026-10-18 11:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('discussions', '0003_discussion_reply_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CommentModeration',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('approved', 'Approved'), ('flagged', 'Flagged'), ('rejected', 'Rejected')], default='pending', max_length=10, verbose_name='Status')),
+                ('reasons', models.JSONField(blank=True, default=list, verbose_name='Reasons')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='Created')),
+                ('reviewed_at', models.DateTimeField(blank=True, null=True, verbose_name='Reviewed at')),
+                ('comment', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='moderation', to='discussions.comment', verbose_name='Comment')),
+            ],
+            options={
+                'verbose_name': 'Comment Moderation',
+                'verbose_name_plural': 'Comment Moderation',
+                'ordering': ['-created'],
+                'indexes': [models.Index(condition=models.Q(('status', 'pending')), fields=['created'], name='moderation_pending_idx'), models.Index(fields=['status', 'created'], name='moderation_status_idx')],
+            },
+        ),
+    ]
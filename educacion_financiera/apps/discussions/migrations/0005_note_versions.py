@@ -0,0 +1,35 @@
+# Generated by Django 5.1.9 on 2026-10-18 11:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('discussions', '0004_comment_moderation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='note',
+            name='version',
+            field=models.PositiveIntegerField(default=0, verbose_name='Version'),
+        ),
+        migrations.CreateModel(
+            name='NoteRevision',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveIntegerField(verbose_name='Version')),
+                ('patch', models.JSONField(default=list, verbose_name='Patch')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='Created')),
+                ('note', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='revisions', to='discussions.note', verbose_name='Note')),
+            ],
+            options={
+                'verbose_name': 'Note Revision',
+                'verbose_name_plural': 'Note Revisions',
+                'ordering': ['-version'],
+                'unique_together': {('note', 'version')},
+            },
+        ),
+    ]
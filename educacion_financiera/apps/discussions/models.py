@@ -1,10 +1,46 @@
 from django.conf import settings
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
+from django.db import transaction
+from django.db.models import Count
+from django.db.models import F
+from django.db.models import Max
+from django.db.models import OuterRef
+from django.db.models import Subquery
+from django.db.models import Value
+from django.db.models.functions import Coalesce
+from django.db.models.functions import Concat
+from django.db.models.functions import Length
+from django.db.models.functions import Substr
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
 from educacion_financiera.apps.courses.models import Lesson
 
 
+class DiscussionQuerySet(models.QuerySet):
+    def record_reply(self, comment):
+        """Count a new approved comment as the latest reply"""
+        return self.update(
+            reply_count=F("reply_count") + 1,
+            last_comment_at=comment.created,
+            last_comment_by=comment.created_by_id,
+        )
+
+    def recount_replies(self):
+        """Recompute the reply counters from the approved comments"""
+        replies = Comment.objects.filter(discussion=OuterRef("pk"), is_approved=True)
+        latest = replies.order_by("-created", "-pk")
+        return self.update(
+            reply_count=Coalesce(Subquery(
+                replies.order_by().values("discussion").annotate(total=Count("id")).values("total")[:1]
+            ), 0),
+            last_comment_at=Coalesce(Subquery(latest.values("created")[:1]), F("created")),
+            last_comment_by=Subquery(latest.values("created_by")[:1]),
+        )
+
+
 class Discussion(models.Model):
     """
     Discussion thread for a lesson
@@ -27,19 +63,52 @@ class Discussion(models.Model):
     modified = models.DateTimeField(_("Modified"), auto_now=True)
     is_active = models.BooleanField(_("Is active"), default=True)
 
+    # Denormalized replies, kept in sync by discussions.signals
+    reply_count = models.PositiveIntegerField(_("Replies"), default=0, editable=False)
+    last_comment_at = models.DateTimeField(
+        _("Last comment at"),
+        default=timezone.now,
+        editable=False,
+        help_text=_("Time of the last approved comment, or of the discussion until it has one")
+    )
+    last_comment_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        related_name="+",
+        on_delete=models.SET_NULL,
+        verbose_name=_("Last comment by"),
+        null=True,
+        blank=True,
+        editable=False
+    )
+
+    objects = DiscussionQuerySet.as_manager()
+
     class Meta:
         verbose_name = _("Discussion")
         verbose_name_plural = _("Discussions")
         ordering = ["-created"]
+        indexes = [
+            # Most recently active threads of a lesson
+            models.Index(fields=["lesson", "is_active", "last_comment_at"], name="discussion_activity_idx"),
+        ]
 
     def __str__(self):
         return self.title
 
 
+def path_segment(pk):
+    """Zero-padded id of a comment, so paths sort like numbers"""
+    return f"{pk:0{Comment.PATH_DIGITS}d}/"
+
+
 class Comment(models.Model):
     """
     Comment on a discussion thread or lesson
     """
+    PATH_DIGITS = 10
+    # Replies nested deeper are attached next to their parent
+    MAX_DEPTH = 20
+
     # Comment can be on a discussion or directly on a lesson
     discussion = models.ForeignKey(
         Discussion,
@@ -76,22 +145,127 @@ class Comment(models.Model):
     created = models.DateTimeField(_("Created"), auto_now_add=True)
     modified = models.DateTimeField(_("Modified"), auto_now=True)
     is_approved = models.BooleanField(_("Is approved"), default=True)
+    # Materialized path: the padded ids of the ancestors and the comment itself,
+    # maintained by save(). Ordering by path lists a thread depth first.
+    path = models.CharField(_("Path"), max_length=255, blank=True, default="", editable=False)
 
     class Meta:
         verbose_name = _("Comment")
         verbose_name_plural = _("Comments")
         ordering = ["created"]
+        indexes = [
+            # Whole threads are read as path ranges of a lesson or discussion
+            models.Index(fields=["lesson", "path"], name="comment_lesson_path_idx"),
+            models.Index(fields=["discussion", "path"], name="comment_discussion_path_idx"),
+        ]
 
     def __str__(self):
         return f"Comment by {self.created_by.email} on {self.created}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored parent and approval so save and signals can detect changes
+        instance._loaded_parent_id = instance.__dict__.get("parent_id")
+        instance._loaded_is_approved = instance.__dict__.get("is_approved", False)
+        return instance
+
+    @property
+    def depth(self):
+        """Nesting level, 0 for top-level comments"""
+        return max(len(self.path) // (self.PATH_DIGITS + 1) - 1, 0)
+
     def save(self, *args, **kwargs):
         # Ensure comment is either on a discussion or on a lesson, but not both
         if self.discussion and self.lesson:
             raise ValueError("Comment can't be on both a discussion and a lesson")
         if not self.discussion and not self.lesson:
             raise ValueError("Comment must be on either a discussion or a lesson")
-        super().save(*args, **kwargs)
+
+        adding = self._state.adding
+        moved = not adding and self.parent_id != getattr(self, "_loaded_parent_id", self.parent_id)
+        if self.parent_id and (adding or moved):
+            if moved and self.path and self.parent.path.startswith(self.path):
+                raise ValueError("Comment can't be a reply to itself or its replies")
+            if self.parent.depth >= self.MAX_DEPTH - 1:
+                self.parent = self.parent.parent
+            if moved and self.path:
+                self._fit_subtree()
+
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if adding or moved or not self.path:
+                self._update_path()
+        self._loaded_parent_id = self.parent_id
+
+    def _fit_subtree(self):
+        """
+        Attach a moved comment to the deepest ancestor of its new parent that
+        keeps its replies within MAX_DEPTH, so rebased paths stay in the column
+        """
+        deepest = Comment.objects.filter(path__startswith=self.path).aggregate(length=Max(Length("path")))["length"]
+        height = (deepest - len(self.path)) // (self.PATH_DIGITS + 1)
+        parent_depth = self.MAX_DEPTH - 2 - height
+        if self.parent.depth <= parent_depth:
+            return
+        if parent_depth < 0:
+            self.parent = None
+        else:
+            ancestor_id = int(self.parent.path.split("/")[parent_depth])
+            self.parent = Comment.objects.get(pk=ancestor_id)
+
+    def _update_path(self):
+        """Store the path of a new or moved comment and rebase its replies"""
+        old_path = self.path
+        self.path = (self.parent.path if self.parent_id else "") + path_segment(self.pk)
+        if old_path and old_path != self.path:
+            Comment.objects.filter(path__startswith=old_path).update(
+                path=Concat(Value(self.path), Substr("path", len(old_path) + 1))
+            )
+        else:
+            Comment.objects.filter(pk=self.pk).update(path=self.path)
+
+
+class CommentModeration(models.Model):
+    """
+    Moderation queue entry of a comment, checked in batches by the worker
+    """
+    PENDING = "pending"
+    APPROVED = "approved"
+    FLAGGED = "flagged"
+    REJECTED = "rejected"
+    STATUS_CHOICES = (
+        (PENDING, _("Pending")),
+        (APPROVED, _("Approved")),
+        (FLAGGED, _("Flagged")),
+        (REJECTED, _("Rejected")),
+    )
+
+    comment = models.OneToOneField(
+        Comment,
+        related_name="moderation",
+        on_delete=models.CASCADE,
+        verbose_name=_("Comment")
+    )
+    status = models.CharField(_("Status"), max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    reasons = models.JSONField(_("Reasons"), default=list, blank=True)
+    created = models.DateTimeField(_("Created"), auto_now_add=True)
+    reviewed_at = models.DateTimeField(_("Reviewed at"), null=True, blank=True)
+
+    class Meta:
+        verbose_name = _("Comment Moderation")
+        verbose_name_plural = _("Comment Moderation")
+        ordering = ["-created"]
+        indexes = [
+            # The worker only reads the pending entries
+            models.Index(
+                fields=["created"], name="moderation_pending_idx", condition=models.Q(status="pending")
+            ),
+            models.Index(fields=["status", "created"], name="moderation_status_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.comment_id} ({self.status})"
 
 
 class Note(models.Model):
@@ -111,14 +285,48 @@ class Note(models.Model):
         verbose_name=_("User")
     )
     content = models.TextField(_("Content"))
+    # Bumped by every autosave, for optimistic concurrency between editors
+    version = models.PositiveIntegerField(_("Version"), default=0)
     created = models.DateTimeField(_("Created"), auto_now_add=True)
     modified = models.DateTimeField(_("Modified"), auto_now=True)
+    # Written along with the content, see discussions/notes.py
+    search_vector = SearchVectorField(_("Search Vector"), null=True, editable=False)
 
     class Meta:
         verbose_name = _("Note")
         verbose_name_plural = _("Notes")
         ordering = ["-modified"]
         unique_together = [["lesson", "user"]]
+        indexes = [
+            models.Index(fields=["user", "-modified"], name="note_user_modified_idx"),
+            GinIndex(fields=["search_vector"], name="note_search_vector_gin"),
+        ]
 
     def __str__(self):
         return f"Note by {self.user.email} for {self.lesson}"
+
+
+class NoteRevision(models.Model):
+    """
+    Earlier version of a note, stored as the patch that turns the following
+    version back into it
+    """
+    note = models.ForeignKey(
+        Note,
+        related_name="revisions",
+        on_delete=models.CASCADE,
+        verbose_name=_("Note")
+    )
+    version = models.PositiveIntegerField(_("Version"))
+    # [start, end, text] replacements, see discussions.autosave.make_patch
+    patch = models.JSONField(_("Patch"), default=list)
+    created = models.DateTimeField(_("Created"), auto_now_add=True)
+
+    class Meta:
+        verbose_name = _("Note Revision")
+        verbose_name_plural = _("Note Revisions")
+        ordering = ["-version"]
+        unique_together = [["note", "version"]]
+
+    def __str__(self):
+        return f"{self.note_id} v{self.version}"
@@ -0,0 +1,178 @@
+"""
+Comment moderation.
+
+Posting a comment only adds a pending CommentModeration row. The worker
+(``moderate_pending`` via the ``moderate_pending_comments`` task) takes
+pending entries in batches and runs every check of
+COMMENT_MODERATION_CHECKS over the whole batch. A check is a callable that
+takes a list of comments and returns ``{comment_id: reason}`` for the ones
+it flags, so checks needing the database query once per batch. Flagged
+comments are hidden until a moderator approves them, the rest are approved.
+
+``set_approval`` approves or rejects any number of comments with single
+UPDATE statements, shifts the community post counters of their authors,
+then recounts the affected discussions and drops the cached comment
+threads of the affected lessons.
+"""
+import re
+from collections import defaultdict
+from datetime import timedelta
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, DateTimeField, ExpressionWrapper, OuterRef, Subquery
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from educacion_financiera.apps.profiles.models import Profile
+
+from .models import Comment, CommentModeration, Discussion
+from .tree import invalidate_lesson_comments
+
+LINK_RE = re.compile(r"https?://|www\.", re.IGNORECASE)
+WORD_RE = re.compile(r"\w+")
+REPEATED_RE = re.compile(r"(.)\1{9,}")
+
+
+def check_links(comments):
+    """Flag comments with more links than COMMENT_MODERATION_MAX_LINKS"""
+    limit = settings.COMMENT_MODERATION_MAX_LINKS
+    return {
+        comment.pk: "links"
+        for comment in comments
+        if len(LINK_RE.findall(comment.body)) > limit
+    }
+
+
+def check_banned_words(comments):
+    """Flag comments using a word of COMMENT_MODERATION_BANNED_WORDS"""
+    banned = {word.lower() for word in settings.COMMENT_MODERATION_BANNED_WORDS}
+    if not banned:
+        return {}
+    return {
+        comment.pk: "banned_words"
+        for comment in comments
+        if banned & set(WORD_RE.findall(comment.body.lower()))
+    }
+
+
+def check_spam(comments):
+    """Flag shouting, long runs of one character and bodies a user repeats in the batch"""
+    flagged = {}
+    seen = set()
+    for comment in comments:
+        body = comment.body.strip()
+        letters = [char for char in body if char.isalpha()]
+        if len(letters) >= 20 and sum(char.isupper() for char in letters) > len(letters) * 0.8:
+            flagged[comment.pk] = "spam"
+        elif REPEATED_RE.search(body):
+            flagged[comment.pk] = "spam"
+        elif (comment.created_by_id, body.lower()) in seen:
+            flagged[comment.pk] = "spam"
+        seen.add((comment.created_by_id, body.lower()))
+    return flagged
+
+
+def check_rate(comments):
+    """
+    Flag comments whose author posted more than COMMENT_MODERATION_HOURLY_LIMIT
+    in the hour up to them
+    """
+    limit = settings.COMMENT_MODERATION_HOURLY_LIMIT
+    posted = Comment.objects.filter(
+        created_by=OuterRef("created_by"),
+        created__gt=ExpressionWrapper(OuterRef("created") - timedelta(hours=1), output_field=DateTimeField()),
+        created__lte=OuterRef("created"),
+    ).order_by().values("created_by").annotate(total=Count("id")).values("total")[:1]
+    counts = dict(
+        Comment.objects.filter(pk__in=[comment.pk for comment in comments])
+        .annotate(recent=Subquery(posted)).values_list("pk", "recent")
+    )
+    return {
+        comment.pk: "rate"
+        for comment in comments
+        if (counts.get(comment.pk) or 0) > limit
+    }
+
+
+@lru_cache
+def get_checks():
+    return [import_string(path) for path in settings.COMMENT_MODERATION_CHECKS]
+
+
+def run_checks(comments):
+    """Reasons every check gives against each comment"""
+    reasons = defaultdict(list)
+    if comments:
+        for check in get_checks():
+            for comment_id, reason in check(comments).items():
+                reasons[comment_id].append(reason)
+    return reasons
+
+
+def moderate_pending(batch_size=None):
+    """
+    Check one batch of pending comments. Returns how many were approved and
+    how many flagged.
+    """
+    batch_size = batch_size or settings.COMMENT_MODERATION_BATCH_SIZE
+    with transaction.atomic():
+        entries = list(
+            CommentModeration.objects.select_for_update(skip_locked=True, of=("self",))
+            .filter(status=CommentModeration.PENDING)
+            .select_related("comment")
+            .order_by("created")[:batch_size]
+        )
+        reasons = run_checks([entry.comment for entry in entries])
+
+        now = timezone.now()
+        for entry in entries:
+            entry.reasons = reasons.get(entry.comment_id, [])
+            entry.status = CommentModeration.FLAGGED if entry.reasons else CommentModeration.APPROVED
+            entry.reviewed_at = now
+        CommentModeration.objects.bulk_update(entries, ["status", "reasons", "reviewed_at"])
+
+        flagged = [entry.comment_id for entry in entries if entry.reasons]
+        if flagged:
+            _update_comments(flagged, approved=False)
+    return {"approved": len(entries) - len(flagged), "flagged": len(flagged)}
+
+
+def _update_comments(comment_ids, approved):
+    # Only approved comments count as community posts of their author
+    changed = Comment.objects.filter(pk__in=comment_ids).exclude(is_approved=approved)
+    authors = defaultdict(list)
+    for user_id, total in changed.order_by().values("created_by").annotate(total=Count("id")).values_list(
+        "created_by", "total"
+    ):
+        authors[total].append(user_id)
+    changed.update(is_approved=approved)
+    for total, user_ids in authors.items():
+        Profile.objects.filter(user_id__in=user_ids).adjust_counters(community_posts=total if approved else -total)
+
+    affected = list(
+        Comment.objects.filter(pk__in=comment_ids).order_by().values_list("lesson", "discussion").distinct()
+    )
+    lesson_ids = {lesson_id for lesson_id, _discussion_id in affected}
+    discussion_ids = {discussion_id for _lesson_id, discussion_id in affected if discussion_id}
+    if discussion_ids:
+        Discussion.objects.filter(pk__in=discussion_ids).recount_replies()
+    invalidate_lesson_comments(lesson_ids)
+
+
+@transaction.atomic
+def set_approval(comments, approved):
+    """
+    Approve or reject comments, a queryset of any size, as a moderator.
+    Returns the number of comments updated.
+    """
+    comment_ids = list(comments.values_list("pk", flat=True))
+    if not comment_ids:
+        return 0
+    _update_comments(comment_ids, approved)
+    CommentModeration.objects.filter(comment__in=comment_ids).update(
+        status=CommentModeration.APPROVED if approved else CommentModeration.REJECTED,
+        reviewed_at=timezone.now(),
+    )
+    return len(comment_ids)
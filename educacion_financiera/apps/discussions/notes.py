@@ -0,0 +1,154 @@
+"""
+A student's notes across lessons.
+
+``user_notes`` lists the notes of a user by course, module and lesson, so
+``group_notes`` groups them in one pass. ``search_notes`` filters them with
+full-text search on PostgreSQL: every note keeps a ``search_vector`` of its
+content in the ``spanish_unaccent`` configuration of course search, backed
+by a GIN index and written with the content by the autosave flush. Other
+databases, such as the SQLite one used in tests, get ``icontains``.
+
+Exports are generators for a StreamingHttpResponse and read the notes in
+chunks with ``iterator()``: a single Markdown document, or a ZIP with one
+Markdown file per lesson written to an unseekable stream, so memory does
+not grow with the number of notes.
+
+Autosaves not flushed yet (see autosave.py) show up a few seconds later.
+"""
+import zipfile
+
+from django.apps import apps as global_apps
+from django.contrib.postgres.search import SearchQuery, SearchVector
+from django.db.models import Value
+from django.db.models.functions import Left
+from django.utils import timezone
+from django.utils.text import slugify
+
+from educacion_financiera.apps.courses.search import SEARCH_CONFIG, is_full_text_available
+from educacion_financiera.exports import EXPORT_CHUNK_SIZE
+
+from .models import Note
+
+SNIPPET_LENGTH = 300
+RECENT_NOTES = 5
+
+
+def note_search_vector(content):
+    """Search vector of a note's content, for a save or an upsert; None without full-text search"""
+    if not is_full_text_available():
+        return None
+    return SearchVector(Value(content), config=SEARCH_CONFIG)
+
+
+def update_note_search_vectors(note_ids=None, apps=global_apps):
+    """Rebuild the search vector of the given notes, or all, in one UPDATE"""
+    if not is_full_text_available():
+        return 0
+    notes = apps.get_model("discussions", "Note").objects.all()
+    if note_ids is not None:
+        notes = notes.filter(pk__in=note_ids)
+    return notes.update(search_vector=SearchVector("content", config=SEARCH_CONFIG))
+
+
+def user_notes(user):
+    """Notes of a user with their lesson, module and course, in course order"""
+    return Note.objects.filter(user=user).exclude(content="").defer("search_vector").select_related(
+        "lesson__module__course"
+    ).order_by(
+        "lesson__module__course__title", "lesson__module__course",
+        "lesson__module__order", "lesson__module",
+        "lesson__order", "lesson",
+    )
+
+
+def recent_notes(user, limit=RECENT_NOTES):
+    """Notes of a user last edited"""
+    return with_snippets(user_notes(user)).order_by("-modified")[:limit]
+
+
+def with_snippets(notes):
+    """Notes loaded with the start of their content as ``snippet`` instead of all of it"""
+    return notes.defer("content").annotate(snippet=Left("content", SNIPPET_LENGTH))
+
+
+def search_notes(notes, query):
+    """Filter notes matching a user query"""
+    query = query.strip()
+    if not query:
+        return notes
+    if not is_full_text_available():
+        return notes.filter(content__icontains=query)
+    return notes.filter(search_vector=SearchQuery(query, config=SEARCH_CONFIG, search_type="websearch"))
+
+
+def group_notes(notes):
+    """
+    Group notes in the order of ``user_notes`` as
+    ``[(course, [(module, [note, ...]), ...]), ...]``
+    """
+    groups = []
+    for note in notes:
+        module = note.lesson.module
+        if not groups or groups[-1][0].pk != module.course_id:
+            groups.append((module.course, []))
+        modules = groups[-1][1]
+        if not modules or modules[-1][0].pk != module.pk:
+            modules.append((module, []))
+        modules[-1][1].append(note)
+    return groups
+
+
+def _modified(note):
+    return timezone.localtime(note.modified).strftime("%Y-%m-%d %H:%M")
+
+
+def stream_markdown(notes):
+    """Notes as one Markdown document with a section per course and module"""
+    yield "# Mis notas\n"
+    course_id = module_id = None
+    for note in notes.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        lesson = note.lesson
+        if lesson.module.course_id != course_id:
+            course_id, module_id = lesson.module.course_id, None
+            yield f"\n## {lesson.module.course.title}\n"
+        if lesson.module_id != module_id:
+            module_id = lesson.module_id
+            yield f"\n### {lesson.module.title}\n"
+        yield f"\n#### {lesson.title}\n\n_{_modified(note)}_\n\n{note.content.strip()}\n"
+
+
+class ZipStream:
+    """Unseekable file keeping what ZipFile writes until it is taken"""
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def take(self):
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def stream_zip(notes):
+    """Notes as a ZIP of Markdown files, a folder per course and module"""
+    stream = ZipStream()
+    with zipfile.ZipFile(stream, mode="w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for note in notes.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+            lesson = note.lesson
+            module = lesson.module
+            name = "/".join([
+                module.course.slug,
+                f"{module.order:02d}-{slugify(module.title)}",
+                f"{lesson.order:02d}-{lesson.pk}-{slugify(lesson.title)}.md",
+            ])
+            info = zipfile.ZipInfo(name, date_time=timezone.localtime(note.modified).timetuple()[:6])
+            info.compress_type = zipfile.ZIP_DEFLATED
+            archive.writestr(info, f"# {lesson.title}\n\n_{_modified(note)}_\n\n{note.content.strip()}\n")
+            yield stream.take()
+    yield stream.take()
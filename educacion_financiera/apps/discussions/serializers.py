@@ -0,0 +1,97 @@
+from django.contrib.auth import get_user_model
+from rest_framework import serializers
+
+from educacion_financiera.apps.profiles.models import Profile
+
+from .models import Comment, Discussion, Note
+
+User = get_user_model()
+
+
+class AuthorSerializer(serializers.ModelSerializer):
+    """Public name and photo of a discussion participant"""
+    display_name = serializers.SerializerMethodField()
+    photo = serializers.SerializerMethodField()
+
+    class Meta:
+        model = User
+        fields = ['id', 'display_name', 'photo']
+
+    def get_display_name(self, obj):
+        return obj.name if obj.name else obj.email.split('@')[0]
+
+    def get_photo(self, obj):
+        try:
+            return obj.profile.photo.url if obj.profile.photo else None
+        except Profile.DoesNotExist:
+            return None
+
+
+class CommentSerializer(serializers.ModelSerializer):
+    """A comment and, when loaded as a tree, its replies"""
+    created_by = AuthorSerializer(read_only=True)
+    replies = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Comment
+        fields = ['id', 'parent', 'body', 'created_by', 'created', 'depth', 'replies']
+        read_only_fields = ['parent']
+
+    def get_replies(self, obj):
+        return CommentSerializer(getattr(obj, 'children', []), many=True, context=self.context).data
+
+
+class ReplySerializer(serializers.Serializer):
+    """A new comment on a discussion, optionally answering another comment"""
+    body = serializers.CharField()
+    parent = serializers.IntegerField(required=False, allow_null=True)
+
+
+class DiscussionSerializer(serializers.ModelSerializer):
+    created_by = AuthorSerializer(read_only=True)
+    last_comment_by = AuthorSerializer(read_only=True)
+
+    class Meta:
+        model = Discussion
+        fields = [
+            'id', 'lesson', 'title', 'body', 'created_by', 'created',
+            'reply_count', 'last_comment_at', 'last_comment_by',
+        ]
+        read_only_fields = ['reply_count', 'last_comment_at']
+
+
+class NoteChangeSerializer(serializers.Serializer):
+    """Replacement of the text between ``start`` and ``end``"""
+    start = serializers.IntegerField(min_value=0)
+    end = serializers.IntegerField(min_value=0)
+    text = serializers.CharField(allow_blank=True, trim_whitespace=False)
+
+    def validate(self, attrs):
+        if attrs['start'] > attrs['end']:
+            raise serializers.ValidationError('start must not be after end')
+        return attrs
+
+
+class NoteAutosaveSerializer(serializers.Serializer):
+    """
+    A save of a note made on ``version``: its whole ``content`` or
+    ``changes`` to it
+    """
+    version = serializers.IntegerField(min_value=0)
+    content = serializers.CharField(required=False, allow_blank=True, trim_whitespace=False)
+    changes = NoteChangeSerializer(many=True, required=False)
+
+    def validate(self, attrs):
+        if ('content' in attrs) == ('changes' in attrs):
+            raise serializers.ValidationError('Send either content or changes')
+        return attrs
+
+
+class NoteSummarySerializer(serializers.ModelSerializer):
+    """A note in a list, with the start of its content"""
+    lesson_title = serializers.CharField(source='lesson.title', read_only=True)
+    snippet = serializers.CharField(read_only=True)
+
+    class Meta:
+        model = Note
+        fields = ['lesson', 'lesson_title', 'snippet', 'version', 'modified']
@@ -0,0 +1,64 @@
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Comment, CommentModeration, Discussion, Note
+from .notes import update_note_search_vectors
+from .tree import invalidate_lesson_comments
+
+
+@receiver(post_save, sender=Comment)
+def count_saved_reply(sender, instance, created, **kwargs):
+    """
+    Keep the reply counters of the discussion in step with new, approved or
+    rejected comments
+    """
+    was_approved = False if created else getattr(instance, "_loaded_is_approved", instance.is_approved)
+    instance._loaded_is_approved = instance.is_approved
+    if not instance.discussion_id or instance.is_approved == was_approved:
+        return
+
+    discussion = Discussion.objects.filter(pk=instance.discussion_id)
+    if created:
+        discussion.record_reply(instance)
+    else:
+        discussion.recount_replies()
+
+
+@receiver(post_delete, sender=Comment)
+def discount_deleted_reply(sender, instance, origin=None, **kwargs):
+    """
+    Recount the discussion after an approved comment is removed
+    """
+    # Comments deleted along with their discussion need no recount
+    if isinstance(origin, Discussion) or (isinstance(origin, QuerySet) and origin.model is Discussion):
+        return
+    if instance.discussion_id and instance.is_approved:
+        Discussion.objects.filter(pk=instance.discussion_id).recount_replies()
+
+
+@receiver(post_save, sender=Comment)
+def queue_moderation(sender, instance, created, **kwargs):
+    """
+    Queue new comments for the moderation worker
+    """
+    if created:
+        CommentModeration.objects.create(comment=instance)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_comment_threads(sender, instance, **kwargs):
+    """
+    Drop the cached comment threads of the lesson
+    """
+    if instance.lesson_id:
+        invalidate_lesson_comments([instance.lesson_id])
+
+
+@receiver(post_save, sender=Note)
+def update_note_search_vector(sender, instance, **kwargs):
+    """
+    Index notes saved outside the autosave flush, such as from the admin
+    """
+    update_note_search_vectors([instance.pk])
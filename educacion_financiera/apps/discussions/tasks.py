@@ -0,0 +1,26 @@
+from celery import shared_task
+
+from .autosave import flush_notes
+from .moderation import moderate_pending
+
+# Batches checked per run, so a backlog cannot hold a worker indefinitely
+MAX_BATCHES = 20
+
+
+@shared_task()
+def moderate_pending_comments():
+    """Run the moderation checks over the pending comments, batch by batch"""
+    totals = {"approved": 0, "flagged": 0}
+    for _ in range(MAX_BATCHES):
+        result = moderate_pending()
+        if not any(result.values()):
+            break
+        for key, value in result.items():
+            totals[key] += value
+    return totals
+
+
+@shared_task()
+def flush_note_autosaves():
+    """Write the notes autosaved since the last run"""
+    return flush_notes()
@@ -0,0 +1,104 @@
+import pytest
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from educacion_financiera.apps.courses.tests.factories import EnrollmentFactory
+from educacion_financiera.apps.courses.tests.factories import LessonFactory
+from educacion_financiera.apps.discussions.models import Comment
+from educacion_financiera.apps.discussions.models import Discussion
+from educacion_financiera.users.tests.factories import UserFactory
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def lesson(user):
+    lesson = LessonFactory()
+    EnrollmentFactory(student=user, course=lesson.module.course)
+    return lesson
+
+
+@pytest.fixture
+def api(user):
+    client = APIClient()
+    client.force_authenticate(user)
+    return client
+
+
+def _discussion(lesson, **kwargs):
+    return Discussion.objects.create(lesson=lesson, title="Duda", body="Pregunta", created_by=UserFactory(), **kwargs)
+
+
+def test_reply_counters_follow_comments(user, lesson):
+    discussion = _discussion(lesson)
+    first = Comment.objects.create(discussion=discussion, body="Uno", created_by=user)
+    second = Comment.objects.create(discussion=discussion, parent=first, body="Dos", created_by=UserFactory())
+    Comment.objects.create(discussion=discussion, body="Oculto", created_by=user, is_approved=False)
+
+    discussion.refresh_from_db()
+    assert (discussion.reply_count, discussion.last_comment_at, discussion.last_comment_by_id) == (
+        2, second.created, second.created_by_id
+    )
+
+    second.delete()
+    discussion.refresh_from_db()
+    assert (discussion.reply_count, discussion.last_comment_by_id) == (1, user.id)
+
+    first = Comment.objects.get(pk=first.pk)
+    first.is_approved = False
+    first.save()
+    discussion.refresh_from_db()
+    assert (discussion.reply_count, discussion.last_comment_at) == (0, discussion.created)
+
+
+def test_list_orders_by_last_activity(api, lesson, django_assert_max_num_queries):
+    quiet = _discussion(lesson)
+    busy = _discussion(lesson)
+    _discussion(lesson, is_active=False)
+    _discussion(LessonFactory())
+    Comment.objects.create(discussion=quiet, body="Hola", created_by=UserFactory())
+    url = reverse("api:discussions_api:discussion-list")
+
+    with django_assert_max_num_queries(6):
+        response = api.get(url, {"lesson": lesson.id, "page_size": 1})
+    assert [item["id"] for item in response.json()["results"]] == [quiet.id]
+    assert response.json()["results"][0]["reply_count"] == 1
+
+    response = api.get(response.json()["next"])
+    assert [item["id"] for item in response.json()["results"]] == [busy.id]
+    assert response.json()["next"] is None
+    assert api.get(url).status_code == 400
+
+
+def test_create_and_reply(api, user, lesson):
+    response = api.post(
+        reverse("api:discussions_api:discussion-list"), {"lesson": lesson.id, "title": "Interés", "body": "¿Cómo?"}
+    )
+    assert response.status_code == 201
+    discussion_id = response.json()["id"]
+    reply_url = reverse("api:discussions_api:discussion-reply", args=[discussion_id])
+
+    first = api.post(reply_url, {"body": "Así"}).json()
+    response = api.post(reply_url, {"body": "Gracias", "parent": first["id"]})
+    assert response.status_code == 201
+    assert response.json()["depth"] == 1
+    assert api.post(reply_url, {"body": "X", "parent": 0}).status_code == 400
+
+    detail = api.get(reverse("api:discussions_api:discussion-detail", args=[discussion_id])).json()
+    assert detail["reply_count"] == 2
+    assert detail["comments"][0]["replies"][0]["body"] == "Gracias"
+    assert detail["last_comment_by"]["id"] == user.id
+
+
+def test_discussions_require_enrollment(lesson):
+    discussion = _discussion(lesson)
+    api = APIClient()
+    api.force_authenticate(UserFactory())
+
+    assert api.get(reverse("api:discussions_api:discussion-list"), {"lesson": lesson.id}).status_code == 403
+    assert api.get(reverse("api:discussions_api:discussion-detail", args=[discussion.id])).status_code == 403
+    response = api.post(reverse("api:discussions_api:discussion-reply", args=[discussion.id]), {"body": "Hola"})
+    assert response.status_code == 403
+    assert api.post(
+        reverse("api:discussions_api:discussion-list"), {"lesson": lesson.id, "title": "T", "body": "B"}
+    ).status_code == 403
@@ -0,0 +1,177 @@
+import pytest
+from django.urls import reverse
+from redis.exceptions import ConnectionError as RedisConnectionError
+from rest_framework.test import APIClient
+
+from educacion_financiera.apps.courses.tests.factories import EnrollmentFactory
+from educacion_financiera.apps.courses.tests.factories import LessonFactory
+from educacion_financiera.apps.discussions import autosave
+from educacion_financiera.apps.discussions.autosave import LocalNoteBuffer
+from educacion_financiera.apps.discussions.autosave import NoteConflict
+from educacion_financiera.apps.discussions.autosave import apply_patch
+from educacion_financiera.apps.discussions.autosave import flush_notes
+from educacion_financiera.apps.discussions.autosave import load_note
+from educacion_financiera.apps.discussions.autosave import make_patch
+from educacion_financiera.apps.discussions.autosave import note_history
+from educacion_financiera.apps.discussions.autosave import save_note
+from educacion_financiera.apps.discussions.models import Note
+from educacion_financiera.apps.discussions.models import NoteRevision
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def buffer(monkeypatch):
+    buffer = LocalNoteBuffer()
+    monkeypatch.setattr(autosave, "get_buffer", lambda: buffer)
+    return buffer
+
+
+@pytest.fixture
+def lesson(user):
+    lesson = LessonFactory()
+    EnrollmentFactory(student=user, course=lesson.module.course)
+    return lesson
+
+
+@pytest.fixture
+def api(user):
+    client = APIClient()
+    client.force_authenticate(user)
+    return client
+
+
+def test_patches_round_trip():
+    text = "Ahorrar el 10% de los ingresos"
+    target = "Ahorrar el 20% de todos los ingresos cada mes"
+    patch = make_patch(text, target)
+    assert apply_patch(text, patch) == target
+    assert sum(len(replacement) for _start, _end, replacement in patch) < len(target)
+    with pytest.raises(ValueError):
+        apply_patch(text, [[5, 2, "x"]])
+
+
+def test_saves_are_coalesced_into_one_write(user, lesson, buffer, django_assert_max_num_queries):
+    version = 0
+    for length in range(1, 30):
+        version = save_note(user.pk, lesson.pk, content="Presupuesto"[:length % 11 + 1], version=version)
+    assert version == 29
+    assert not Note.objects.exists()
+    assert load_note(user.pk, lesson.pk) == ("Presupuesto"[:29 % 11 + 1], 29)
+
+    with django_assert_max_num_queries(6):
+        assert flush_notes() == 1
+    note = Note.objects.get()
+    assert (note.content, note.version) == ("Presupuesto"[:29 % 11 + 1], 29)
+    assert not buffer.pending
+    assert flush_notes() == 0
+
+
+def test_flushes_keep_compact_history(user, lesson, buffer):
+    save_note(user.pk, lesson.pk, content="Fondo de emergencia", version=0)
+    flush_notes()
+    save_note(user.pk, lesson.pk, changes=[[19, 19, " de seis meses"]], version=1)
+    save_note(user.pk, lesson.pk, changes=[[0, 5, "Un fondo"]], version=2)
+    flush_notes()
+
+    note = Note.objects.get()
+    assert (note.content, note.version) == ("Un fondo de emergencia de seis meses", 3)
+    revision = NoteRevision.objects.get()
+    assert revision.version == 1
+    assert [version for version, _content, _replaced_at in note_history(note)] == [1]
+    assert note_history(note)[0][1] == "Fondo de emergencia"
+
+
+def test_stale_saves_conflict(user, lesson, buffer):
+    save_note(user.pk, lesson.pk, content="Primera", version=0)
+    flush_notes()
+    save_note(user.pk, lesson.pk, content="Segunda", version=1)
+
+    with pytest.raises(NoteConflict) as conflict:
+        save_note(user.pk, lesson.pk, content="Otra ventana", version=1)
+    assert (conflict.value.content, conflict.value.version) == ("Segunda", 2)
+
+
+def test_saves_go_to_the_database_when_redis_is_down(user, lesson, buffer, monkeypatch):
+    def unreachable(*args):
+        raise RedisConnectionError("Connection refused")
+    monkeypatch.setattr(buffer, "get", unreachable)
+    monkeypatch.setattr(buffer, "save", unreachable)
+
+    assert save_note(user.pk, lesson.pk, content="Sin Redis", version=0) == 1
+    assert load_note(user.pk, lesson.pk) == ("Sin Redis", 1)
+    with pytest.raises(NoteConflict):
+        save_note(user.pk, lesson.pk, content="Otra ventana", version=0)
+    assert Note.objects.get(user=user, lesson=lesson).version == 1
+
+
+def test_flush_keeps_saves_made_while_writing(user, lesson, buffer, monkeypatch):
+    save_note(user.pk, lesson.pk, content="Antes", version=0)
+    write_notes = autosave._write_notes
+
+    def save_while_writing(pending):
+        write_notes(pending)
+        save_note(user.pk, lesson.pk, content="Durante", version=1)
+
+    monkeypatch.setattr(autosave, "_write_notes", save_while_writing)
+    flush_notes()
+    assert Note.objects.get().content == "Antes"
+    assert load_note(user.pk, lesson.pk) == ("Durante", 2)
+
+    monkeypatch.setattr(autosave, "_write_notes", write_notes)
+    flush_notes()
+    assert (Note.objects.get().content, Note.objects.get().version) == ("Durante", 2)
+
+
+def test_autosave_api(api, lesson, buffer):
+    url = reverse("api:discussions_api:note-autosave", args=[lesson.pk])
+    assert api.get(url).json() == {"content": "", "version": 0}
+
+    response = api.put(url, {"version": 0, "content": "Gastos fijos"}, format="json")
+    assert response.json() == {"version": 1}
+    response = api.put(url, {"version": 1, "changes": [{"start": 12, "end": 12, "text": " y variables"}]}, format="json")
+    assert response.json() == {"version": 2}
+    assert api.get(url).json() == {"content": "Gastos fijos y variables", "version": 2}
+
+    response = api.put(url, {"version": 1, "content": "Vieja"}, format="json")
+    assert response.status_code == 409
+    assert response.json()["version"] == 2
+
+    assert api.put(url, {"version": 2, "content": "a", "changes": []}, format="json").status_code == 400
+    response = api.put(url, {"version": 2, "changes": [{"start": 90, "end": 95, "text": ""}]}, format="json")
+    assert response.status_code == 400
+
+    flush_notes()
+    api.put(url, {"version": 2, "content": "Gastos"}, format="json")
+    flush_notes()
+    history = api.get(reverse("api:discussions_api:note-history", args=[lesson.pk])).json()
+    assert history["version"] == 3
+    assert [version["content"] for version in history["versions"]] == ["Gastos fijos y variables"]
+
+
+def test_autosave_requires_enrollment(api, buffer):
+    url = reverse("api:discussions_api:note-autosave", args=[LessonFactory().pk])
+    assert api.get(url).status_code == 403
+    assert api.put(url, {"version": 0, "content": "Hola"}, format="json").status_code == 403
+
+
+def test_lesson_page_form_saves_through_buffer(client, settings, user, lesson, buffer):
+    settings.NOTE_MAX_LENGTH = 10
+    client.force_login(user)
+    url = reverse("courses:lesson_detail", args=[lesson.module.course.slug, lesson.module_id, lesson.pk])
+
+    response = client.post(url, {"action": "save_note", "note_content": "Demasiado larga"}, follow=True)
+    assert response.status_code == 200
+    assert [message.level_tag for message in response.context["messages"]] == ["error"]
+    assert load_note(user.pk, lesson.pk) == ("", 0)
+
+    client.post(url, {"action": "save_note", "note_content": "Corta"})
+    assert load_note(user.pk, lesson.pk) == ("Corta", 1)
+
+    def conflict(user_id, lesson_id, edit):
+        raise NoteConflict("Otra", 5)
+
+    buffer.save = conflict
+    response = client.post(url, {"action": "save_note", "note_content": "Nueva"}, follow=True)
+    assert response.status_code == 200
+    assert [message.level_tag for message in response.context["messages"]][-1] == "error"
@@ -0,0 +1,106 @@
+from datetime import timedelta
+
+import pytest
+from django.urls import reverse
+from django.utils import timezone
+
+from educacion_financiera.apps.courses.tests.factories import LessonFactory
+from educacion_financiera.apps.discussions.models import Comment
+from educacion_financiera.apps.discussions.models import CommentModeration
+from educacion_financiera.apps.discussions.models import Discussion
+from educacion_financiera.apps.discussions.moderation import moderate_pending
+from educacion_financiera.apps.discussions.moderation import set_approval
+from educacion_financiera.apps.discussions.tree import lesson_comment_threads
+from educacion_financiera.apps.profiles.models import Profile
+from educacion_financiera.users.tests.factories import UserFactory
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def lesson():
+    return LessonFactory()
+
+
+def test_checks_flag_comments_in_batches(settings, user, lesson, django_assert_max_num_queries):
+    settings.COMMENT_MODERATION_BANNED_WORDS = ["estafa"]
+    settings.COMMENT_MODERATION_HOURLY_LIMIT = 4
+    bodies = [
+        "Muy buena lección",
+        "Visita http://a.com http://b.com http://c.com",
+        "Esto es una ESTAFA",
+        "COMPREN AHORA MISMO ESTE CURSO INCREIBLE",
+    ]
+    comments = [Comment.objects.create(lesson=lesson, body=body, created_by=user) for body in bodies]
+    # The fifth comment within the hour goes over the limit
+    spammer = UserFactory()
+    posts = [Comment.objects.create(lesson=lesson, body=f"Hola {number}", created_by=spammer) for number in range(5)]
+
+    with django_assert_max_num_queries(10):
+        result = moderate_pending()
+
+    assert result == {"approved": 5, "flagged": 4}
+    reasons = dict(CommentModeration.objects.filter(comment__in=comments).values_list("comment", "reasons"))
+    assert [reasons[comment.pk] for comment in comments] == [[], ["links"], ["banned_words"], ["spam"]]
+    assert CommentModeration.objects.get(comment=posts[-1]).reasons == ["rate"]
+    assert set(Comment.objects.filter(is_approved=True).values_list("pk", flat=True)) == {
+        comments[0].pk, *[post.pk for post in posts[:-1]]
+    }
+    assert moderate_pending() == {"approved": 0, "flagged": 0}
+
+
+def test_rate_counts_the_hour_before_each_comment(settings, user, lesson):
+    settings.COMMENT_MODERATION_HOURLY_LIMIT = 3
+    comments = [Comment.objects.create(lesson=lesson, body=f"Hola {number}", created_by=user) for number in range(6)]
+    # Three comments two hours ago and three now stay within the limit of each hour
+    Comment.objects.filter(pk__in=[comment.pk for comment in comments[:3]]).update(
+        created=timezone.now() - timedelta(hours=2)
+    )
+    assert moderate_pending() == {"approved": 6, "flagged": 0}
+
+    latest = Comment.objects.create(lesson=lesson, body="Otra vez", created_by=user)
+    assert moderate_pending() == {"approved": 0, "flagged": 1}
+    assert CommentModeration.objects.get(comment=latest).reasons == ["rate"]
+
+
+def test_bulk_approval_recounts_and_invalidates(user, lesson, django_assert_num_queries):
+    discussion = Discussion.objects.create(lesson=lesson, title="Duda", body="?", created_by=user)
+    replies = [Comment.objects.create(discussion=discussion, body="Sí", created_by=user) for _ in range(3)]
+    comment = Comment.objects.create(lesson=lesson, body="Hola", created_by=user)
+    assert len(lesson_comment_threads(lesson)[0]) == 1
+
+    assert Profile.objects.get(user=user).community_posts == 5
+
+    with django_assert_num_queries(9):
+        count = set_approval(Comment.objects.filter(created_by=user), approved=False)
+
+    assert count == 4
+    assert Profile.objects.get(user=user).community_posts == 1
+    discussion.refresh_from_db()
+    assert discussion.reply_count == 0
+    assert lesson_comment_threads(lesson) == ([], None)
+    assert set(CommentModeration.objects.values_list("status", flat=True)) == {"rejected"}
+
+    set_approval(Comment.objects.filter(pk__in=[replies[0].pk, comment.pk]), approved=True)
+    discussion.refresh_from_db()
+    assert discussion.reply_count == 1
+    assert Profile.objects.get(user=user).community_posts == 3
+    set_approval(Comment.objects.filter(pk=comment.pk), approved=True)
+    assert Profile.objects.get(user=user).community_posts == 3
+    assert [thread.pk for thread in lesson_comment_threads(lesson)[0]] == [comment.pk]
+
+
+def test_admin_bulk_actions(admin_client, user, lesson):
+    comments = [Comment.objects.create(lesson=lesson, body="Hola", created_by=user) for _ in range(3)]
+
+    response = admin_client.post(reverse("admin:discussions_commentmoderation_changelist"), {
+        "action": "reject_comments",
+        "_selected_action": list(CommentModeration.objects.values_list("pk", flat=True)[:2]),
+    })
+
+    assert response.status_code == 302
+    assert Comment.objects.filter(is_approved=False).count() == 2
+    response = admin_client.post(reverse("admin:discussions_comment_changelist"), {
+        "action": "approve_comments", "_selected_action": [comment.pk for comment in comments],
+    })
+    assert Comment.objects.filter(is_approved=True).count() == 3
@@ -0,0 +1,112 @@
+import io
+import zipfile
+
+import pytest
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from educacion_financiera.apps.courses.tests.factories import CourseFactory
+from educacion_financiera.apps.courses.tests.factories import LessonFactory
+from educacion_financiera.apps.courses.tests.factories import ModuleFactory
+from educacion_financiera.apps.discussions.models import Note
+from educacion_financiera.apps.discussions.notes import group_notes
+from educacion_financiera.apps.discussions.notes import search_notes
+from educacion_financiera.apps.discussions.notes import user_notes
+from educacion_financiera.users.tests.factories import UserFactory
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def notes(user):
+    """Two courses, the first with two modules, and a note on each lesson"""
+    first = CourseFactory(title="Ahorro")
+    second = CourseFactory(title="Inversión")
+    modules = [
+        ModuleFactory(course=first, title="Presupuesto", order=1),
+        ModuleFactory(course=first, title="Deudas", order=2),
+        ModuleFactory(course=second, title="Bolsa", order=1),
+    ]
+    contents = ["Regla 50/30/20", "Pagar primero la deuda más cara", "Diversificar la cartera"]
+    notes = [
+        Note.objects.create(user=user, lesson=LessonFactory(module=module, title=f"Lección {module.title}"),
+                            content=content)
+        for module, content in zip(modules, contents)
+    ]
+    # Neither notes of other users nor cleared notes are listed
+    Note.objects.create(user=UserFactory(), lesson=notes[0].lesson, content="Ajena")
+    Note.objects.create(user=user, lesson=LessonFactory(module=modules[0]), content="")
+    return notes
+
+
+def test_notes_are_grouped_by_course_and_module(user, notes, django_assert_num_queries):
+    with django_assert_num_queries(1):
+        groups = group_notes(user_notes(user))
+    assert [(course.title, [module.title for module, _notes in modules]) for course, modules in groups] == [
+        ("Ahorro", ["Presupuesto", "Deudas"]),
+        ("Inversión", ["Bolsa"]),
+    ]
+    assert [note for _course, modules in groups for _module, module_notes in modules for note in module_notes] == notes
+
+    assert list(search_notes(user_notes(user), "deuda")) == [notes[1]]
+    assert list(search_notes(user_notes(user), " ")) == notes
+
+
+def test_notes_api(user, notes):
+    api = APIClient()
+    api.force_authenticate(user)
+    response = api.get(reverse("api:discussions_api:note-list"), {"q": "cartera"})
+    assert response.json()["courses"] == [{
+        "id": notes[2].lesson.module.course_id,
+        "title": "Inversión",
+        "modules": [{
+            "id": notes[2].lesson.module_id,
+            "title": "Bolsa",
+            "notes": [{
+                "lesson": notes[2].lesson_id,
+                "lesson_title": "Lección Bolsa",
+                "snippet": "Diversificar la cartera",
+                "version": 0,
+                "modified": response.json()["courses"][0]["modules"][0]["notes"][0]["modified"],
+            }],
+        }],
+    }]
+
+
+def test_notes_page(client, user, notes, django_assert_max_num_queries):
+    client.force_login(user)
+    client.get(reverse("dashboard:notes"))
+    with django_assert_max_num_queries(12):
+        response = client.get(reverse("dashboard:notes"))
+    assert [course.title for course, _modules in response.context["note_groups"]] == ["Ahorro", "Inversión"]
+    assert len(response.context["recent_notes"]) == 3
+
+    response = client.get(reverse("dashboard:notes"), {"q": "regla"})
+    assert [note.lesson_id for note in response.context["notes"]] == [notes[0].lesson_id]
+    assert b"Regla 50/30/20" in response.content
+
+
+def test_markdown_export(client, user, notes):
+    client.force_login(user)
+    response = client.get(reverse("dashboard:notes_export"))
+    assert response.streaming
+    assert response["Content-Disposition"].endswith('.md"')
+    markdown = b"".join(response.streaming_content).decode()
+    headings = [line for line in markdown.splitlines() if line.startswith("#")]
+    assert headings == [
+        "# Mis notas",
+        "## Ahorro", "### Presupuesto", "#### Lección Presupuesto", "### Deudas", "#### Lección Deudas",
+        "## Inversión", "### Bolsa", "#### Lección Bolsa",
+    ]
+    assert "Ajena" not in markdown
+
+
+def test_zip_export(client, user, notes):
+    client.force_login(user)
+    response = client.get(reverse("dashboard:notes_export"), {"format": "zip", "q": "deuda"})
+    assert response["Content-Type"] == "application/zip"
+    archive = zipfile.ZipFile(io.BytesIO(b"".join(response.streaming_content)))
+    lesson = notes[1].lesson
+    name = f"{lesson.module.course.slug}/02-deudas/{lesson.order:02d}-{lesson.pk}-leccion-deudas.md"
+    assert archive.namelist() == [name]
+    assert "Pagar primero la deuda más cara" in archive.read(name).decode()
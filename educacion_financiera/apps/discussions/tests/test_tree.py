@@ -0,0 +1,103 @@
+import pytest
+from django.urls import reverse
+
+from educacion_financiera.apps.courses.tests.factories import EnrollmentFactory
+from educacion_financiera.apps.courses.tests.factories import LessonFactory
+from educacion_financiera.apps.discussions.models import Comment
+from educacion_financiera.apps.discussions.tree import comment_threads
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def lesson():
+    return LessonFactory()
+
+
+def _comment(user, lesson, parent=None, **kwargs):
+    return Comment.objects.create(created_by=user, lesson=lesson, parent=parent, body="Comentario", **kwargs)
+
+
+def test_paths_follow_the_thread(user, lesson):
+    root = _comment(user, lesson)
+    reply = _comment(user, lesson, root)
+    nested = _comment(user, lesson, reply)
+    other = _comment(user, lesson)
+
+    assert nested.path == f"{root.pk:010d}/{reply.pk:010d}/{nested.pk:010d}/"
+    assert (root.depth, reply.depth, nested.depth) == (0, 1, 2)
+
+    # Moving a reply rebases its own replies
+    reply = Comment.objects.get(pk=reply.pk)
+    reply.parent = other
+    reply.save()
+    nested.refresh_from_db()
+    assert nested.path == f"{other.pk:010d}/{reply.pk:010d}/{nested.pk:010d}/"
+
+    other = Comment.objects.get(pk=other.pk)
+    other.parent = nested
+    with pytest.raises(ValueError):
+        other.save()
+
+
+def test_replies_past_the_maximum_depth_stay_at_the_last_level(user, lesson):
+    comment = _comment(user, lesson)
+    for _ in range(Comment.MAX_DEPTH + 2):
+        comment = _comment(user, lesson, comment)
+    assert comment.depth == Comment.MAX_DEPTH - 1
+
+
+def test_moved_threads_keep_their_replies_within_the_maximum_depth(user, lesson):
+    deep = [_comment(user, lesson)]
+    for _ in range(Comment.MAX_DEPTH - 1):
+        deep.append(_comment(user, lesson, deep[-1]))
+    moved = _comment(user, lesson)
+    replies = [_comment(user, lesson, moved)]
+    replies.append(_comment(user, lesson, replies[-1]))
+
+    moved = Comment.objects.get(pk=moved.pk)
+    moved.parent = deep[-1]
+    moved.save()
+
+    # Two levels of replies fit under the comment at depth MAX_DEPTH - 4
+    assert moved.parent == deep[Comment.MAX_DEPTH - 4]
+    assert moved.depth == Comment.MAX_DEPTH - 3
+    replies[-1].refresh_from_db()
+    assert replies[-1].depth == Comment.MAX_DEPTH - 1
+    assert replies[-1].path == (
+        deep[Comment.MAX_DEPTH - 4].path + f"{moved.pk:010d}/{replies[0].pk:010d}/{replies[1].pk:010d}/"
+    )
+
+
+def test_threads_are_loaded_in_two_queries(user, lesson, django_assert_num_queries):
+    roots = [_comment(user, lesson) for _ in range(3)]
+    first_reply = _comment(user, lesson, roots[0])
+    _comment(user, lesson, first_reply)
+    hidden = _comment(user, lesson, roots[1], is_approved=False)
+    _comment(user, lesson, hidden)
+    _comment(user, LessonFactory())
+
+    comments = Comment.objects.filter(lesson=lesson, is_approved=True)
+    with django_assert_num_queries(2):
+        threads, cursor = comment_threads(comments, limit=2)
+        assert threads[0].children[0].children[0].created_by.name == user.name
+
+    assert [thread.pk for thread in threads] == [roots[0].pk, roots[1].pk]
+    assert threads[1].children == []
+    assert cursor == roots[1].pk
+    threads, cursor = comment_threads(comments, after=cursor, limit=2)
+    assert ([thread.pk for thread in threads], cursor) == ([roots[2].pk], None)
+
+
+def test_lesson_page_renders_replies(client, user, lesson):
+    EnrollmentFactory(student=user, course=lesson.module.course)
+    root = _comment(user, lesson)
+    Comment.objects.create(created_by=user, lesson=lesson, parent=root, body="Respuesta anidada")
+    client.force_login(user)
+
+    response = client.get(
+        reverse("courses:lesson_detail", args=[lesson.module.course.slug, lesson.module_id, lesson.pk])
+    )
+
+    assert response.status_code == 200
+    assert "Respuesta anidada" in response.content.decode()
@@ -0,0 +1,84 @@
+"""
+Threaded comment trees.
+
+Every comment stores its materialized ``path`` (see Comment.save), so a
+thread is a path range and ordering by path lists it depth first. A page of
+threads is loaded with one query for its top-level comment ids and one
+ordered query for every comment of those threads, with authors and profiles
+joined, and is assembled into a tree in memory. The first page of a lesson
+is cached until its comments change.
+"""
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import path_segment
+
+THREADS_PER_PAGE = 20
+LESSON_COMMENTS_CACHE_KEY = "discussions:lesson_comments:{lesson_id}"
+
+
+def invalidate_lesson_comments(lesson_ids):
+    """Drop the cached comment threads of lessons"""
+    cache.delete_many([
+        LESSON_COMMENTS_CACHE_KEY.format(lesson_id=lesson_id) for lesson_id in lesson_ids if lesson_id
+    ])
+
+
+def build_tree(comments):
+    """
+    Attach comments, ordered by path, to their parents as ``children`` and
+    return the top-level ones. Replies to hidden comments are left out.
+    """
+    by_id = {}
+    roots = []
+    for comment in comments:
+        comment.children = []
+        by_id[comment.pk] = comment
+        if comment.parent_id is None:
+            roots.append(comment)
+        elif comment.parent_id in by_id:
+            by_id[comment.parent_id].children.append(comment)
+        else:
+            # Hidden parent: forgetting the reply hides its own replies too
+            del by_id[comment.pk]
+    return roots
+
+
+def comment_threads(comments, after=None, limit=THREADS_PER_PAGE):
+    """
+    Load a page of threads of a comment queryset, paginated by top-level
+    comment. Returns the threads and the cursor of the next page, if any.
+    """
+    try:
+        after = int(after) if after else None
+    except (TypeError, ValueError):
+        after = None
+    roots = comments.filter(parent__isnull=True).order_by("pk")
+    if after:
+        roots = roots.filter(pk__gt=after)
+    root_ids = list(roots.values_list("pk", flat=True)[:limit + 1])
+    if not root_ids:
+        return [], None
+    has_next = len(root_ids) > limit
+    root_ids = root_ids[:limit]
+
+    # Roots have consecutive ids within the page, so their threads are one path range
+    threads = comments.filter(
+        path__gte=path_segment(root_ids[0]),
+        path__lt=path_segment(root_ids[-1] + 1),
+    ).select_related("created_by", "created_by__profile").order_by("path")
+    return build_tree(threads), root_ids[-1] if has_next else None
+
+
+def lesson_comment_threads(lesson, after=None):
+    """A page of the approved comment threads of a lesson, the first one cached"""
+    comments = lesson.comments.filter(is_approved=True)
+    if after:
+        return comment_threads(comments, after=after)
+
+    key = LESSON_COMMENTS_CACHE_KEY.format(lesson_id=lesson.pk)
+    page = cache.get(key)
+    if page is None:
+        page = comment_threads(comments)
+        cache.set(key, page, settings.LESSON_COMMENTS_CACHE_TIMEOUT)
+    return page
@@ -1,11 +1,15 @@
 from django.contrib import admin
+from django.db import transaction
 from django.utils.translation import gettext_lazy as _
 
-from .models import Payment
+from educacion_financiera.exports import ExportMixin
+
+from .models import Payment, StripeEvent
+from .tasks import process_stripe_event
 
 
 @admin.register(Payment)
-class PaymentAdmin(admin.ModelAdmin):
+class PaymentAdmin(ExportMixin, admin.ModelAdmin):
     list_display = [
         "provider_payment_id",
         "user",
@@ -16,7 +20,7 @@ class PaymentAdmin(admin.ModelAdmin):
         "provider",
         "created"
     ]
-    list_filter = ["status", "payment_type", "provider", "created"]
+    list_filter = ["status", "payment_type", "provider", "created", "course"]
     search_fields = [
         "provider_payment_id",
         "provider_transaction_id",
@@ -25,6 +29,20 @@ class PaymentAdmin(admin.ModelAdmin):
     readonly_fields = ["created", "modified"]
     date_hierarchy = "created"
     raw_id_fields = ["user", "subscription", "course"]
+    export_columns = [
+        ("id", "id"),
+        ("provider_payment_id", "provider_payment_id"),
+        ("user_id", "user_id"),
+        ("user_email", "user__email"),
+        ("payment_type", "payment_type"),
+        ("amount", "amount"),
+        ("currency", "currency"),
+        ("status", "status"),
+        ("provider", "provider"),
+        ("course_id", "course_id"),
+        ("subscription_id", "subscription_id"),
+        ("created", "created"),
+    ]
     fieldsets = (
         (None, {
             "fields": (
@@ -48,3 +66,24 @@ class PaymentAdmin(admin.ModelAdmin):
             "fields": ("metadata", "created", "modified")
         }),
     )
+
+
+@admin.register(StripeEvent)
+class StripeEventAdmin(admin.ModelAdmin):
+    list_display = ["event_id", "type", "status", "attempts", "next_attempt_at", "created"]
+    list_filter = ["status", "type", "created"]
+    search_fields = ["event_id", "last_error"]
+    readonly_fields = [
+        "event_id", "type", "payload", "attempts", "last_error",
+        "next_attempt_at", "processed_at", "created", "modified"
+    ]
+    date_hierarchy = "created"
+    actions = ["requeue_events"]
+
+    @admin.action(description=_("Retry selected events"))
+    def requeue_events(self, request, queryset):
+        events = list(queryset.exclude(status="processed"))
+        for event in events:
+            event.requeue()
+            transaction.on_commit(lambda pk=event.pk: process_stripe_event.delay(pk))
+        self.message_user(request, _("%(count)d events queued for processing.") % {"count": len(events)})
@@ -0,0 +1,165 @@
+"""
+Stripe Checkout Session service.
+
+Sessions are created on an explicit POST and reused while they are open, so
+reloading the checkout page neither calls Stripe nor piles up pending
+payments. The pending Payment row is the source of truth. Checkouts of a
+user are serialized on their user row, so double submits and parallel tabs
+wait for the first session and reuse it instead of opening another.
+"""
+from datetime import timedelta
+
+import stripe
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.urls import reverse
+from django.utils import timezone
+
+from educacion_financiera.apps.subscriptions.models import Subscription
+
+from .models import Payment
+
+# One pooled HTTP client per process with bounded timeouts and retries
+stripe.api_key = settings.STRIPE_SECRET_KEY
+stripe.max_network_retries = settings.STRIPE_MAX_NETWORK_RETRIES
+stripe.default_http_client = stripe.http_client.RequestsClient(timeout=settings.STRIPE_TIMEOUT)
+
+
+def _lock_user(user):
+    """Serialize the checkouts of a user until the transaction ends"""
+    get_user_model().objects.select_for_update().only("pk").get(pk=user.pk)
+
+
+def _open_payment(user, payment_type, object_id):
+    """Pending payment whose Checkout Session can still be used, if any"""
+    # Leave the customer some minutes to fill in the payment form
+    usable_until = timezone.now() + timedelta(minutes=5)
+    payments = Payment.objects.filter(
+        user=user,
+        provider="stripe",
+        status="pending",
+        expires_at__gt=usable_until
+    )
+    if payment_type == "course":
+        payments = payments.filter(payment_type="course", course_id=object_id)
+    else:
+        payments = payments.filter(
+            payment_type="subscription",
+            subscription__subscription_type_id=object_id
+        )
+    return payments.order_by("-expires_at").first()
+
+
+def _create_session(request, name, description, amount, client_reference_id, metadata, expires_at):
+    return stripe.checkout.Session.create(
+        payment_method_types=["card"],
+        line_items=[
+            {
+                "price_data": {
+                    "currency": "usd",
+                    "product_data": {
+                        "name": name,
+                        "description": description,
+                    },
+                    "unit_amount": int(amount * 100),  # Convert to cents
+                },
+                "quantity": 1,
+            },
+        ],
+        mode="payment",
+        success_url=request.build_absolute_uri(reverse("payments:payment_success")),
+        cancel_url=request.build_absolute_uri(reverse("payments:payment_cancel")),
+        client_reference_id=client_reference_id,
+        customer_email=request.user.email,
+        metadata=metadata,
+        expires_at=int(expires_at.timestamp()),
+    )
+
+
+@transaction.atomic
+def get_or_create_course_checkout(request, course):
+    """Reuse the open checkout of the user for a course or start a new one"""
+    _lock_user(request.user)
+    payment = _open_payment(request.user, "course", course.id)
+    if payment:
+        return payment
+
+    expires_at = timezone.now() + timedelta(seconds=settings.STRIPE_CHECKOUT_SESSION_TTL)
+    checkout_session = _create_session(
+        request,
+        name=course.title,
+        description=f"Enrollment in {course.title}",
+        amount=course.price,
+        client_reference_id=f"course_{course.id}_{request.user.id}",
+        metadata={
+            "payment_type": "course",
+            "course_id": course.id,
+            "user_id": request.user.id,
+        },
+        expires_at=expires_at,
+    )
+
+    payment = Payment.objects.create(
+        user=request.user,
+        payment_type="course",
+        amount=course.price,
+        status="pending",
+        provider="stripe",
+        provider_payment_id=checkout_session.id,
+        course=course,
+        expires_at=expires_at,
+        metadata={
+            "session_id": checkout_session.id,
+            "course_id": course.id,
+        }
+    )
+    return payment
+
+
+@transaction.atomic
+def get_or_create_subscription_checkout(request, subscription_type):
+    """Reuse the open checkout of the user for a plan or start a new one"""
+    _lock_user(request.user)
+    payment = _open_payment(request.user, "subscription", subscription_type.id)
+    if payment:
+        return payment
+
+    expires_at = timezone.now() + timedelta(seconds=settings.STRIPE_CHECKOUT_SESSION_TTL)
+    checkout_session = _create_session(
+        request,
+        name=subscription_type.name,
+        description=subscription_type.description,
+        amount=subscription_type.price,
+        client_reference_id=f"subscription_{subscription_type.id}_{request.user.id}",
+        metadata={
+            "payment_type": "subscription",
+            "subscription_type_id": subscription_type.id,
+            "user_id": request.user.id,
+            "duration_days": subscription_type.duration_days,
+        },
+        expires_at=expires_at,
+    )
+
+    # Create a subscription record (pending)
+    subscription = Subscription.objects.create(
+        user=request.user,
+        subscription_type=subscription_type,
+        status="pending",
+    )
+    payment = Payment.objects.create(
+        user=request.user,
+        payment_type="subscription",
+        amount=subscription_type.price,
+        status="pending",
+        provider="stripe",
+        provider_payment_id=checkout_session.id,
+        subscription=subscription,
+        expires_at=expires_at,
+        metadata={
+            "session_id": checkout_session.id,
+            "subscription_type_id": subscription_type.id,
+            "duration_days": subscription_type.duration_days,
+        }
+    )
+    return payment
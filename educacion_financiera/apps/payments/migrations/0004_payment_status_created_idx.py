@@ -0,0 +1,21 @@
+# Generated by Django 5.1.9 on 2026-10-18 11:10
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0008_analytics_indexes'),
+        ('payments', '0003_payment_checkout_expiry'),
+        ('subscriptions', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['status', 'created'], name='payments_pa_status_540537_idx'),
+        ),
+    ]
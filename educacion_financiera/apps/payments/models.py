@@ -1,5 +1,8 @@
+from datetime import timedelta
+
 from django.conf import settings
 from django.db import models
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
 from educacion_financiera.apps.courses.models import Course
@@ -15,6 +18,7 @@ class Payment(models.Model):
         ("completed", _("Completed")),
         ("failed", _("Failed")),
         ("refunded", _("Refunded")),
+        ("expired", _("Expired")),
     )
 
     PAYMENT_TYPE_CHOICES = (
@@ -76,6 +80,9 @@ class Payment(models.Model):
         blank=True
     )
 
+    # When the provider checkout session stops accepting payments
+    expires_at = models.DateTimeField(_("Expires At"), null=True, blank=True)
+
     created = models.DateTimeField(_("Created"), auto_now_add=True)
     modified = models.DateTimeField(_("Modified"), auto_now=True)
 
@@ -86,6 +93,11 @@ class Payment(models.Model):
         verbose_name = _("Payment")
         verbose_name_plural = _("Payments")
         ordering = ["-created"]
+        indexes = [
+            models.Index(fields=["user", "status", "payment_type"]),
+            models.Index(fields=["status", "expires_at"]),
+            models.Index(fields=["status", "created"]),
+        ]
 
     def __str__(self):
         return f"Payment {self.provider_payment_id} by {self.user.email} ({self.status})"
@@ -97,3 +109,92 @@ class Payment(models.Model):
         if self.payment_type == "course" and not self.course:
             raise ValueError("Course payment must have a course reference")
         super().save(*args, **kwargs)
+
+
+class StripeEventQuerySet(models.QuerySet):
+    def due(self, now=None):
+        """Events waiting to be processed or retried"""
+        now = now or timezone.now()
+        return self.filter(
+            status__in=StripeEvent.DUE_STATUSES,
+            next_attempt_at__lte=now
+        )
+
+
+class StripeEvent(models.Model):
+    """
+    Raw Stripe webhook event, stored once per Stripe event id and processed
+    asynchronously by the Celery workers
+    """
+    STATUS_CHOICES = (
+        ("pending", _("Pending")),
+        ("failed", _("Failed")),
+        ("processed", _("Processed")),
+        ("dead", _("Dead letter")),
+    )
+    DUE_STATUSES = ("pending", "failed")
+    MAX_ATTEMPTS = 5
+    RETRY_BASE_DELAY = 30  # seconds, doubled after every failed attempt
+
+    event_id = models.CharField(_("Stripe Event ID"), max_length=255, unique=True)
+    type = models.CharField(_("Type"), max_length=100)
+    payload = models.JSONField(_("Payload"))
+    status = models.CharField(
+        _("Status"),
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default="pending"
+    )
+    attempts = models.PositiveIntegerField(_("Attempts"), default=0)
+    last_error = models.TextField(_("Last Error"), blank=True)
+    next_attempt_at = models.DateTimeField(_("Next Attempt"), default=timezone.now)
+    processed_at = models.DateTimeField(_("Processed At"), null=True, blank=True)
+    created = models.DateTimeField(_("Created"), auto_now_add=True)
+    modified = models.DateTimeField(_("Modified"), auto_now=True)
+
+    objects = StripeEventQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = _("Stripe Event")
+        verbose_name_plural = _("Stripe Events")
+        ordering = ["-created"]
+        indexes = [
+            models.Index(fields=["status", "next_attempt_at"]),
+        ]
+
+    def __str__(self):
+        return f"{self.type} {self.event_id} ({self.status})"
+
+    @property
+    def data_object(self):
+        """The Stripe object the event is about"""
+        return self.payload.get("data", {}).get("object", {})
+
+    def retry_delay(self):
+        """Seconds to wait before the next attempt"""
+        return self.RETRY_BASE_DELAY * 2 ** max(self.attempts - 1, 0)
+
+    def mark_processed(self):
+        self.status = "processed"
+        self.attempts += 1
+        self.last_error = ""
+        self.processed_at = timezone.now()
+        self.save(update_fields=["status", "attempts", "last_error", "processed_at", "modified"])
+
+    def mark_failed(self, error):
+        """Record a failed attempt, moving the event to the dead letter state when out of attempts"""
+        self.attempts += 1
+        self.last_error = str(error)
+        if self.attempts >= self.MAX_ATTEMPTS:
+            self.status = "dead"
+        else:
+            self.status = "failed"
+            self.next_attempt_at = timezone.now() + timedelta(seconds=self.retry_delay())
+        self.save(update_fields=["status", "attempts", "last_error", "next_attempt_at", "modified"])
+
+    def requeue(self):
+        """Give a dead or failed event a fresh set of attempts"""
+        self.status = "pending"
+        self.attempts = 0
+        self.next_attempt_at = timezone.now()
+        self.save(update_fields=["status", "attempts", "next_attempt_at", "modified"])
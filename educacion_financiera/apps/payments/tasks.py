@@ -0,0 +1,93 @@
+import logging
+from datetime import timedelta
+
+from celery import shared_task
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from educacion_financiera.apps.subscriptions.models import Subscription
+
+from .models import Payment, StripeEvent
+from .webhooks import handle_event
+
+logger = logging.getLogger(__name__)
+
+
+def process_event(event_id):
+    """
+    Process a stored event unless another worker holds it or it is already
+    done. Returns the event, or None when there was nothing to do.
+    """
+    with transaction.atomic():
+        event = StripeEvent.objects.select_for_update(skip_locked=True).filter(
+            pk=event_id,
+            status__in=StripeEvent.DUE_STATUSES
+        ).first()
+        if event is None:
+            return None
+
+        try:
+            handle_event(event)
+        except Exception as exc:
+            logger.exception("Stripe event %s failed", event.event_id)
+            event.mark_failed(exc)
+        else:
+            event.mark_processed()
+    return event
+
+
+@shared_task(bind=True, max_retries=StripeEvent.MAX_ATTEMPTS)
+def process_stripe_event(self, event_id):
+    """Process a webhook event, retrying with exponential backoff"""
+    event = process_event(event_id)
+    if event is not None and event.status == "failed":
+        raise self.retry(countdown=event.retry_delay())
+    return event.status if event else None
+
+
+@shared_task()
+def process_due_stripe_events(batch_size=100):
+    """
+    Sweep events whose task was lost or whose retry is due, in batches
+    """
+    event_ids = list(
+        StripeEvent.objects.due().order_by("next_attempt_at").values_list("pk", flat=True)[:batch_size]
+    )
+    processed = 0
+    for event_id in event_ids:
+        event = process_event(event_id)
+        if event is not None and event.status == "processed":
+            processed += 1
+    return processed
+
+
+@shared_task()
+def expire_stale_checkouts():
+    """
+    Expire pending payments whose checkout session can no longer be paid and
+    purge expired ones past the retention period, with their pending
+    subscriptions
+    """
+    now = timezone.now()
+    # Payments created before sessions had an expiry use Stripe's 24h default
+    expired = Payment.objects.filter(status="pending").filter(
+        Q(expires_at__lte=now) | Q(expires_at__isnull=True, created__lte=now - timedelta(days=1))
+    ).update(status="expired", modified=now)
+    Subscription.objects.filter(
+        status="pending",
+        payments__status="expired"
+    ).update(status="cancelled", modified=now)
+
+    purgeable = Payment.objects.filter(
+        status="expired",
+        modified__lte=now - timedelta(days=settings.EXPIRED_PAYMENT_RETENTION_DAYS)
+    )
+    subscription_ids = list(purgeable.filter(
+        subscription__status="cancelled",
+        subscription__start_date__isnull=True
+    ).values_list("subscription_id", flat=True))
+    purged, deleted = purgeable.delete()
+    Subscription.objects.filter(pk__in=subscription_ids, payments__isnull=True).delete()
+    return {"expired": expired, "purged": purged}
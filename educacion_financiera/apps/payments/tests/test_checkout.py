@@ -0,0 +1,87 @@
+from datetime import timedelta
+from types import SimpleNamespace
+
+import pytest
+from django.core.cache import cache
+from django.urls import reverse
+from django.utils import timezone
+
+from educacion_financiera.apps.courses.tests.factories import CourseFactory
+from educacion_financiera.apps.payments import checkout
+from educacion_financiera.apps.payments.models import Payment
+from educacion_financiera.apps.payments.tasks import expire_stale_checkouts
+from educacion_financiera.apps.subscriptions.models import Subscription
+from educacion_financiera.apps.subscriptions.models import SubscriptionType
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def stripe_sessions(monkeypatch):
+    created = []
+
+    def create(**kwargs):
+        session = SimpleNamespace(id=f"cs_test_{len(created)}", **kwargs)
+        created.append(session)
+        return session
+
+    monkeypatch.setattr(checkout.stripe.checkout.Session, "create", create)
+    return created
+
+
+class TestCourseCheckout:
+    def test_get_does_not_call_stripe(self, client, user, stripe_sessions):
+        client.force_login(user)
+        course = CourseFactory(price=10)
+
+        response = client.get(reverse("payments:course_checkout", kwargs={"course_slug": course.slug}))
+
+        assert response.status_code == 200
+        assert stripe_sessions == []
+        assert not Payment.objects.exists()
+
+    def test_open_session_is_reused(self, client, user, stripe_sessions):
+        client.force_login(user)
+        course = CourseFactory(price=10)
+        url = reverse("payments:course_checkout", kwargs={"course_slug": course.slug})
+
+        first = client.post(url).json()
+        second = client.post(url).json()
+
+        assert first == second == {"checkout_session_id": "cs_test_0"}
+        assert len(stripe_sessions) == 1
+        assert Payment.objects.get().expires_at is not None
+
+
+def test_open_subscription_session_is_found_without_the_cache(client, user, stripe_sessions):
+    client.force_login(user)
+    plan = SubscriptionType.objects.create(
+        name="Premium", description="Todo el catálogo", price=10, duration_days=30, features="Cursos"
+    )
+    url = reverse("payments:subscription_checkout", kwargs={"subscription_type_id": plan.id})
+
+    first = client.post(url).json()
+    cache.clear()
+    second = client.post(url).json()
+
+    assert first == second == {"checkout_session_id": "cs_test_0"}
+    assert len(stripe_sessions) == 1
+    assert Subscription.objects.get().status == "pending"
+
+
+def test_stale_checkouts_are_expired_and_purged(user):
+    course = CourseFactory(price=10)
+    stale = Payment.objects.create(
+        user=user, payment_type="course", amount=10, provider="stripe", provider_payment_id="cs_stale",
+        course=course, expires_at=timezone.now() - timedelta(minutes=1),
+    )
+    old = Payment.objects.create(
+        user=user, payment_type="course", amount=10, provider="stripe", provider_payment_id="cs_old",
+        course=course, status="expired",
+    )
+    Payment.objects.filter(pk=old.pk).update(modified=timezone.now() - timedelta(days=30))
+
+    assert expire_stale_checkouts() == {"expired": 1, "purged": 1}
+    stale.refresh_from_db()
+    assert stale.status == "expired"
+    assert not Payment.objects.filter(pk=old.pk).exists()
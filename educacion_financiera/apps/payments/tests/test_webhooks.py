@@ -0,0 +1,96 @@
+import hashlib
+import hmac
+import json
+import time
+
+import pytest
+from django.urls import reverse
+
+from educacion_financiera.apps.courses.models import Enrollment
+from educacion_financiera.apps.courses.tests.factories import CourseFactory
+from educacion_financiera.apps.payments.models import Payment
+from educacion_financiera.apps.payments.models import StripeEvent
+from educacion_financiera.apps.payments.tasks import process_event
+
+pytestmark = pytest.mark.django_db
+
+
+def _checkout_event(session_id, event_id="evt_test"):
+    return {
+        "id": event_id,
+        "object": "event",
+        "type": "checkout.session.completed",
+        "data": {"object": {"id": session_id, "object": "checkout.session", "payment_intent": "pi_test"}},
+    }
+
+
+def _signed_post(client, settings, event):
+    payload = json.dumps(event)
+    timestamp = int(time.time())
+    signature = hmac.new(
+        settings.STRIPE_WEBHOOK_SECRET.encode(), f"{timestamp}.{payload}".encode(), hashlib.sha256,
+    ).hexdigest()
+    return client.post(
+        reverse("payments:stripe_webhook"), payload, content_type="application/json",
+        HTTP_STRIPE_SIGNATURE=f"t={timestamp},v1={signature}",
+    )
+
+
+@pytest.fixture
+def course_payment(user):
+    return Payment.objects.create(
+        user=user, payment_type="course", amount=10, provider="stripe",
+        provider_payment_id="cs_test", course=CourseFactory(price=10),
+    )
+
+
+class TestStripeWebhook:
+    def test_redelivered_event_is_stored_once(self, client, settings, course_payment, django_capture_on_commit_callbacks):
+        settings.CELERY_TASK_ALWAYS_EAGER = True
+        event = _checkout_event(course_payment.provider_payment_id)
+
+        with django_capture_on_commit_callbacks(execute=True) as callbacks:
+            assert _signed_post(client, settings, event).status_code == 200
+            assert _signed_post(client, settings, event).status_code == 200
+
+        assert len(callbacks) == 1
+        assert StripeEvent.objects.get().status == "processed"
+        course_payment.refresh_from_db()
+        assert course_payment.status == "completed"
+        assert Enrollment.objects.filter(student=course_payment.user, course=course_payment.course, active=True).exists()
+
+    def test_invalid_signature_is_rejected(self, client):
+        response = client.post(
+            reverse("payments:stripe_webhook"), "{}", content_type="application/json",
+            HTTP_STRIPE_SIGNATURE="t=1,v1=invalid",
+        )
+        assert response.status_code == 400
+        assert not StripeEvent.objects.exists()
+
+
+class TestProcessEvent:
+    def test_existing_enrollment_is_reactivated(self, course_payment):
+        Enrollment.objects.create(student=course_payment.user, course=course_payment.course, active=False)
+        event = StripeEvent.objects.create(
+            event_id="evt_test", type="checkout.session.completed",
+            payload=_checkout_event(course_payment.provider_payment_id),
+        )
+
+        assert process_event(event.pk).status == "processed"
+        assert Enrollment.objects.get(student=course_payment.user).active
+        # Processed events are not applied again
+        assert process_event(event.pk) is None
+
+    def test_failures_end_in_dead_letter(self):
+        event = StripeEvent.objects.create(
+            event_id="evt_test", type="checkout.session.completed", payload=_checkout_event("cs_missing"),
+        )
+
+        for _ in range(StripeEvent.MAX_ATTEMPTS):
+            StripeEvent.objects.filter(pk=event.pk).update(next_attempt_at=event.created)
+            process_event(event.pk)
+
+        event.refresh_from_db()
+        assert event.status == "dead"
+        assert event.attempts == StripeEvent.MAX_ATTEMPTS
+        assert "cs_missing" in event.last_error
@@ -0,0 +1,81 @@
+"""
+Handlers for stored Stripe webhook events.
+
+Stripe delivers events at least once, so every handler must be safe to run
+again for an event that was already applied.
+"""
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from educacion_financiera.apps.courses.models import Enrollment
+
+from .models import Payment
+
+
+def complete_checkout_session(session):
+    """
+    Mark the payment of a checkout session as completed and grant access to
+    the course or subscription it paid for
+    """
+    payment = Payment.objects.select_for_update().select_related(
+        "subscription__subscription_type"
+    ).filter(provider="stripe", provider_payment_id=session["id"]).first()
+    if payment is None:
+        raise Payment.DoesNotExist(f"No payment for checkout session {session['id']}")
+    if payment.status == "completed":
+        return payment
+
+    payment.status = "completed"
+    payment.provider_transaction_id = session.get("payment_intent") or ""
+    payment.save()
+
+    if payment.payment_type == "course":
+        enrollment, created = Enrollment.objects.get_or_create(
+            course_id=payment.course_id,
+            student_id=payment.user_id,
+            defaults={"active": True}
+        )
+        if not enrollment.active:
+            enrollment.active = True
+            enrollment.save(update_fields=["active", "modified"])
+
+    elif payment.payment_type == "subscription":
+        subscription = payment.subscription
+        subscription.status = "active"
+        subscription.start_date = timezone.now()
+
+        # Set end date if duration is specified
+        if subscription.subscription_type.duration_days > 0:
+            subscription.end_date = timezone.now() + timedelta(
+                days=subscription.subscription_type.duration_days
+            )
+
+        subscription.save()
+
+    return payment
+
+
+def expire_checkout_session(session):
+    """Mark the payment of an abandoned checkout session as expired"""
+    return Payment.objects.filter(
+        provider="stripe",
+        provider_payment_id=session["id"],
+        status="pending"
+    ).update(status="expired")
+
+
+EVENT_HANDLERS = {
+    "checkout.session.completed": complete_checkout_session,
+    "checkout.session.expired": expire_checkout_session,
+}
+
+
+def handle_event(event):
+    """Apply a stored StripeEvent in a single transaction"""
+    handler = EVENT_HANDLERS.get(event.type)
+    if handler is None:
+        return None
+    with transaction.atomic():
+        return handler(event.data_object)
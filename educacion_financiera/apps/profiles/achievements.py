@@ -0,0 +1,85 @@
+"""
+Certificates and badges.
+
+Progress, streak, study time and discussion events only queue the affected
+users (see signals.py); a Celery worker then evaluates them in bulk. Badge
+rules compare ``Badge.required_value`` with counters kept on Profile as the
+events happen, so evaluating a user never scans their history. Certificates
+are issued for enrollments that reached 100% and have none yet.
+"""
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+
+from educacion_financiera.apps.courses.models import Certificate, Course, Enrollment
+from educacion_financiera.apps.dashboard.services import invalidate_dashboard_snapshot
+from educacion_financiera.context_processors import invalidate_user_stats_cache
+
+from .models import Badge, Profile, UserBadge
+
+
+def queue_evaluation(user_ids):
+    """Evaluate the users' achievements in a worker once the transaction commits"""
+    from .tasks import evaluate_user_achievements
+
+    user_ids = sorted(set(user_ids))
+    if user_ids:
+        transaction.on_commit(lambda: evaluate_user_achievements.delay(user_ids))
+
+
+@transaction.atomic
+def award_certificates(user_ids):
+    """Issue missing certificates of completed enrollments. Returns how many were created."""
+    completed = list(Enrollment.objects.filter(student_id__in=user_ids, progress__gte=100).filter(
+        ~Exists(Certificate.objects.filter(student=OuterRef("student"), course=OuterRef("course")))
+    ).values_list("student_id", "course_id"))
+    if not completed:
+        return 0
+
+    certificates = [
+        Certificate(student_id=student_id, course_id=course_id, certificate_id=Certificate.new_certificate_id())
+        for student_id, course_id in completed
+    ]
+    Certificate.objects.bulk_create(certificates, ignore_conflicts=True)
+    # Conflicts with certificates issued meanwhile are skipped; ours carry new ids
+    created = Certificate.objects.filter(
+        certificate_id__in=[certificate.certificate_id for certificate in certificates]
+    ).count()
+
+    # bulk_create skips the counter and cache signals
+    students = {student_id for student_id, _course_id in completed}
+    Course.objects.filter(pk__in={course_id for _student_id, course_id in completed}).recalculate_counters()
+    Profile.objects.filter(user_id__in=students).recount_courses_completed()
+    for student_id in students:
+        invalidate_user_stats_cache(student_id)
+        invalidate_dashboard_snapshot(student_id)
+    return created
+
+
+def award_badges(user_ids):
+    """Award every active badge whose rule the users now meet. Returns how many."""
+    rules = [
+        (badge.pk, Badge.COUNTER_FIELDS[badge.badge_type], badge.required_value)
+        for badge in Badge.objects.filter(is_active=True, badge_type__in=Badge.COUNTER_FIELDS)
+    ]
+    if not rules:
+        return 0
+
+    fields = {field for _badge_id, field, _required in rules}
+    earned = set(UserBadge.objects.filter(user_id__in=user_ids).values_list("user_id", "badge_id"))
+    awarded = [
+        UserBadge(user_id=counters["user_id"], badge_id=badge_id)
+        for counters in Profile.objects.filter(user_id__in=user_ids).values("user_id", *fields)
+        for badge_id, field, required in rules
+        if counters[field] >= required and (counters["user_id"], badge_id) not in earned
+    ]
+    UserBadge.objects.bulk_create(awarded, ignore_conflicts=True)
+    return len(awarded)
+
+
+def evaluate_achievements(user_ids):
+    """Award the certificates and badges the users have earned"""
+    user_ids = list(user_ids)
+    # Certificates first, they raise the completion counter badges read
+    certificates = award_certificates(user_ids)
+    badges = award_badges(user_ids)
+    return {"certificates": certificates, "badges": badges}
@@ -42,7 +42,7 @@ class ProfileAdmin(admin.ModelAdmin):
         (_("Learning Statistics"), {
             "fields": (
                 "total_study_time", "courses_completed",
-                "current_streak", "longest_streak", "last_activity"
+                "current_streak", "longest_streak", "community_posts", "last_activity"
             ),
             "classes": ("collapse",)
         }),
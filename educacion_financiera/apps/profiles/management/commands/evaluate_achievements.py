@@ -0,0 +1,49 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from educacion_financiera.apps.profiles.achievements import evaluate_achievements
+from educacion_financiera.apps.profiles.tasks import evaluate_user_achievements
+
+
+class Command(BaseCommand):
+    help = 'Award the certificates and badges every user has earned, in chunks'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=1000,
+            help='Number of users evaluated at a time',
+        )
+        parser.add_argument(
+            '--queue',
+            action='store_true',
+            help='Send each chunk to the Celery workers instead of evaluating it here',
+        )
+
+    def handle(self, *args, **options):
+        users = get_user_model().objects.order_by('pk').values_list('pk', flat=True)
+        totals = {'users': 0, 'certificates': 0, 'badges': 0}
+        last_pk = 0
+        while True:
+            chunk = list(users.filter(pk__gt=last_pk)[:options['chunk_size']])
+            if not chunk:
+                break
+            last_pk = chunk[-1]
+            totals['users'] += len(chunk)
+
+            if options['queue']:
+                evaluate_user_achievements.delay(chunk)
+            else:
+                awarded = evaluate_achievements(chunk)
+                totals['certificates'] += awarded['certificates']
+                totals['badges'] += awarded['badges']
+
+        if options['queue']:
+            message = f'Queued achievements of {totals["users"]} users.'
+        else:
+            message = (
+                f'Evaluated {totals["users"]} users: awarded {totals["certificates"]} certificates '
+                f'and {totals["badges"]} badges.'
+            )
+        self.stdout.write(self.style.SUCCESS(message))
@@ -0,0 +1,43 @@
+# Generated by Django 5.1.9 on 2026-10-18 11:04
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_counters(apps, schema_editor):
+    Profile = apps.get_model('profiles', 'Profile')
+    Certificate = apps.get_model('courses', 'Certificate')
+    Discussion = apps.get_model('discussions', 'Discussion')
+    Comment = apps.get_model('discussions', 'Comment')
+
+    def count(queryset, user_field):
+        return Coalesce(Subquery(
+            queryset.filter(**{user_field: OuterRef('user')}).order_by()
+            .values(user_field).annotate(total=Count('id')).values('total')[:1]
+        ), 0)
+
+    Profile.objects.update(
+        courses_completed=count(Certificate.objects.all(), 'student'),
+        community_posts=(
+            count(Discussion.objects.all(), 'created_by') + count(Comment.objects.all(), 'created_by')
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('profiles', '0002_badge_profile_company_profile_course_announcements_and_more'),
+        ('courses', '0007_course_content_modified'),
+        ('discussions', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='community_posts',
+            field=models.PositiveIntegerField(default=0, help_text='Discussions and comments written by the user', verbose_name='Community Posts'),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
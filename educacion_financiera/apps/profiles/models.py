@@ -1,8 +1,27 @@
 from django.conf import settings
 from django.db import models
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
 from django.utils.translation import gettext_lazy as _
 
 
+class ProfileQuerySet(models.QuerySet):
+    def adjust_counters(self, **deltas):
+        """Atomically shift counter columns, never below zero"""
+        return self.update(**{
+            field: Greatest(F(field) + delta, 0) for field, delta in deltas.items() if delta
+        }) if any(deltas.values()) else 0
+
+    def recount_courses_completed(self):
+        """Recount the certificates of the profile owners"""
+        from educacion_financiera.apps.courses.models import Certificate
+        return self.update(courses_completed=Coalesce(Subquery(
+            Certificate.objects.filter(student=OuterRef("user")).order_by().values("student").annotate(
+                total=Count("id")
+            ).values("total")[:1]
+        ), 0))
+
+
 class Profile(models.Model):
     """
     Extended profile for users
@@ -81,11 +100,18 @@ class Profile(models.Model):
     courses_completed = models.PositiveIntegerField(_("Courses Completed"), default=0)
     current_streak = models.PositiveIntegerField(_("Current Streak (days)"), default=0)
     longest_streak = models.PositiveIntegerField(_("Longest Streak (days)"), default=0)
+    community_posts = models.PositiveIntegerField(
+        _("Community Posts"),
+        default=0,
+        help_text=_("Discussions and comments written by the user")
+    )
     last_activity = models.DateTimeField(_("Last Activity"), null=True, blank=True)
 
     created = models.DateTimeField(_("Created"), auto_now_add=True)
     modified = models.DateTimeField(_("Modified"), auto_now=True)
 
+    objects = ProfileQuerySet.as_manager()
+
     class Meta:
         verbose_name = _("Profile")
         verbose_name_plural = _("Profiles")
@@ -111,14 +137,16 @@ class Profile(models.Model):
     @property
     def completion_rate(self):
         """Calculate course completion rate"""
+        from django.db.models import Count, Q
         from educacion_financiera.apps.courses.models import Enrollment
-        enrollments = Enrollment.objects.filter(student=self.user, active=True)
-        if not enrollments.exists():
+        counts = Enrollment.objects.filter(student=self.user, active=True).aggregate(
+            total=Count("id"),
+            completed=Count("id", filter=Q(progress__gte=100))
+        )
+        if not counts["total"]:
             return 0
 
-        total_courses = enrollments.count()
-        completed_courses = sum(1 for e in enrollments if e.get_progress_percentage() == 100)
-        return round((completed_courses / total_courses) * 100, 1)
+        return round((counts["completed"] / counts["total"]) * 100, 1)
 
     def get_interests_list(self):
         """Return interests as a list"""
@@ -165,6 +193,14 @@ class Badge(models.Model):
         ("special", _("Special Achievement")),
     )
 
+    # Profile counter compared with required_value; special badges are awarded by hand
+    COUNTER_FIELDS = {
+        "completion": "courses_completed",
+        "streak": "longest_streak",
+        "time": "total_study_time",
+        "engagement": "community_posts",
+    }
+
     name = models.CharField(_("Name"), max_length=100)
     description = models.TextField(_("Description"))
     icon = models.CharField(_("Icon Class"), max_length=100, help_text=_("Font Awesome icon class"))
@@ -1,7 +1,13 @@
 from django.conf import settings
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 
+from educacion_financiera.apps.courses.models import Certificate, LessonProgress
+from educacion_financiera.apps.courses.signals import lesson_progress_synced, study_time_flushed
+from educacion_financiera.apps.discussions.models import Comment, Discussion
+from educacion_financiera.context_processors import invalidate_user_stats_cache
+
+from .achievements import queue_evaluation
 from .models import Profile
 
 
@@ -25,3 +31,62 @@ def save_user_profile(sender, instance, **kwargs):
         # Create profile if it doesn't exist
         # (in case this is a migrated user)
         Profile.objects.create(user=instance)
+
+
+@receiver(post_save, sender=Profile)
+@receiver(post_delete, sender=Profile)
+def invalidate_profile_stats(sender, instance, **kwargs):
+    """
+    Drop the cached navigation stats of the profile owner
+    """
+    invalidate_user_stats_cache(instance.user_id)
+
+
+@receiver(post_save, sender=Certificate)
+def count_completed_course(sender, instance, created, **kwargs):
+    if created:
+        Profile.objects.filter(user_id=instance.student_id).adjust_counters(courses_completed=1)
+        queue_evaluation([instance.student_id])
+
+
+@receiver(post_delete, sender=Certificate)
+def discount_completed_course(sender, instance, **kwargs):
+    Profile.objects.filter(user_id=instance.student_id).adjust_counters(courses_completed=-1)
+
+
+@receiver(post_save, sender=Discussion)
+@receiver(post_save, sender=Comment)
+def count_saved_post(sender, instance, created, **kwargs):
+    # Hidden comments are not counted; moderation shifts the counter when it changes approval
+    if created and getattr(instance, "is_approved", True):
+        Profile.objects.filter(user_id=instance.created_by_id).adjust_counters(community_posts=1)
+        queue_evaluation([instance.created_by_id])
+
+
+@receiver(post_delete, sender=Discussion)
+@receiver(post_delete, sender=Comment)
+def discount_deleted_post(sender, instance, **kwargs):
+    if getattr(instance, "is_approved", True):
+        Profile.objects.filter(user_id=instance.created_by_id).adjust_counters(community_posts=-1)
+
+
+@receiver(post_save, sender=LessonProgress)
+def evaluate_completed_lesson(sender, instance, **kwargs):
+    if instance.is_completed:
+        queue_evaluation([instance.student_id])
+
+
+@receiver(post_save, sender=Profile)
+def evaluate_streak(sender, instance, update_fields=None, **kwargs):
+    if update_fields and "longest_streak" in update_fields:
+        queue_evaluation([instance.user_id])
+
+
+@receiver(lesson_progress_synced)
+def evaluate_synced_progress(sender, student_id, **kwargs):
+    queue_evaluation([student_id])
+
+
+@receiver(study_time_flushed)
+def evaluate_study_time(sender, user_ids, **kwargs):
+    queue_evaluation(user_ids)
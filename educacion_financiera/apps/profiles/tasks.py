@@ -0,0 +1,9 @@
+from celery import shared_task
+
+from .achievements import evaluate_achievements
+
+
+@shared_task()
+def evaluate_user_achievements(user_ids):
+    """Award the certificates and badges a batch of users has earned"""
+    return evaluate_achievements(user_ids)
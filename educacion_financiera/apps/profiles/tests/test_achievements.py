@@ -0,0 +1,99 @@
+import pytest
+from django.core.management import call_command
+
+from educacion_financiera.apps.courses.models import Certificate
+from educacion_financiera.apps.courses.models import Course
+from educacion_financiera.apps.courses.models import Enrollment
+from educacion_financiera.apps.courses.tests.factories import EnrollmentFactory
+from educacion_financiera.apps.courses.tests.factories import LessonFactory
+from educacion_financiera.apps.dashboard.services import get_dashboard_data
+from educacion_financiera.apps.discussions.models import Comment
+from educacion_financiera.apps.discussions.models import Discussion
+from educacion_financiera.apps.profiles.achievements import award_certificates
+from educacion_financiera.apps.profiles.achievements import evaluate_achievements
+from educacion_financiera.apps.profiles.models import Badge
+from educacion_financiera.apps.profiles.models import Profile
+from educacion_financiera.apps.profiles.models import UserBadge
+from educacion_financiera.users.tests.factories import UserFactory
+
+pytestmark = pytest.mark.django_db
+
+
+def _badge(badge_type, required_value, **kwargs):
+    return Badge.objects.create(
+        name=f"{badge_type} {required_value}",
+        description="",
+        icon="fas fa-star",
+        badge_type=badge_type,
+        required_value=required_value,
+        **kwargs,
+    )
+
+
+def test_post_counters_and_evaluation_queued(user, django_capture_on_commit_callbacks):
+    lesson = LessonFactory()
+    with django_capture_on_commit_callbacks() as callbacks:
+        discussion = Discussion.objects.create(lesson=lesson, title="Pregunta", body="...", created_by=user)
+        Comment.objects.create(discussion=discussion, body="Respuesta", created_by=user)
+
+    assert Profile.objects.get(user=user).community_posts == 2
+    assert len(callbacks) == 2
+
+    discussion.delete()
+    assert Profile.objects.get(user=user).community_posts == 0
+
+
+def test_evaluate_awards_certificates_and_badges(user, settings):
+    settings.DASHBOARD_SNAPSHOT_TIMEOUT = 60
+    enrollment = EnrollmentFactory(student=user)
+    Enrollment.objects.filter(pk=enrollment.pk).update(progress=100)
+    assert get_dashboard_data(user)["certificates"] == 0
+    Profile.objects.filter(user=user).update(longest_streak=7, total_study_time=30)
+    completion = _badge("completion", 1)
+    streak = _badge("streak", 7)
+    _badge("time", 60)
+    _badge("streak", 3, is_active=False)
+    _badge("special", 0)
+
+    assert evaluate_achievements([user.id]) == {"certificates": 1, "badges": 2}
+
+    assert Certificate.objects.filter(student=user, course=enrollment.course).exists()
+    assert Course.objects.get(pk=enrollment.course_id).certificate_count == 1
+    assert Profile.objects.get(user=user).courses_completed == 1
+    assert get_dashboard_data(user)["certificates"] == 1
+    assert set(UserBadge.objects.filter(user=user).values_list("badge_id", flat=True)) == {completion.id, streak.id}
+
+    # Nothing left to award
+    assert evaluate_achievements([user.id]) == {"certificates": 0, "badges": 0}
+
+
+def test_evaluation_queries_do_not_grow_with_users(django_assert_num_queries):
+    _badge("streak", 1)
+    users = UserFactory.create_batch(5)
+    Profile.objects.update(longest_streak=1)
+
+    with django_assert_num_queries(7):
+        assert evaluate_achievements([user.id for user in users]) == {"certificates": 0, "badges": 5}
+
+
+def test_backfill_command_evaluates_everyone_in_chunks():
+    _badge("engagement", 0)
+    users = UserFactory.create_batch(3)
+
+    call_command("evaluate_achievements", chunk_size=2)
+
+    assert UserBadge.objects.filter(user__in=users).count() == 3
+
+
+def test_certificates_issued_meanwhile_are_not_counted(user, monkeypatch):
+    enrollment = EnrollmentFactory(student=user)
+    Enrollment.objects.filter(pk=enrollment.pk).update(progress=100)
+    bulk_create = type(Certificate.objects).bulk_create
+
+    def issued_meanwhile(manager, objs, **kwargs):
+        Certificate.objects.create(student=user, course=enrollment.course)
+        return bulk_create(manager, objs, **kwargs)
+
+    monkeypatch.setattr(type(Certificate.objects), "bulk_create", issued_meanwhile)
+    assert award_certificates([user.id]) == 0
+    assert Certificate.objects.filter(student=user).count() == 1
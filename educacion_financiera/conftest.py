@@ -1,12 +1,24 @@
 import pytest
+from django.core.cache import cache
 
 from educacion_financiera.users.models import User
 from educacion_financiera.users.tests.factories import UserFactory
 
 
 @pytest.fixture(autouse=True)
-def _media_storage(settings, tmpdir) -> None:
+def _media_storage(settings, tmpdir, tmp_path_factory) -> None:
     settings.MEDIA_ROOT = tmpdir.strpath
+    exports_root = str(tmp_path_factory.mktemp("exports"))
+    settings.STORAGES = {
+        **settings.STORAGES,
+        "exports": {**settings.STORAGES["exports"], "OPTIONS": {"location": exports_root}},
+    }
+
+
+@pytest.fixture(autouse=True)
+def _clear_cache():
+    yield
+    cache.clear()
 
 
 @pytest.fixture
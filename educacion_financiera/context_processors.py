@@ -1,39 +1,92 @@
 from django.conf import settings
+from django.core.cache import cache
 from django.db import models
 from django.db.models import Count
+from django.utils.functional import SimpleLazyObject
 from educacion_financiera.apps.courses.models import Category, Course, Enrollment, Certificate
 from educacion_financiera.apps.profiles.models import Profile
+from educacion_financiera.instrumentation import instrument_context_processor
 
+CATEGORIES_CACHE_KEY = "global_context:categories"
+USER_STATS_CACHE_KEY = "global_context:user_stats:{user_id}"
 
+
+def invalidate_categories_cache():
+    """Drop the cached category list and navigation items"""
+    cache.delete(CATEGORIES_CACHE_KEY)
+
+
+def invalidate_user_stats_cache(user_id):
+    """Drop the cached statistics of a user"""
+    cache.delete(USER_STATS_CACHE_KEY.format(user_id=user_id))
+
+
+def get_cached_categories():
+    """
+    Categories with their public course count and the matching navigation
+    items, shared by every request until a category or course changes
+    """
+    cached = cache.get(CATEGORIES_CACHE_KEY)
+    if cached is None:
+        categories = list(Category.objects.annotate(
+            course_count=Count('courses', filter=models.Q(courses__visibility='public'))
+        ))
+        nav_items = [
+            {
+                'name': category.name,
+                'url': f'/dashboard/search/?category={category.slug}',
+                'icon': 'fas fa-folder'
+            }
+            for category in categories
+        ]
+        # Agregar separador y "Ver todos"
+        if categories:
+            nav_items.append({'divider': True})
+            nav_items.append({
+                'name': 'Ver todos los cursos',
+                'url': '/dashboard/search/',
+                'icon': 'fas fa-list'
+            })
+        cached = {'categories': categories, 'nav_items': nav_items}
+        cache.set(CATEGORIES_CACHE_KEY, cached, settings.GLOBAL_CONTEXT_CACHE_TIMEOUT)
+    return cached
+
+
+def get_cached_user_stats(user):
+    """Statistics shown in the navigation bar, cached per user"""
+    key = USER_STATS_CACHE_KEY.format(user_id=user.pk)
+    user_stats = cache.get(key)
+    if user_stats is None:
+        profile, created = Profile.objects.get_or_create(user=user)
+        user_stats = {
+            'enrolled_courses': Enrollment.objects.filter(student=user, active=True).count(),
+            'certificates': Certificate.objects.filter(student=user, is_active=True).count(),
+            'total_study_time': profile.total_study_time,
+            'current_streak': profile.current_streak,
+            'profile': profile,
+        }
+        cache.set(key, user_stats, settings.GLOBAL_CONTEXT_CACHE_TIMEOUT)
+    return user_stats
+
+
+@instrument_context_processor
 def global_context(request):
     """
-    Context processor que proporciona datos globales para toda la aplicación
+    Context processor que proporciona datos globales para toda la aplicación.
+    Los datos se leen de la caché y solo se evalúan si la plantilla los usa.
     """
     context = {
         'site_name': 'Educación Financiera',
-        'categories': Category.objects.annotate(
-            course_count=Count('courses', filter=models.Q(courses__visibility='public'))
-        ),
+        'categories': SimpleLazyObject(lambda: get_cached_categories()['categories']),
         'user_stats': {},
         'navigation_items': [],
     }
 
     # Datos específicos para usuarios autenticados
     if request.user.is_authenticated:
-        try:
-            profile = Profile.objects.get(user=request.user)
-        except Profile.DoesNotExist:
-            profile = Profile.objects.create(user=request.user)
-
+        user = request.user
         # Estadísticas del usuario
-        enrollments = Enrollment.objects.filter(student=request.user, active=True)
-        context['user_stats'] = {
-            'enrolled_courses': enrollments.count(),
-            'certificates': Certificate.objects.filter(student=request.user, is_active=True).count(),
-            'total_study_time': profile.total_study_time,
-            'current_streak': profile.current_streak,
-            'profile': profile,
-        }
+        context['user_stats'] = SimpleLazyObject(lambda: get_cached_user_stats(user))
 
         # Items de navegación personalizados según el rol
         if request.user.is_teacher:
@@ -57,7 +110,7 @@ def global_context(request):
                 },
                 {
                     'name': 'Análisis',
-                    'url': '/admin/',
+                    'url': '/analytics/',
                     'icon': 'fas fa-chart-bar'
                 },
             ]
@@ -74,7 +127,8 @@ def global_context(request):
                     'url': '/dashboard/search/',
                     'icon': 'fas fa-book',
                     'dropdown': True,
-                    'items': []
+                    # Categorías en el dropdown de cursos
+                    'items': SimpleLazyObject(lambda: get_cached_categories()['nav_items'])
                 },
                 {
                     'name': 'Comunidad',
@@ -83,26 +137,10 @@ def global_context(request):
                 },
             ]
 
-            # Agregar categorías al dropdown de cursos
-            for category in context['categories']:
-                context['navigation_items'][1]['items'].append({
-                    'name': category.name,
-                    'url': f'/dashboard/search/?category={category.slug}',
-                    'icon': 'fas fa-folder'
-                })
-
-            # Agregar separador y "Ver todos"
-            if context['categories']:
-                context['navigation_items'][1]['items'].append({'divider': True})
-                context['navigation_items'][1]['items'].append({
-                    'name': 'Ver todos los cursos',
-                    'url': '/dashboard/search/',
-                    'icon': 'fas fa-list'
-                })
-
     return context
 
 
+@instrument_context_processor
 def user_menu_context(request):
     """
     Context processor específico para el menú de usuario
@@ -126,6 +164,11 @@ def user_menu_context(request):
             'url': '/dashboard/certificates/',
             'icon': 'fas fa-certificate'
         },
+        {
+            'name': 'Mis Notas',
+            'url': '/dashboard/notes/',
+            'icon': 'fas fa-sticky-note'
+        },
         {
             'name': 'Configuración',
             'url': f'/users/{request.user.pk}/update/',
@@ -0,0 +1,331 @@
+"""
+Per-view request instrumentation.
+
+``InstrumentationMiddleware`` records, for every resolved URL name, the number
+of queries, SQL time, template render time, context processor time and
+response size. Totals are kept in memory per process and exported in the
+Prometheus text format by ``metrics_view``; each response can also carry a
+Server-Timing header.
+
+Under several worker processes, such as gunicorn workers, set
+INSTRUMENTATION_METRICS_DIR (``PROMETHEUS_MULTIPROC_DIR``) to a directory
+shared by the workers and emptied when the server starts. Every process
+writes its totals there at most once per DUMP_INTERVAL and on exit, and a
+scrape adds up the files of all processes, so totals do not depend on the
+worker that answers. Files of exited workers are kept, so counters never go
+back. Repeated SQL within one request is reported with the
+project frame that issued it, to point at likely N+1 patterns.
+
+Recording costs two clock reads and a dict update per query, so it is meant to
+stay enabled in production.
+"""
+import atexit
+import functools
+import glob
+import hmac
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import defaultdict
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import PermissionDenied
+from django.db import connections
+from django.http import HttpResponse
+
+logger = logging.getLogger(__name__)
+
+PROJECT_DIR = str(settings.APPS_DIR)
+UNRESOLVED = "<unresolved>"
+# Seconds between writes of a process's totals to INSTRUMENTATION_METRICS_DIR
+DUMP_INTERVAL = 1.0
+
+
+class MetricsRegistry:
+    """
+    Thread safe summaries (count and sum) and counters keyed by labels,
+    optionally shared between processes through INSTRUMENTATION_METRICS_DIR
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.summaries = defaultdict(lambda: [0, 0.0])
+        self.counters = defaultdict(int)
+        self._pid = None
+        self._path = None
+        self._dumped = 0.0
+
+    def observe(self, name, labels, value):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._check_fork()
+            summary = self.summaries[key]
+            summary[0] += 1
+            summary[1] += value
+
+    def increment(self, name, labels, amount=1):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._check_fork()
+            self.counters[key] += amount
+
+    def clear(self):
+        with self._lock:
+            self.summaries.clear()
+            self.counters.clear()
+
+    def _check_fork(self):
+        """Start empty in a forked worker; what it inherited belongs to the parent's file"""
+        pid = os.getpid()
+        if pid != self._pid:
+            if self._pid is not None:
+                self.summaries.clear()
+                self.counters.clear()
+            self._pid = pid
+            # Unique per process start, as pids are reused
+            self._path = f"metrics-{pid}-{uuid.uuid4().hex[:8]}.json"
+
+    def _snapshot(self):
+        with self._lock:
+            self._check_fork()
+            return (
+                [[name, list(labels), count, total] for (name, labels), (count, total) in self.summaries.items()],
+                [[name, list(labels), value] for (name, labels), value in self.counters.items()],
+            )
+
+    def dump(self, force=False):
+        """Write this process's totals to INSTRUMENTATION_METRICS_DIR, at most once per DUMP_INTERVAL"""
+        directory = settings.INSTRUMENTATION_METRICS_DIR
+        now = time.monotonic()
+        if not directory or (not force and now - self._dumped < DUMP_INTERVAL):
+            return
+        self._dumped = now
+        summaries, counters = self._snapshot()
+        path = os.path.join(directory, self._path)
+        # Written aside and renamed, so a scrape never reads half a file
+        with open(f"{path}.tmp", "w") as target:
+            json.dump({"summaries": summaries, "counters": counters}, target)
+        os.replace(f"{path}.tmp", path)
+
+    def collect(self):
+        """Totals of every process sharing INSTRUMENTATION_METRICS_DIR, or of this one"""
+        directory = settings.INSTRUMENTATION_METRICS_DIR
+        if not directory:
+            summaries, counters = self._snapshot()
+            dumps = [{"summaries": summaries, "counters": counters}]
+        else:
+            self.dump(force=True)
+            dumps = []
+            for path in glob.glob(os.path.join(directory, "metrics-*.json")):
+                try:
+                    with open(path) as source:
+                        dumps.append(json.load(source))
+                except (OSError, ValueError):
+                    # Removed or replaced while listing
+                    continue
+
+        summaries = defaultdict(lambda: [0, 0.0])
+        counters = defaultdict(int)
+        for dump in dumps:
+            for name, labels, count, total in dump["summaries"]:
+                summary = summaries[(name, tuple(tuple(label) for label in labels))]
+                summary[0] += count
+                summary[1] += total
+            for name, labels, value in dump["counters"]:
+                counters[(name, tuple(tuple(label) for label in labels))] += value
+        return summaries, counters
+
+    def render(self):
+        """Metrics in the Prometheus text exposition format"""
+        summaries, counters = self.collect()
+
+        lines = []
+        declared = set()
+        for (name, labels), (count, total) in sorted(summaries.items()):
+            if name not in declared:
+                declared.add(name)
+                lines.append(f"# TYPE {name} summary")
+            label_text = _format_labels(labels)
+            lines.append(f"{name}_count{label_text} {count}")
+            lines.append(f"{name}_sum{label_text} {total:.6f}")
+        for (name, labels), value in sorted(counters.items()):
+            if name not in declared:
+                declared.add(name)
+                lines.append(f"# TYPE {name} counter")
+            lines.append(f"{name}{_format_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    escaped = (
+        (key, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for key, value in labels
+    )
+    return "{" + ",".join(f'{key}="{value}"' for key, value in escaped) + "}"
+
+
+registry = MetricsRegistry()
+atexit.register(registry.dump, force=True)
+
+
+def _project_frame():
+    """Innermost stack frame in project code, outside this module"""
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.startswith(PROJECT_DIR) and filename != __file__:
+            return f"{filename[len(PROJECT_DIR) + 1:]}:{frame.f_lineno} in {frame.f_code.co_name}"
+        frame = frame.f_back
+    return "unknown"
+
+
+class RequestMetrics:
+    """
+    Measurements of a single request
+    """
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.sql_time = 0.0
+        self.render_started = None
+        self.render_time = 0.0
+        self.context_processor_times = defaultdict(float)
+        self.statements = defaultdict(int)
+        self.executions = defaultdict(int)
+        self.duplicates = 0
+        self.repeated = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        """Database execute wrapper"""
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_time += time.perf_counter() - start
+            self.queries += 1
+
+            execution = hash((sql, str(params)))
+            self.executions[execution] += 1
+            if self.executions[execution] > 1:
+                self.duplicates += 1
+
+            self.statements[sql] += 1
+            if self.statements[sql] == settings.INSTRUMENTATION_N_PLUS_ONE_THRESHOLD:
+                # Capture the origin once, when the statement crosses the threshold
+                self.repeated[sql] = _project_frame()
+
+    @property
+    def context_processor_time(self):
+        return sum(self.context_processor_times.values())
+
+    def server_timing(self, total):
+        return ", ".join([
+            f'db;dur={self.sql_time * 1000:.1f};desc="{self.queries} queries"',
+            f"render;dur={self.render_time * 1000:.1f}",
+            f"context;dur={self.context_processor_time * 1000:.1f}",
+            f"total;dur={total * 1000:.1f}",
+        ])
+
+
+def instrument_context_processor(processor):
+    """Add the run time of a context processor to the request metrics"""
+    @functools.wraps(processor)
+    def wrapper(request):
+        metrics = getattr(request, "_instrumentation", None)
+        if metrics is None:
+            return processor(request)
+        start = time.perf_counter()
+        try:
+            return processor(request)
+        finally:
+            metrics.context_processor_times[processor.__name__] += time.perf_counter() - start
+
+    return wrapper
+
+
+class InstrumentationMiddleware:
+    """
+    Record per view metrics and optionally add a Server-Timing header
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.INSTRUMENTATION_ENABLED:
+            return self.get_response(request)
+
+        metrics = request._instrumentation = RequestMetrics()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(metrics))
+            response = self.get_response(request)
+        total = time.perf_counter() - metrics.started
+
+        self.record(request, response, metrics, total)
+        if settings.INSTRUMENTATION_SERVER_TIMING:
+            response["Server-Timing"] = metrics.server_timing(total)
+        return response
+
+    def process_template_response(self, request, response):
+        metrics = getattr(request, "_instrumentation", None)
+        if metrics is not None:
+            # Rendering starts right after the template response middleware
+            metrics.render_started = time.perf_counter()
+            response.add_post_render_callback(
+                lambda rendered: setattr(
+                    metrics, "render_time", time.perf_counter() - metrics.render_started
+                )
+            )
+        return response
+
+    def record(self, request, response, metrics, total):
+        match = getattr(request, "resolver_match", None)
+        view = match.view_name if match else UNRESOLVED
+        labels = {"view": view}
+
+        registry.increment(
+            "django_http_responses_total",
+            {"view": view, "method": request.method, "status": response.status_code}
+        )
+        registry.observe("django_view_duration_seconds", labels, total)
+        registry.observe("django_view_db_queries", labels, metrics.queries)
+        registry.observe("django_view_db_seconds", labels, metrics.sql_time)
+        registry.observe("django_view_render_seconds", labels, metrics.render_time)
+        for processor, seconds in metrics.context_processor_times.items():
+            registry.observe(
+                "django_view_context_processor_seconds", {"view": view, "processor": processor}, seconds
+            )
+        if not response.streaming:
+            registry.observe("django_view_response_bytes", labels, len(response.content))
+        if metrics.duplicates:
+            registry.increment("django_view_duplicate_queries_total", labels, metrics.duplicates)
+
+        for sql, origin in metrics.repeated.items():
+            registry.increment("django_view_n_plus_one_total", labels)
+            logger.warning(
+                "Possible N+1 in %s: statement ran %d times, first repeated from %s: %s",
+                view, metrics.statements[sql], origin, sql[:300]
+            )
+        registry.dump()
+
+
+def metrics_view(request):
+    """
+    Prometheus scrape endpoint, open to staff users or to requests carrying
+    the INSTRUMENTATION_METRICS_TOKEN as a bearer token
+    """
+    token = settings.INSTRUMENTATION_METRICS_TOKEN
+    authorization = request.headers.get("Authorization", "")
+    authorized = request.user.is_authenticated and request.user.is_staff
+    if token and hmac.compare_digest(authorization, f"Bearer {token}"):
+        authorized = True
+    if not authorized:
+        raise PermissionDenied
+
+    return HttpResponse(registry.render(), content_type="text/plain; version=0.0.4; charset=utf-8")